@@ -1,15 +1,13 @@
+from decimal import Decimal
+
 from django.contrib import admin
-from .models import Table, MenuItem, Order, OrderItem
-from import_export import resources
-from import_export.admin import ImportExportModelAdmin
+from django.db import transaction
+from django.db.models import F, Sum
 
-class MenuItemResource(resources.ModelResource):
-    class Meta:
-        model = MenuItem
-        fields = ('id', 'name', 'description', 'price', 'is_available', 'created_at')
-        export_order = fields
-        import_id_fields = ['id']
-        skip_admin_log = True
+from . import rollup
+from .models import Table, MenuItem, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+from .resources import MenuItemResource
+from import_export.admin import ImportExportModelAdmin
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -18,11 +16,75 @@ class OrderItemInline(admin.TabularInline):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'table', 'status', 'is_paid', 'created_at')
+    list_display = ('id', 'table', 'status', 'is_paid', 'total', 'created_at')
     list_filter = ('status', 'is_paid', 'table')
+    readonly_fields = ('total', 'item_count')
     inlines = [OrderItemInline]
     ordering = ('-created_at',)
 
+    def save_model(self, request, obj, form, change):
+        if not change:
+            super().save_model(request, obj, form, change)
+            rollup.record_status_change(obj, None)
+            return
+        # The totals move with the lines (F() increments); never write back the values read for the form.
+        obj.save(update_fields=[
+            field.name for field in obj._meta.concrete_fields
+            if not field.primary_key and field.name not in self.readonly_fields
+        ])
+        rollup.record_status_change(obj, form.initial.get('status'))
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not OrderItem:
+            return super().save_formset(request, form, formset, change)
+        order = formset.instance
+        before = self._line_totals(order)
+        super().save_formset(request, form, formset, change)
+        after = self._line_totals(order)
+        for menu_item_id in before.keys() | after.keys():
+            quantity, revenue = after.get(menu_item_id, (0, Decimal('0')))
+            old_quantity, old_revenue = before.get(menu_item_id, (0, Decimal('0')))
+            rollup.record_item_change(order, menu_item_id, quantity - old_quantity, revenue - old_revenue)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            if obj.status == rollup.COMPLETED:
+                rollup.apply_order(obj, -1)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            rollup.apply_orders(list(queryset.filter(status=rollup.COMPLETED)), -1)
+            super().delete_queryset(request, queryset)
+
+    @staticmethod
+    def _line_totals(order):
+        """``{menu_item_id: (quantity, revenue)}`` over the stored lines of ``order``."""
+        rows = OrderItem.objects.filter(order=order).values('menu_item_id').annotate(
+            total_quantity=Sum('quantity'),
+            total_revenue=Sum(F('price') * F('quantity')),
+        ).order_by()
+        return {row['menu_item_id']: (row['total_quantity'], row['total_revenue']) for row in rows}
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    readonly_fields = ('menu_item', 'quantity', 'price')
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'table_number', 'status', 'is_paid', 'created_at', 'archived_at')
+    list_filter = ('status', 'is_paid')
+    inlines = [ArchivedOrderItemInline]
+    ordering = ('-created_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(MenuItem)
 class MenuItemAdmin(ImportExportModelAdmin):
     resource_class = MenuItemResource
@@ -0,0 +1,235 @@
+"""
+Revenue and order counts of completed orders per hour, day or week, broken
+down by table and by menu item.
+
+All buckets of a range come from one grouped query per breakdown (and per
+live/archive table) using DB-side ``Trunc``. Days (weeks for weekly
+buckets) that have fully ended are cached without expiry under the
+rollup's change counters of the days they cover (``rollup.generations``),
+so a late edit to an old order only invalidates its own day; the current
+day or week is recomputed on every request.
+"""
+import hashlib
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from . import rollup
+from .fast_serializers import format_datetime
+from .models import ArchivedOrder, ArchivedOrderItem, MenuItem, Order, OrderItem
+
+BUCKETS = ('hour', 'day', 'week')
+BREAKDOWNS = ('table', 'menu_item')
+BUCKET_KEY = 'analytics:{kind}:{start}:{version}'
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _cache():
+    return caches[getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')]
+
+
+def max_buckets():
+    return getattr(settings, 'ANALYTICS_MAX_BUCKETS', 2000)
+
+
+def align_range(kind, start_date, end_date):
+    """Widen week ranges to whole weeks (Monday to Sunday)."""
+    if kind == 'week':
+        start_date -= timedelta(days=start_date.weekday())
+        end_date += timedelta(days=6 - end_date.weekday())
+    return start_date, end_date
+
+
+def bucket_starts(kind, start_date, end_date, tz):
+    """Local bucket starts covering ``start_date``..``end_date``, plus the end of the last bucket."""
+    start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    if kind == 'hour':
+        starts = []
+        current = start
+        while current < end:
+            local = current.astimezone(tz).replace(minute=0, second=0, microsecond=0)
+            if not starts or local != starts[-1]:
+                starts.append(local)
+            current += timedelta(hours=1)
+    else:
+        step = 7 if kind == 'week' else 1
+        days = (end_date - start_date).days + 1
+        starts = [timezone.make_aware(datetime.combine(start_date + timedelta(days=offset), time.min), tz)
+                  for offset in range(0, days, step)]
+    return starts + [end]
+
+
+def _days(start, end, tz):
+    day = timezone.localtime(start, tz).date()
+    last = timezone.localtime(end - timedelta(microseconds=1), tz).date()
+    days = []
+    while day <= last:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def _empty():
+    # Revenue is kept in integer cents: cheaper to sum, cache and format than Decimal.
+    return {'orders': 0, 'revenue': 0, 'tables': {}, 'items': {}}
+
+
+def _cents(value):
+    return int(value * 100) if value is not None else 0
+
+
+def format_cents(cents):
+    sign = '-' if cents < 0 else ''
+    return f'{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}'
+
+
+def compute(kind, windows, tz):
+    """
+    Aggregate the completed orders created inside ``windows`` (a list of
+    ``(start, end)`` pairs) into buckets of ``kind``, keyed by bucket start.
+    """
+    buckets = {}
+    window = item_window = Q()
+    for start, end in windows:
+        window |= Q(created_at__gte=start, created_at__lt=end)
+        item_window |= Q(order__created_at__gte=start, order__created_at__lt=end)
+
+    sources = (
+        (Order.objects.all(), 'table_id', OrderItem),
+        (ArchivedOrder.objects.all(), 'table_number', ArchivedOrderItem),
+    )
+    for orders, table_field, item_model in sources:
+        per_table = orders.filter(window, status=rollup.COMPLETED).annotate(
+            bucket=Trunc('created_at', kind, tzinfo=tz),
+        ).values('bucket', table_field).annotate(
+            order_count=Count('id', distinct=True),
+            revenue=Sum(F('items__price') * F('items__quantity'), output_field=MONEY),
+        ).order_by()
+        for row in per_table:
+            bucket = buckets.setdefault(row['bucket'], _empty())
+            revenue = _cents(row['revenue'])
+            bucket['orders'] += row['order_count']
+            bucket['revenue'] += revenue
+            table = bucket['tables'].setdefault(row[table_field], [0, 0])
+            table[0] += row['order_count']
+            table[1] += revenue
+
+        per_item = item_model.objects.filter(item_window, order__status=rollup.COMPLETED).annotate(
+            bucket=Trunc('order__created_at', kind, tzinfo=tz),
+        ).values('bucket', 'menu_item_id').annotate(
+            quantity_sold=Sum('quantity'),
+            revenue=Sum(F('price') * F('quantity'), output_field=MONEY),
+        ).order_by()
+        for row in per_item:
+            bucket = buckets.setdefault(row['bucket'], _empty())
+            item = bucket['items'].setdefault(row['menu_item_id'], [0, 0])
+            item[0] += row['quantity_sold']
+            item[1] += _cents(row['revenue'])
+    return buckets
+
+
+def _merge(ranges):
+    windows = []
+    for start, end in ranges:
+        if windows and windows[-1][1] == start:
+            windows[-1] = (windows[-1][0], end)
+        else:
+            windows.append((start, end))
+    return windows
+
+
+def _segments(kind, buckets, tz):
+    """Group buckets into cache entries: one per local day for hourly buckets, one per bucket otherwise."""
+    segments = []
+    for start, end in buckets:
+        if kind == 'hour' and segments and (
+                timezone.localtime(start, tz).date() == timezone.localtime(segments[-1][0][0], tz).date()):
+            segments[-1].append((start, end))
+        else:
+            segments.append([(start, end)])
+    return segments
+
+
+def _segment_key(kind, start, end, tz, generations):
+    versions = [generations[rollup.EPOCH]] + [generations[day] for day in _days(start, end, tz)]
+    version = hashlib.sha1(repr(versions).encode()).hexdigest()[:16]
+    return BUCKET_KEY.format(kind=kind, start=start.isoformat(), version=version)
+
+
+def bucket_stats(kind, start_date, end_date, now=None):
+    """``(start, end, closed, stats)`` for every bucket of the range."""
+    tz = timezone.get_current_timezone()
+    now = now or timezone.now()
+    starts = bucket_starts(kind, start_date, end_date, tz)
+    buckets = list(zip(starts, starts[1:]))
+    segments = _segments(kind, buckets, tz)
+
+    cache = _cache()
+    closed = [segment for segment in segments if segment[-1][1] <= now]
+    generations = rollup.generations(_days(closed[0][0][0], closed[-1][-1][1], tz)) if closed else {}
+    keys = [_segment_key(kind, segment[0][0], segment[-1][1], tz, generations) for segment in closed]
+    cached = cache.get_many(keys)
+    stats = {}
+    for key in keys:
+        stats.update(cached.get(key, {}))
+
+    # Closed segments missing from the cache and the open one; future buckets are empty.
+    pending = [segment for segment in segments if segment[0][0] <= now and segment[0][0] not in stats]
+    if pending:
+        computed = compute(kind, _merge([(segment[0][0], segment[-1][1]) for segment in pending]), tz)
+        fresh = {}
+        for segment in pending:
+            values = {start: computed.get(start, _empty()) for start, _ in segment}
+            stats.update(values)
+            if segment[-1][1] <= now:
+                fresh[_segment_key(kind, segment[0][0], segment[-1][1], tz, generations)] = values
+        if fresh:
+            cache.set_many(fresh, timeout=None)
+    return [(start, end, end <= now, stats.get(start) or _empty()) for start, end in buckets]
+
+
+def report(kind, start_date, end_date, breakdowns=BREAKDOWNS, now=None):
+    tz = timezone.get_current_timezone()
+    buckets = bucket_stats(kind, start_date, end_date, now)
+    names = {}
+    if 'menu_item' in breakdowns:
+        menu_item_ids = {menu_item_id for _, _, _, stats in buckets for menu_item_id in stats['items']}
+        if menu_item_ids:
+            names = dict(MenuItem.objects.filter(pk__in=menu_item_ids).values_list('id', 'name'))
+
+    rendered = []
+    for start, end, closed, stats in buckets:
+        bucket = {
+            'start': format_datetime(start, tz),
+            'end': format_datetime(end, tz),
+            'closed': closed,
+            'total_revenue': format_cents(stats['revenue']),
+            'total_orders': stats['orders'],
+        }
+        if 'table' in breakdowns:
+            bucket['tables'] = [
+                {'table_number': table, 'orders': orders, 'revenue': format_cents(revenue)}
+                for table, (orders, revenue) in sorted(stats['tables'].items())
+            ]
+        if 'menu_item' in breakdowns:
+            bucket['menu_items'] = [
+                {'menu_item_id': menu_item_id, 'name': names.get(menu_item_id), 'quantity': quantity,
+                 'revenue': format_cents(revenue)}
+                for menu_item_id, (quantity, revenue) in sorted(
+                    stats['items'].items(), key=lambda item: (-item[1][1], item[0]))
+            ]
+        rendered.append(bucket)
+
+    return {
+        'bucket': kind,
+        'summary': {
+            'total_revenue': format_cents(sum(stats['revenue'] for _, _, _, stats in buckets)),
+            'total_orders': sum(stats['orders'] for _, _, _, stats in buckets),
+        },
+        'buckets': rendered,
+    }
@@ -0,0 +1,58 @@
+"""
+Hot/cold storage for closed orders.
+
+Paid and completed orders, and cancelled ones, move to ``ArchivedOrder`` /
+``ArchivedOrderItem`` once they have not changed for
+``ORDER_ARCHIVE_AFTER_DAYS`` days, so the live tables only hold the last few
+days. Each batch is copied and deleted in its own transaction, which makes
+``archive_orders`` safe to interrupt and re-run.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+CLOSED = Q(status='completed', is_paid=True) | Q(status='cancelled')
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 3)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable(cutoff):
+    return Order.objects.filter(CLOSED, updated_at__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size=500):
+    """Move up to ``batch_size`` closed orders older than ``cutoff``; returns ``(orders, items)`` moved."""
+    with transaction.atomic():
+        orders = list(archivable(cutoff).select_for_update().order_by('id')[:batch_size])
+        if not orders:
+            return 0, 0
+        ids = [order.id for order in orders]
+        items = list(OrderItem.objects.filter(order_id__in=ids))
+
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                id=order.id, table_number=order.table_id, status=order.status, is_paid=order.is_paid,
+                created_at=order.created_at, updated_at=order.updated_at,
+            )
+            for order in orders
+        ], ignore_conflicts=True)
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(
+                id=item.id, order_id=item.order_id, menu_item_id=item.menu_item_id,
+                quantity=item.quantity, price=item.price,
+            )
+            for item in items
+        ], ignore_conflicts=True)
+
+        OrderItem.objects.filter(order_id__in=ids).delete()
+        Order.objects.filter(id__in=ids).delete()
+    return len(orders), len(items)
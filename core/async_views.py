@@ -0,0 +1,130 @@
+"""
+Async versions of the customer endpoints (menu, table order, payment), used
+instead of the DRF views in core/views.py when ``ASYNC_CUSTOMER_VIEWS`` is
+on, i.e. when served through smart_order_api/asgi.py.
+
+URLs, status codes and response bodies are the same as the sync views.
+Reads use the async ORM; placing and paying orders run the same service
+functions as the sync views in one ``sync_to_async`` call each, since
+transactions are not available from async code in this Django version.
+"""
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, MethodNotAllowed
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import menu_cache, throttling
+from .fast_serializers import aorder_payload, aorder_payloads
+from .idempotency import AsyncIdempotentMixin
+from .models import Order, Table
+from .renderers import FastJSONRenderer
+from .services import OrderPlacementError, pay_order, place_order
+
+_renderer = FastJSONRenderer()
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(_renderer.render(data), status=status, content_type=_renderer.media_type)
+
+
+def request_data(request):
+    """The request body parsed by DRF's configured parsers."""
+    return Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]).data
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncCustomerView(View):
+    throttle_scopes = {}
+
+    async def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        handler = getattr(self, method, None) if method in self.http_method_names else None
+        scope = self.throttle_scopes.get(request.method)
+        admitted = False
+        try:
+            if handler is None:
+                raise MethodNotAllowed(request.method)
+            admitted = await throttling.aadmit(request, scope, kwargs.get('table_number'))
+            return await handler(request, *args, **kwargs)
+        except APIException as exc:
+            response = json_response({'detail': exc.detail}, status=exc.status_code)
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = '%d' % exc.wait
+            return response
+        finally:
+            if admitted:
+                throttling.limiter.release(scope)
+
+
+class AsyncMenuView(AsyncCustomerView):
+    throttle_scopes = {'GET': 'menu'}
+
+    async def get(self, request, *args, **kwargs):
+        body, etag = await menu_cache.aget_menu()
+        return menu_cache.menu_response(request, body, etag)
+
+
+class AsyncOrderView(AsyncIdempotentMixin, AsyncCustomerView):
+    throttle_scopes = {'GET': 'order_status', 'POST': 'order', 'PATCH': 'payment'}
+
+    async def get(self, request, *args, **kwargs):
+        payloads = await aorder_payloads(Order.objects.open().filter(table_id=self.kwargs.get('table_number')))
+        if not payloads:
+            return json_response({"info": "指定的餐桌没有未支付的订单。"}, status=status.HTTP_204_NO_CONTENT)
+        return json_response(payloads[0])
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            table_number = self.kwargs.get('table_number')
+            table = await Table.objects.aget(table_number=table_number)
+        except Table.DoesNotExist:
+            return json_response({"error": f"餐桌 '{table_number}' 不存在，无法下单。"}, status=status.HTTP_404_NOT_FOUND)
+
+        items_data = request_data(request).get('items', [])
+        if not items_data:
+            return json_response({"error": "未提供菜品信息"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(items_data, list):
+            return json_response({"error": "菜品信息格式无效。"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            order, created = await sync_to_async(place_order)(table, items_data)
+        except OrderPlacementError as e:
+            return json_response({"error": e.message}, status=status.HTTP_400_BAD_REQUEST)
+
+        return json_response(await aorder_payload(order.pk), status=status.HTTP_201_CREATED)
+
+    async def patch(self, request, *args, **kwargs):
+        try:
+            table_number = self.kwargs.get('table_number')
+            table = await Table.objects.aget(table_number=table_number)
+            order = await Order.objects.open().aget(table=table)
+            order = await sync_to_async(pay_order)(order, release_table=False)
+            return json_response(await aorder_payload(order.pk))
+        except ObjectDoesNotExist:
+            return json_response({"error": "指定的餐桌或需要结账的订单不存在。"}, status=status.HTTP_404_NOT_FOUND)
+
+
+class AsyncPaymentView(AsyncIdempotentMixin, AsyncCustomerView):
+    throttle_scopes = {'POST': 'payment'}
+
+    async def post(self, request, pk, format=None):
+        try:
+            order = await Order.objects.aget(pk=pk)
+        except Order.DoesNotExist:
+            return json_response({"error": "订单不存在。"}, status=status.HTTP_404_NOT_FOUND)
+
+        if order.is_paid:
+            return json_response({"error": "该订单已经支付，请勿重复操作。"}, status=status.HTTP_400_BAD_REQUEST)
+
+        order = await sync_to_async(pay_order)(order)
+
+        return json_response({
+            "message": "支付成功！",
+            "order": await aorder_payload(order.pk)
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,212 @@
+"""
+Group and permission claims in the JWTs issued by ``api/login/``.
+
+Tokens carry the user's group names, a bitmap over ``PERMISSIONS`` and the
+user's permission version (``pv``). ``ClaimsJWTAuthentication`` trusts those
+claims without touching the database while ``pv`` still matches the user's
+current version; any change to the user's groups or permissions bumps the
+version, and tokens issued before it fall back to loading the user, which
+rejects deleted and inactive users.
+
+Versions are bumped from model signals, so saving or deleting a user is
+enough. Queryset ``update()`` sends no signals: after e.g.
+``User.objects.filter(...).update(is_active=False)`` call
+``versions.bump(user_ids)``, or tokens stay valid for up to
+``AUTH_CLAIMS_CACHE_TIMEOUT`` seconds.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import PermissionVersion
+
+# Bit positions are part of the token format: add new models at the end.
+PERMISSIONS = tuple(
+    f'core.{action}_{model}'
+    for model in ('table', 'menuitem', 'order', 'orderitem', 'dailysalessummary', 'dailymenuitemsales')
+    for action in ('add', 'change', 'delete', 'view')
+)
+PERMISSION_BITS = {perm: 1 << index for index, perm in enumerate(PERMISSIONS)}
+MISSING_VERSION = -1
+
+
+def encode_permissions(perms):
+    bitmap = 0
+    for perm in perms:
+        bitmap |= PERMISSION_BITS.get(perm, 0)
+    return bitmap
+
+
+def decode_permissions(bitmap):
+    return frozenset(perm for perm, bit in PERMISSION_BITS.items() if bitmap & bit)
+
+
+class PermissionVersions:
+    """
+    Current permission version per user: a short-lived in-process copy
+    (``AUTH_CLAIMS_VERSION_TTL`` seconds) in front of a shared cache in front
+    of the ``PermissionVersion`` table. A bump reaches every worker within
+    the TTL.
+    """
+
+    def __init__(self):
+        self.local = {}
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'AUTH_CLAIMS_CACHE_ALIAS', 'default')]
+
+    @staticmethod
+    def key(user_id):
+        return f'auth:permission-version:{user_id}'
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        now = time.monotonic()
+        entry = self.local.get(user_id)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+        version = self.cache.get(self.key(user_id))
+        if version is None:
+            version = PermissionVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first()
+            if version is None:
+                version = MISSING_VERSION
+            self.cache.set(self.key(user_id), version, timeout=getattr(settings, 'AUTH_CLAIMS_CACHE_TIMEOUT', 300))
+        self.local[user_id] = (version, now + getattr(settings, 'AUTH_CLAIMS_VERSION_TTL', 5))
+        return version
+
+    def issue(self, user):
+        """Version to embed in a new token; creates the user's row on first use."""
+        row, created = PermissionVersion.objects.get_or_create(user=user)
+        if created:
+            self.forget([user.pk])
+        return row.version
+
+    def bump(self, user_ids):
+        user_ids = [str(user_id) for user_id in user_ids]
+        if not user_ids:
+            return
+        PermissionVersion.objects.filter(user_id__in=user_ids).update(version=F('version') + 1)
+        transaction.on_commit(lambda: self.forget(user_ids))
+
+    def forget(self, user_ids):
+        user_ids = [str(user_id) for user_id in user_ids]
+        self.cache.delete_many([self.key(user_id) for user_id in user_ids])
+        for user_id in user_ids:
+            self.local.pop(user_id, None)
+
+
+versions = PermissionVersions()
+
+
+def permission_claims(user):
+    # Read the version first so a concurrent change can only make the claims stale, never current.
+    version = versions.issue(user)
+    return {
+        'username': user.get_username(),
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+        'groups': sorted(user.groups.values_list('name', flat=True)),
+        'perms': encode_permissions(user.get_all_permissions()),
+        'pv': version,
+    }
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim, value in permission_claims(user).items():
+            token[claim] = value
+        return token
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Issue the new access token with claims reloaded from the database."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        data = super().validate(attrs)
+        user = get_user_model().objects.get(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]})
+        access = refresh.access_token
+        for claim, value in permission_claims(user).items():
+            access[claim] = value
+        data['access'] = str(access)
+        return data
+
+
+class ClaimsTokenUser(TokenUser):
+    """
+    ``request.user`` for a token with current claims. Group and ``core``
+    permission checks are answered from the token; anything else loads the
+    real user once.
+    """
+
+    @cached_property
+    def id(self):
+        return get_user_model()._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def group_names(self):
+        return frozenset(self.token.get('groups', ()))
+
+    @cached_property
+    def permissions(self):
+        return decode_permissions(self.token.get('perms', 0))
+
+    @cached_property
+    def db_user(self):
+        return get_user_model().objects.get(**{api_settings.USER_ID_FIELD: self.id})
+
+    @property
+    def groups(self):
+        return self.db_user.groups
+
+    @property
+    def user_permissions(self):
+        return self.db_user.user_permissions
+
+    def has_perm(self, perm, obj=None):
+        if self.is_superuser:
+            return True
+        if obj is None and perm in PERMISSION_BITS:
+            return perm in self.permissions
+        return self.db_user.has_perm(perm, obj)
+
+    def has_perms(self, perm_list, obj=None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, app_label):
+        if self.is_superuser or (app_label == 'core' and self.permissions):
+            return True
+        return self.db_user.has_module_perms(app_label)
+
+    def get_group_permissions(self, obj=None):
+        return self.db_user.get_group_permissions(obj)
+
+    def get_all_permissions(self, obj=None):
+        return self.db_user.get_all_permissions(obj)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that returns a ``ClaimsTokenUser`` without any query
+    while the token's ``pv`` matches the user's permission version, and loads
+    the user as usual for older tokens or after a permission change.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        version = validated_token.get('pv')
+        if user_id is None or version is None or version != versions.get(user_id):
+            return super().get_user(validated_token)
+        return ClaimsTokenUser(validated_token)
@@ -0,0 +1,32 @@
+"""
+SQLite backend tuned for a small production deployment.
+
+Applies the ``PRAGMAS`` given in the database settings on every new
+connection (WAL journal, busy timeout, ...) and starts write transactions
+with ``BEGIN IMMEDIATE``, so concurrent writers wait on the busy timeout
+instead of failing with "database is locked" when a read lock cannot be
+upgraded.
+"""
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+    'mmap_size': 134217728,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = {**DEFAULT_PRAGMAS, **self.settings_dict.get('PRAGMAS', {})}
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict.get('TRANSACTION_MODE', 'IMMEDIATE')
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
@@ -0,0 +1,334 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Benchmarks never touch the configured database: ``benchmark_database``
+creates a throwaway copy next to it (the same way the test runner does),
+seeds it and drops it afterwards.
+"""
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission, User
+from django.db import connection, connections
+from django.test import Client
+from django.utils import timezone
+
+from . import rollup
+from .auth import ClaimsTokenObtainPairSerializer
+from .models import MenuItem, Order, OrderItem, Table
+
+BENCH_PASSWORD = 'bench-password'
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """Create (and afterwards drop) a dedicated database for a benchmark run."""
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+        # The default in-memory test database cannot be shared between the
+        # benchmark's worker threads.
+        test_settings['NAME'] = os.path.join(tempfile.gettempdir(), 'smart_order_bench.sqlite3')
+    old_name = connection.settings_dict['NAME']
+    old_debug = settings.DEBUG
+    settings.DEBUG = False
+    # Synthetic clients hammer the customer endpoints far beyond the guest rate limits.
+    old_admission_control = getattr(settings, 'CUSTOMER_ADMISSION_CONTROL', True)
+    settings.CUSTOMER_ADMISSION_CONTROL = False
+    # Slow-request warnings are expected under synthetic overload.
+    slow_log = logging.getLogger('core.performance')
+    slow_log_disabled, slow_log.disabled = slow_log.disabled, True
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        settings.DEBUG = old_debug
+        settings.CUSTOMER_ADMISSION_CONTROL = old_admission_control
+        slow_log.disabled = slow_log_disabled
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the ``created_at``/``updated_at`` values set by the seeder."""
+    fields = [(field, field.auto_now, field.auto_now_add)
+              for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def seed(tables=1000, menu_items=200, orders=50000, items_per_order=4, history_days=90,
+         open_ratio=0.5, batch_size=5000, log=None, rng=None):
+    """
+    Fill the benchmark database with a restaurant's worth of data.
+
+    ``orders`` are spread over the last ``history_days`` days and completed,
+    except one open order on ``open_ratio`` of the tables.
+    """
+    rng = rng or random.Random(42)
+    log = log or (lambda message: None)
+    now = timezone.now()
+
+    Table.objects.bulk_create(
+        [Table(table_number=f'T{i}', is_available=True) for i in range(tables)], batch_size=batch_size
+    )
+    MenuItem.objects.bulk_create(
+        [MenuItem(name=f'Dish {i}', description=f'Benchmark dish {i}', price=rng.randint(500, 9000) / 100)
+         for i in range(menu_items)],
+        batch_size=batch_size,
+    )
+    prices = dict(MenuItem.objects.values_list('id', 'price'))
+    menu_ids = list(prices)
+    log(f"Seeded {tables} tables and {menu_items} menu items.")
+
+    open_tables = [f'T{i}' for i in range(int(tables * open_ratio))]
+    Table.objects.filter(table_number__in=open_tables).update(is_available=False)
+    history = max(orders - len(open_tables), 0)
+
+    created = 0
+    with explicit_timestamps(Order):
+        while created < history + len(open_tables):
+            batch = []
+            for index in range(created, min(created + batch_size, history + len(open_tables))):
+                if index < history:
+                    created_at = now - timedelta(seconds=rng.randrange(history_days * 86400))
+                    batch.append(Order(
+                        table_id=f'T{rng.randrange(tables)}', status='completed', is_paid=True,
+                        created_at=created_at, updated_at=created_at + timedelta(minutes=rng.randrange(30, 120)),
+                    ))
+                else:
+                    created_at = now - timedelta(minutes=rng.randrange(120))
+                    batch.append(Order(
+                        table_id=open_tables[index - history], status=rng.choice(['pending', 'preparing', 'served']),
+                        created_at=created_at, updated_at=created_at,
+                    ))
+            created_orders = Order.objects.bulk_create(batch)
+            if created_orders[0].pk is None:
+                created_orders = list(Order.objects.order_by('-id')[:len(batch)])
+            items = []
+            for order in created_orders:
+                for menu_item_id in rng.sample(menu_ids, min(items_per_order, len(menu_ids))):
+                    items.append(OrderItem(
+                        order_id=order.pk, menu_item_id=menu_item_id,
+                        quantity=rng.randint(1, 3), price=prices[menu_item_id],
+                    ))
+            OrderItem.objects.bulk_create(items, batch_size=batch_size)
+            Order.objects.filter(pk__in=[order.pk for order in created_orders]).recompute_totals()
+            created += len(batch)
+            log(f"Seeded {created}/{history + len(open_tables)} orders.")
+
+    rollup.rebuild()
+    create_bench_users()
+
+
+def create_bench_users():
+    staff = User.objects.create_user('bench-staff', password=BENCH_PASSWORD)
+    staff.user_permissions.set(Permission.objects.filter(content_type__app_label='core'))
+    manager = User.objects.create_user('bench-manager', password=BENCH_PASSWORD)
+    manager.groups.add(Group.objects.get_or_create(name='managers')[0])
+    return staff, manager
+
+
+class RequestSpec:
+    __slots__ = ('name', 'method', 'path', 'body', 'user')
+
+    def __init__(self, name, method, path, body=None, user=None):
+        self.name = name
+        self.method = method.upper()
+        self.path = path
+        self.body = body
+        self.user = user
+
+    @classmethod
+    def from_dict(cls, value):
+        return cls(value.get('name') or value['path'], value.get('method', 'GET'), value['path'],
+                   value.get('body'), value.get('user'))
+
+
+class SyntheticTraffic:
+    """Weighted mix of the customer, staff and manager endpoints."""
+
+    DEFAULT_WEIGHTS = {
+        'menu': 40,
+        'order_status': 15,
+        'order': 20,
+        'staff_poll': 15,
+        'payment': 5,
+        'report': 5,
+    }
+
+    def __init__(self, weights=None, rng=None):
+        self.rng = rng or random.Random(7)
+        self.weights = weights or self.DEFAULT_WEIGHTS
+        self.tables = list(Table.objects.values_list('table_number', flat=True))
+        self.menu_ids = list(MenuItem.objects.filter(is_available=True).values_list('id', flat=True))
+        self.unpaid = list(Order.objects.filter(is_paid=False).values_list('id', flat=True))
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            name = self.rng.choices(list(self.weights), weights=list(self.weights.values()))[0]
+            return getattr(self, name)()
+
+    def menu(self):
+        return RequestSpec('menu', 'GET', f'/api/tables/{self.rng.choice(self.tables)}/menu/')
+
+    def order_status(self):
+        return RequestSpec('order_status', 'GET', f'/api/tables/{self.rng.choice(self.tables)}/order/')
+
+    def order(self):
+        items = [{'menu_item_id': menu_item_id, 'quantity': self.rng.randint(1, 3)}
+                 for menu_item_id in self.rng.sample(self.menu_ids, self.rng.randint(1, 5))]
+        return RequestSpec('order', 'POST', f'/api/tables/{self.rng.choice(self.tables)}/order/', {'items': items})
+
+    def staff_poll(self):
+        return RequestSpec('staff_poll', 'GET', '/api/staff/orders/', user='staff')
+
+    def payment(self):
+        if not self.unpaid:
+            return self.menu()
+        return RequestSpec('payment', 'POST', f'/api/orders/{self.unpaid.pop()}/pay/')
+
+    def report(self):
+        end = timezone.localdate()
+        start = end - timedelta(days=self.rng.choice([0, 6, 29, 89]))
+        return RequestSpec('report', 'GET', f'/api/reports/summary/?start_date={start}&end_date={end}', user='manager')
+
+
+def load_replay(path):
+    with open(path, encoding='utf-8') as f:
+        return [RequestSpec.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, name, seconds, queries, ok, size):
+        with self.lock:
+            self.samples.setdefault(name, []).append((seconds, queries, ok, size))
+
+    def summary(self, wall_time):
+        result = {}
+        for name, samples in sorted(self.samples.items()):
+            latencies = [sample[0] * 1000 for sample in samples]
+            # Failed requests also run Django's error reporting, which issues
+            # queries of its own, so they are left out of the query average.
+            succeeded = [sample for sample in samples if sample[2]] or samples
+            result[name] = {
+                'requests': len(samples),
+                'errors': sum(1 for sample in samples if not sample[2]),
+                'rps': round(len(samples) / wall_time, 2) if wall_time else None,
+                'p50_ms': round(percentile(latencies, 0.50), 3),
+                'p95_ms': round(percentile(latencies, 0.95), 3),
+                'p99_ms': round(percentile(latencies, 0.99), 3),
+                'mean_ms': round(statistics.fmean(latencies), 3),
+                'queries_per_request': round(statistics.fmean(sample[1] for sample in succeeded), 2),
+                'mean_response_bytes': round(statistics.fmean(sample[3] for sample in samples)),
+            }
+        return result
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_load(next_request, total_requests, concurrency, recorder):
+    """
+    Issue ``total_requests`` requests from ``concurrency`` threads through the
+    real URLconf and middleware, recording latency and query count per endpoint.
+    """
+    remaining = [total_requests]
+    remaining_lock = threading.Lock()
+    users = {
+        'staff': User.objects.get(username='bench-staff'),
+        'manager': User.objects.get(username='bench-manager'),
+    }
+
+    def make_clients(index):
+        clients = {None: Client(REMOTE_ADDR=f'10.0.{index // 256 % 256}.{index % 256}', raise_request_exception=False)}
+        for role, user in users.items():
+            # Staff and managers authenticate with the same JWTs api/login/ issues.
+            token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+            clients[role] = Client(REMOTE_ADDR=f'10.0.{index // 256 % 256}.{index % 256}',
+                                   HTTP_AUTHORIZATION=f'Bearer {token}', raise_request_exception=False)
+        return clients
+
+    # Issue tokens up front so logins do not show up in the measurements.
+    thread_clients = [make_clients(index) for index in range(concurrency)]
+
+    def worker(index):
+        clients = thread_clients[index]
+        try:
+            while True:
+                with remaining_lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                spec = next_request()
+                client = clients[spec.user]
+
+                counter = _QueryCounter()
+                with connection.execute_wrapper(counter):
+                    started = time.perf_counter()
+                    try:
+                        if spec.method == 'GET':
+                            response = client.get(spec.path)
+                        else:
+                            response = client.generic(spec.method, spec.path, json.dumps(spec.body or {}),
+                                                      content_type='application/json')
+                        content = b''.join(response) if response.streaming else response.content
+                        ok, size = response.status_code < 500, len(content)
+                    except Exception:
+                        ok, size = False, 0
+                    elapsed = time.perf_counter() - started
+                recorder.add(spec.name, elapsed, counter.count, ok, size)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def write_results(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False, default=str)
+
+
+def read_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
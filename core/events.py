@@ -0,0 +1,212 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+ORDER_CREATED = 'order.created'
+ITEMS_ADDED = 'order.items_added'
+ITEM_UPDATED = 'order.item_updated'
+ITEM_REMOVED = 'order.item_removed'
+STATUS_CHANGED = 'order.status_changed'
+ORDER_PAID = 'order.paid'
+
+
+class Event:
+    __slots__ = ('id', 'type', 'data')
+
+    def __init__(self, id, type, data):
+        self.id = id
+        self.type = type
+        self.data = data
+
+    def to_dict(self):
+        return {'id': self.id, 'type': self.type, 'data': self.data}
+
+    @classmethod
+    def from_dict(cls, value):
+        return cls(value['id'], value['type'], value['data'])
+
+
+class BaseBroker:
+    """
+    Fan-out of order events to the staff/kitchen streams.
+
+    ``read`` returns ``(events, reset)`` for everything published after
+    ``after_id``; ``reset`` is true when the broker can no longer supply the
+    full delta and the subscriber has to reload its state.
+    """
+
+    def publish(self, event_type, data):
+        raise NotImplementedError
+
+    def latest_id(self):
+        raise NotImplementedError
+
+    def read(self, after_id):
+        raise NotImplementedError
+
+    def wait(self, after_id, timeout):
+        raise NotImplementedError
+
+    async def aread(self, after_id):
+        return self.read(after_id)
+
+    async def alatest_id(self):
+        return self.latest_id()
+
+    async def await_events(self, after_id, timeout):
+        raise NotImplementedError
+
+
+class InProcessBroker(BaseBroker):
+    """Ring buffer of recent events shared by every subscriber of this process."""
+
+    def __init__(self, buffer_size=1000):
+        self._events = deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._condition = threading.Condition()
+        self._async_waiters = set()
+
+    def publish(self, event_type, data):
+        with self._condition:
+            event = Event(next(self._ids), event_type, data)
+            self._events.append(event)
+            self._last_id = event.id
+            self._condition.notify_all()
+            waiters = list(self._async_waiters)
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(waiter.set)
+        return event
+
+    def latest_id(self):
+        return self._last_id
+
+    def read(self, after_id):
+        with self._condition:
+            if after_id >= self._last_id:
+                return [], after_id > self._last_id
+            events = list(self._events)
+        reset = not events or events[0].id > after_id + 1
+        return [event for event in events if event.id > after_id], reset
+
+    def wait(self, after_id, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_id != after_id, timeout)
+
+    async def await_events(self, after_id, timeout):
+        if self._last_id != after_id:
+            return
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        self._async_waiters.add(waiter)
+        try:
+            if self._last_id == after_id:
+                await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._async_waiters.discard(waiter)
+
+
+class CacheBroker(BaseBroker):
+    """
+    Event log kept in a shared Django cache (e.g. Redis), for deployments
+    running several workers. Publishers take an id from the sequence key and
+    then store the event under it, so subscribers poll for the key of the
+    next event and treat missing keys at the end of the log as not written
+    yet rather than lost.
+    """
+
+    SEQUENCE_KEY = 'order-events:seq'
+    EVENT_KEY = 'order-events:{id}'
+
+    def __init__(self, cache_alias='default', buffer_size=1000, ttl=60 * 60, poll_interval=1.0):
+        self.cache_alias = cache_alias
+        self.buffer_size = buffer_size
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def publish(self, event_type, data):
+        self.cache.add(self.SEQUENCE_KEY, 0, timeout=None)
+        event = Event(self.cache.incr(self.SEQUENCE_KEY), event_type, data)
+        self.cache.set(self.EVENT_KEY.format(id=event.id), json.dumps(event.to_dict()), timeout=self.ttl)
+        return event
+
+    def latest_id(self):
+        return self.cache.get(self.SEQUENCE_KEY, 0)
+
+    def _keys(self, after_id, last_id):
+        if after_id > last_id:
+            return [], True
+        first_id = max(after_id + 1, last_id - self.buffer_size + 1)
+        return [self.EVENT_KEY.format(id=i) for i in range(first_id, last_id + 1)], first_id > after_id + 1
+
+    def _decode(self, keys, values, reset):
+        while keys and keys[-1] not in values:
+            keys = keys[:-1]
+        events = [Event.from_dict(json.loads(values[key])) for key in keys if key in values]
+        return events, reset or len(events) != len(keys)
+
+    def read(self, after_id):
+        keys, reset = self._keys(after_id, self.latest_id())
+        return self._decode(keys, self.cache.get_many(keys) if keys else {}, reset)
+
+    async def aread(self, after_id):
+        keys, reset = self._keys(after_id, await self.alatest_id())
+        return self._decode(keys, await self.cache.aget_many(keys) if keys else {}, reset)
+
+    async def alatest_id(self):
+        return await self.cache.aget(self.SEQUENCE_KEY, 0)
+
+    def wait(self, after_id, timeout):
+        deadline = time.monotonic() + timeout
+        next_key = self.EVENT_KEY.format(id=after_id + 1)
+        while not self.cache.has_key(next_key) and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+
+    async def await_events(self, after_id, timeout):
+        deadline = time.monotonic() + timeout
+        next_key = self.EVENT_KEY.format(id=after_id + 1)
+        while not await self.cache.ahas_key(next_key) and time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_class = import_string(getattr(settings, 'ORDER_EVENT_BROKER', 'core.events.InProcessBroker'))
+                _broker = broker_class(**getattr(settings, 'ORDER_EVENT_BROKER_OPTIONS', {}))
+    return _broker
+
+
+def order_data(order, **extra):
+    data = {
+        'order_id': order.pk,
+        'table_number': order.table_id,
+        'status': order.status,
+        'is_paid': order.is_paid,
+    }
+    data.update(extra)
+    return data
+
+
+def publish_on_commit(event_type, data):
+    """Publish once the surrounding transaction commits, so streams never see rolled back changes."""
+    transaction.on_commit(lambda: get_broker().publish(event_type, data))
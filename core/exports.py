@@ -0,0 +1,130 @@
+"""
+Streaming order exports for accounting.
+
+One row per order line (orders without lines get a single row with empty
+item columns) from the archive and the live tables, read with
+``iterator(chunk_size=...)`` and encoded as CSV or NDJSON chunk by chunk,
+optionally gzip-compressed on the fly, so memory use does not depend on the
+size of the export.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Window
+from django.utils import timezone
+
+from .fast_serializers import ZERO, format_datetime, format_decimal
+from .models import ArchivedOrder, Order
+
+FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+COLUMNS = (
+    'order_id', 'table_number', 'status', 'is_paid', 'created_at', 'order_total',
+    'item_id', 'menu_item_id', 'menu_item_name', 'quantity', 'unit_price', 'line_total',
+)
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+
+def _order_lines(queryset, start_date, end_date, statuses):
+    tz = timezone.get_current_timezone()
+    if start_date:
+        queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.combine(start_date, time.min), tz))
+    if end_date:
+        end = datetime.combine(end_date + timedelta(days=1), time.min)
+        queryset = queryset.filter(created_at__lt=timezone.make_aware(end, tz))
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    money = DecimalField(max_digits=12, decimal_places=2)
+    line_total = ExpressionWrapper(F('items__price') * F('items__quantity'), output_field=money)
+    return queryset.annotate(
+        line_total=line_total,
+        order_total=Window(Sum(line_total, output_field=money), partition_by=F('id')),
+    ).values(
+        'id', 'table_id', 'status', 'is_paid', 'created_at', 'order_total',
+        'items__id', 'items__menu_item_id', 'items__menu_item__name', 'items__quantity', 'items__price', 'line_total',
+    ).order_by('created_at', 'id', 'items__id')
+
+
+def export_querysets(start_date=None, end_date=None, statuses=None):
+    """Archived, then live order lines created between the two local dates (inclusive), oldest first."""
+    return [
+        _order_lines(ArchivedOrder.objects.annotate(table_id=F('table_number')), start_date, end_date, statuses),
+        _order_lines(Order.objects.all(), start_date, end_date, statuses),
+    ]
+
+
+def export_records(querysets, chunk_size=CHUNK_SIZE):
+    tz = timezone.get_current_timezone()
+    for queryset in querysets:
+        for row in queryset.iterator(chunk_size=chunk_size):
+            has_item = row['items__id'] is not None
+            yield (
+                row['id'], row['table_id'], row['status'], row['is_paid'], format_datetime(row['created_at'], tz),
+                format_decimal(row['order_total'] or ZERO),
+                row['items__id'], row['items__menu_item_id'], row['items__menu_item__name'], row['items__quantity'],
+                format_decimal(row['items__price']) if has_item else None,
+                format_decimal(row['line_total']) if has_item else None,
+            )
+
+
+class _Line:
+    """File-like target for ``csv.writer`` that hands back each written line."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.writer(_Line())
+    yield writer.writerow(COLUMNS)
+    for record in records:
+        yield writer.writerow(['' if value is None else value for value in record])
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(dict(zip(COLUMNS, record)), ensure_ascii=False) + '\n'
+
+
+def encode(lines, compress=False, buffer_size=BUFFER_SIZE):
+    """UTF-8 encode ``lines`` into chunks of about ``buffer_size`` bytes, gzipped if requested."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = []
+    buffered = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        buffered += len(data)
+        if buffered >= buffer_size:
+            chunk = b''.join(buffer)
+            buffer, buffered = [], 0
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    chunk = b''.join(buffer)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_chunks(output, start_date=None, end_date=None, statuses=None, compress=False, chunk_size=CHUNK_SIZE):
+    records = export_records(export_querysets(start_date, end_date, statuses), chunk_size)
+    lines = csv_lines(records) if output == 'csv' else ndjson_lines(records)
+    return encode(lines, compress)
+
+
+async def aiter_chunks(chunks):
+    """Serve a sync chunk generator to ASGI without buffering it, keeping its DB work on one thread."""
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,90 @@
+"""
+Read-only fast path for order payloads.
+
+``order_payloads`` builds exactly what ``OrderSerializer`` returns (same
+keys in the same order, Decimal and datetime formatting, ``total_price``)
+from one ``.values()`` query, without DRF's per-field machinery. Input is
+still validated by the serializers; core/tests.py checks that both paths
+render to the same bytes.
+"""
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import Order
+
+CENTS = Decimal('0.01')
+ZERO = Decimal('0')
+
+FIELDS = (
+    'id', 'table_id', 'status', 'is_paid', 'created_at', 'total',
+    'items__id', 'items__quantity', 'items__price',
+    'items__menu_item__id', 'items__menu_item__name', 'items__menu_item__description', 'items__menu_item__price',
+)
+
+
+def format_decimal(value):
+    return f'{value.quantize(CENTS):f}'
+
+
+def format_datetime(value, tz):
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _rows(queryset):
+    ordering = tuple(queryset.query.order_by)
+    return queryset.values(*FIELDS).order_by(*ordering, 'id', 'items__id')
+
+
+def _payloads(rows):
+    tz = timezone.get_current_timezone()
+    payloads = []
+    payload = None
+    for row in rows:
+        if payload is None or payload['id'] != row['id']:
+            payload = {
+                'id': row['id'],
+                'table_number': row['table_id'],
+                'status': row['status'],
+                'is_paid': row['is_paid'],
+                'created_at': format_datetime(row['created_at'], tz),
+                'items': [],
+                'total_price': format_decimal(row['total']),
+            }
+            payloads.append(payload)
+        if row['items__id'] is None:
+            continue
+        payload['items'].append({
+            'id': row['items__id'],
+            'menu_item': {
+                'id': row['items__menu_item__id'],
+                'name': row['items__menu_item__name'],
+                'description': row['items__menu_item__description'],
+                'price': format_decimal(row['items__menu_item__price']),
+            },
+            'quantity': row['items__quantity'],
+            'price': format_decimal(row['items__price']),
+        })
+    return payloads
+
+
+def order_payloads(queryset):
+    """Payloads for the orders of ``queryset``, in its ordering, items by id."""
+    return _payloads(_rows(queryset))
+
+
+async def aorder_payloads(queryset):
+    return _payloads([row async for row in _rows(queryset)])
+
+
+def order_payload(order_id):
+    payloads = order_payloads(Order.objects.filter(pk=order_id))
+    return payloads[0] if payloads else None
+
+
+async def aorder_payload(order_id):
+    payloads = await aorder_payloads(Order.objects.filter(pk=order_id))
+    return payloads[0] if payloads else None
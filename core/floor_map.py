@@ -0,0 +1,141 @@
+"""
+In-process occupancy index behind the staff floor map: for every table its
+availability and open order (id, status, item count, running total).
+
+The index is built with one query on first use, reading the open orders'
+stored totals. Services call ``tables_changed`` for the tables an order,
+item or payment change touched; after commit those tables are marked dirty
+and re-read together (one small query) on the next snapshot, so reads cost
+O(tables) in memory.
+
+Drift is detected with a change counter in the configured cache: each
+committed change increments it, and a worker whose index has not seen every
+increment (changes made by another worker, or a counter lost from the
+cache) rebuilds the whole index. ``FLOOR_MAP_MAX_AGE`` bounds how long
+writes that bypass the services (e.g. admin edits) can go unnoticed.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import FilteredRelation, Q
+
+from .fast_serializers import format_decimal
+from .models import Order, Table
+
+GENERATION_KEY = 'floor:generation'
+
+
+def _cache():
+    return caches[getattr(settings, 'FLOOR_MAP_CACHE_ALIAS', 'default')]
+
+
+def _rows(table_numbers=None):
+    tables = Table.objects.all()
+    if table_numbers is not None:
+        tables = tables.filter(pk__in=table_numbers)
+    return tables.annotate(
+        open_order=FilteredRelation(
+            'orders', condition=Q(orders__is_paid=False) & ~Q(orders__status__in=Order.CLOSED_STATUSES),
+        ),
+    ).values(
+        'table_number', 'is_available', 'open_order__id', 'open_order__status',
+        'open_order__item_count', 'open_order__total',
+    ).order_by()
+
+
+def _entry(row):
+    order = None
+    if row['open_order__id'] is not None:
+        order = {
+            'id': row['open_order__id'],
+            'status': row['open_order__status'],
+            'item_count': row['open_order__item_count'],
+            'total_price': format_decimal(row['open_order__total']),
+        }
+    return {'table_number': row['table_number'], 'is_available': row['is_available'], 'order': order}
+
+
+class FloorMap:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = None
+        self._dirty = set()
+        self._generation = None
+        self._built_at = 0.0
+
+    def _current_generation(self):
+        cache = _cache()
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            cache.add(GENERATION_KEY, 1, timeout=None)
+            generation = cache.get(GENERATION_KEY, 1)
+        return generation
+
+    def _rebuild(self, generation):
+        self._tables = {row['table_number']: _entry(row) for row in _rows()}
+        self._dirty.clear()
+        self._generation = generation
+        self._built_at = time.monotonic()
+
+    def _refresh_dirty(self):
+        table_numbers, self._dirty = self._dirty, set()
+        rows = {row['table_number']: row for row in _rows(table_numbers)}
+        for table_number in table_numbers:
+            if table_number in rows:
+                self._tables[table_number] = _entry(rows[table_number])
+            else:
+                self._tables.pop(table_number, None)
+
+    def snapshot(self):
+        """Entries of every table, ordered by table number."""
+        max_age = getattr(settings, 'FLOOR_MAP_MAX_AGE', 60)
+        with self._lock:
+            generation = self._current_generation()
+            if (self._tables is None or generation != self._generation
+                    or time.monotonic() - self._built_at > max_age):
+                self._rebuild(generation)
+            elif self._dirty:
+                self._refresh_dirty()
+            return [self._tables[table_number] for table_number in sorted(self._tables)]
+
+    def _committed(self, table_numbers):
+        cache = _cache()
+        try:
+            generation = cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.add(GENERATION_KEY, 1, timeout=None)
+            generation = None
+        with self._lock:
+            if self._tables is None:
+                return
+            if None not in (generation, self._generation) and generation == self._generation + 1:
+                self._generation = generation
+                self._dirty.update(table_numbers)
+            else:
+                # Missed someone else's change: the next snapshot rebuilds everything.
+                self._generation = None
+
+    def tables_changed(self, table_numbers):
+        table_numbers = set(table_numbers)
+        if table_numbers:
+            transaction.on_commit(lambda: self._committed(table_numbers))
+
+    def reset(self):
+        with self._lock:
+            self._tables = None
+            self._dirty.clear()
+            self._generation = None
+
+
+floor_map = FloorMap()
+
+
+def snapshot():
+    return floor_map.snapshot()
+
+
+def tables_changed(table_numbers):
+    floor_map.tables_changed(table_numbers)
@@ -0,0 +1,147 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyStore:
+    """
+    Stored responses keyed by ``Idempotency-Key``.
+
+    Entries are ``(body fingerprint, status, content type, body)`` tuples in a
+    Django cache, so they expire after ``IDEMPOTENCY_TTL`` seconds and are
+    shared by every worker using the same cache.
+    """
+
+    def __init__(self, cache_alias=None, ttl=None, lock_timeout=30):
+        self.cache_alias = cache_alias or getattr(settings, 'IDEMPOTENCY_CACHE_ALIAS', 'default')
+        self.ttl = ttl if ttl is not None else getattr(settings, 'IDEMPOTENCY_TTL', 60 * 60 * 24)
+        self.lock_timeout = lock_timeout
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def key(self, method, path, idempotency_key):
+        digest = hashlib.sha256(f'{method}:{path}:{idempotency_key}'.encode('utf-8')).hexdigest()
+        return f'idempotency:{digest}'
+
+    @staticmethod
+    def fingerprint(body):
+        return hashlib.sha256(body).hexdigest()[:16]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def lock(self, key):
+        return self.cache.add(f'{key}:lock', 1, timeout=self.lock_timeout)
+
+    def unlock(self, key):
+        self.cache.delete(f'{key}:lock')
+
+    def save(self, key, fingerprint, response):
+        self.cache.set(key, self.entry(fingerprint, response), timeout=self.ttl)
+
+    def entry(self, fingerprint, response):
+        return fingerprint, response.status_code, response['Content-Type'], response.content
+
+    async def aget(self, key):
+        return await self.cache.aget(key)
+
+    async def alock(self, key):
+        return await self.cache.aadd(f'{key}:lock', 1, timeout=self.lock_timeout)
+
+    async def aunlock(self, key):
+        await self.cache.adelete(f'{key}:lock')
+
+    async def asave(self, key, fingerprint, response):
+        await self.cache.aset(key, self.entry(fingerprint, response), timeout=self.ttl)
+
+    @staticmethod
+    def should_store(response):
+        # Server errors and throttling are transient; let the retry run again.
+        return not response.streaming and response.status_code < 500 and response.status_code != 429
+
+
+def replay(entry, fingerprint):
+    stored_fingerprint, status_code, content_type, content = entry
+    if stored_fingerprint != fingerprint:
+        return JsonResponse({"error": "该 Idempotency-Key 已用于不同的请求内容。"}, status=422)
+    response = HttpResponse(content, status=status_code, content_type=content_type)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def invalid_key_response():
+    return JsonResponse({"error": f"Idempotency-Key 长度不能超过 {MAX_KEY_LENGTH} 个字符。"}, status=400)
+
+
+def in_progress_response():
+    return JsonResponse({"error": "相同 Idempotency-Key 的请求正在处理中，请稍后重试。"}, status=409)
+
+
+class IdempotentMixin:
+    """
+    Make ``idempotent_methods`` safe to retry: a request repeating an earlier
+    ``Idempotency-Key`` gets the stored response without running the view again.
+    """
+    idempotent_methods = ('POST',)
+
+    def dispatch(self, request, *args, **kwargs):
+        idempotency_key = request.headers.get(HEADER)
+        if request.method not in self.idempotent_methods or not idempotency_key:
+            return super().dispatch(request, *args, **kwargs)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return invalid_key_response()
+
+        store = IdempotencyStore()
+        key = store.key(request.method, request.path, idempotency_key)
+        fingerprint = store.fingerprint(request.body)
+        entry = store.get(key)
+        if entry is not None:
+            return replay(entry, fingerprint)
+        if not store.lock(key):
+            return in_progress_response()
+
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            if store.should_store(response):
+                if hasattr(response, 'render'):
+                    response.render()
+                store.save(key, fingerprint, response)
+        finally:
+            store.unlock(key)
+        return response
+
+
+class AsyncIdempotentMixin:
+    """``IdempotentMixin`` for views with async handlers."""
+    idempotent_methods = ('POST',)
+
+    async def dispatch(self, request, *args, **kwargs):
+        idempotency_key = request.headers.get(HEADER)
+        if request.method not in self.idempotent_methods or not idempotency_key:
+            return await super().dispatch(request, *args, **kwargs)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return invalid_key_response()
+
+        store = IdempotencyStore()
+        key = store.key(request.method, request.path, idempotency_key)
+        fingerprint = store.fingerprint(request.body)
+        entry = await store.aget(key)
+        if entry is not None:
+            return replay(entry, fingerprint)
+        if not await store.alock(key):
+            return in_progress_response()
+
+        try:
+            response = await super().dispatch(request, *args, **kwargs)
+            if store.should_store(response):
+                await store.asave(key, fingerprint, response)
+        finally:
+            await store.aunlock(key)
+        return response
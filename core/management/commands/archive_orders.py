@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move paid-and-completed and cancelled orders that have not changed for --days days into the "
+        "archive tables, one bounded transaction per batch. Safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Archive orders older than this many days. "
+                                                     "Defaults to ORDER_ARCHIVE_AFTER_DAYS.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Orders moved per transaction.")
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches.")
+        parser.add_argument('--sleep', type=float, default=0, help="Seconds to pause between batches.")
+
+    def handle(self, *args, **options):
+        cutoff = archive.archive_cutoff(options['days'])
+        self.stdout.write(f"Archiving orders closed before {cutoff.isoformat()}")
+
+        batches = orders = items = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            moved_orders, moved_items = archive.archive_batch(cutoff, options['batch_size'])
+            if not moved_orders:
+                break
+            batches += 1
+            orders += moved_orders
+            items += moved_items
+            self.stdout.write(f"Batch {batches}: {moved_orders} orders, {moved_items} items (total {orders})")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {orders} orders and {items} items in {batches} batches."))
@@ -0,0 +1,104 @@
+import platform
+from itertools import cycle
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core import bench
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay recorded or synthetic traffic against the API in a throwaway, seeded database "
+        "and report latency percentiles, throughput and queries per request for each endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="Total number of requests to send.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Number of concurrent client threads.")
+        parser.add_argument('--replay', help="JSONL file of recorded requests ({\"name\", \"method\", \"path\", \"body\", \"user\"}); "
+                                             "user is null, \"staff\" or \"manager\". Replayed in a loop.")
+        parser.add_argument('--scenarios', help="Comma separated subset of the synthetic mix: "
+                                                + ','.join(bench.SyntheticTraffic.DEFAULT_WEIGHTS))
+        parser.add_argument('--tables', type=int, default=1000)
+        parser.add_argument('--menu-items', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--items-per-order', type=int, default=4)
+        parser.add_argument('--history-days', type=int, default=90)
+        parser.add_argument('--keepdb', action='store_true', help="Reuse the benchmark database between runs (skips seeding if it has data).")
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+        parser.add_argument('--compare', help="Results JSON of an earlier run to print p95 and throughput deltas against.")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+
+        with bench.benchmark_database(keepdb=options['keepdb']):
+            from core.models import Table
+            if not Table.objects.exists():
+                bench.seed(
+                    tables=options['tables'], menu_items=options['menu_items'], orders=options['orders'],
+                    items_per_order=options['items_per_order'], history_days=options['history_days'],
+                    log=self.stdout.write,
+                )
+
+            if options['replay']:
+                specs = cycle(bench.load_replay(options['replay']))
+                next_request = lambda: next(specs)  # noqa: E731
+            else:
+                weights = dict(bench.SyntheticTraffic.DEFAULT_WEIGHTS)
+                if options['scenarios']:
+                    names = options['scenarios'].split(',')
+                    unknown = set(names) - set(weights)
+                    if unknown:
+                        raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+                    weights = {name: weights[name] for name in names}
+                next_request = bench.SyntheticTraffic(weights)
+
+            recorder = bench.Recorder()
+            wall_time = bench.run_load(next_request, options['requests'], options['concurrency'], recorder)
+
+        results = {
+            'started_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'options': {key: options[key] for key in (
+                'requests', 'concurrency', 'replay', 'scenarios', 'tables', 'menu_items', 'orders', 'items_per_order',
+            )},
+            'wall_time_s': round(wall_time, 3),
+            'total_rps': round(options['requests'] / wall_time, 2),
+            'endpoints': recorder.summary(wall_time),
+        }
+
+        self.stdout.write(f"{'endpoint':<14}{'reqs':>7}{'err':>5}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+        for name, row in results['endpoints'].items():
+            self.stdout.write(
+                f"{name:<14}{row['requests']:>7}{row['errors']:>5}{row['rps']:>9}{row['p50_ms']:>9}"
+                f"{row['p95_ms']:>9}{row['p99_ms']:>9}{row['queries_per_request']:>9}"
+            )
+        self.stdout.write(f"Total: {results['total_rps']} req/s over {results['wall_time_s']} s")
+
+        if options['compare']:
+            self.print_comparison(bench.read_results(options['compare']), results)
+
+        if options['output']:
+            bench.write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def print_comparison(self, baseline, results):
+        self.stdout.write(f"Compared with {baseline.get('started_at', 'baseline')}:")
+        for name, row in results['endpoints'].items():
+            before = baseline.get('endpoints', {}).get(name)
+            if not before:
+                continue
+            self.stdout.write(
+                f"{name:<14}p95 {before['p95_ms']} -> {row['p95_ms']} ms ({self.change(before['p95_ms'], row['p95_ms'])}), "
+                f"rps {before['rps']} -> {row['rps']} ({self.change(before['rps'], row['rps'])}), "
+                f"queries {before['queries_per_request']} -> {row['queries_per_request']}"
+            )
+
+    def change(self, before, after):
+        if not before:
+            return 'n/a'
+        return f"{(after - before) / before:+.1%}"
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import bench
+
+CUSTOMER_MIX = {'menu': 50, 'order_status': 20, 'order': 25, 'payment': 5}
+
+SERVERS = {
+    'wsgi': lambda port, threads: [
+        sys.executable, '-m', 'gunicorn', 'smart_order_api.wsgi:application',
+        '--worker-class', 'gthread', '--workers', '1', '--threads', str(threads),
+        '--bind', f'127.0.0.1:{port}', '--backlog', '4096',
+    ],
+    'asgi': lambda port, threads: [
+        sys.executable, '-m', 'gunicorn', 'smart_order_api.asgi:application',
+        '--worker-class', 'uvicorn.workers.UvicornWorker', '--workers', '1',
+        '--bind', f'127.0.0.1:{port}', '--backlog', '4096',
+    ],
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _database_url():
+    database = connection.settings_dict
+    if connection.vendor == 'sqlite':
+        return f"sqlite:///{database['NAME']}"
+    if connection.vendor == 'postgresql':
+        return (f"postgres://{database['USER']}:{database['PASSWORD']}@{database['HOST'] or 'localhost'}:"
+                f"{database['PORT'] or 5432}/{database['NAME']}")
+    raise CommandError(f"benchmark_asgi does not support the {connection.vendor} backend.")
+
+
+async def _request(port, spec, slow_client, timeout):
+    """One HTTP/1.1 request on a fresh connection; a slow client sends its body ``slow_client`` seconds late."""
+    body = json.dumps(spec.body or {}).encode() if spec.method != 'GET' else b''
+    head = f"{spec.method} {spec.path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nConnection: close\r\n"
+    if spec.method != 'GET':
+        head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+
+    async def exchange():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            writer.write((head + "\r\n").encode())
+            if body:
+                await writer.drain()
+                await asyncio.sleep(slow_client)
+                writer.write(body)
+            await writer.drain()
+            status_line = await reader.readline()
+            content = await reader.read()
+        finally:
+            writer.close()
+        return int(status_line.split()[1]), len(content)
+
+    return await asyncio.wait_for(exchange(), timeout)
+
+
+async def _run_level(port, next_request, clients, duration, slow_client, timeout):
+    samples = []
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        while time.perf_counter() < deadline:
+            spec = next_request()
+            started = time.perf_counter()
+            try:
+                status, size = await _request(port, spec, slow_client, timeout)
+                ok = status < 500
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status, size, ok = None, 0, False
+            samples.append((time.perf_counter() - started, ok))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    wall_time = time.perf_counter() - started
+    latencies = [seconds * 1000 for seconds, ok in samples if ok]
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        'clients': clients,
+        'requests': len(samples),
+        'errors': errors,
+        'rps': round(len(latencies) / wall_time, 1),
+        'p50_ms': round(bench.percentile(latencies, 0.50), 1) if latencies else None,
+        'p99_ms': round(bench.percentile(latencies, 0.99), 1) if latencies else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how many concurrent customer clients one worker can serve: gunicorn's threaded sync worker "
+        "(wsgi.py) against one uvicorn worker running the async customer views (asgi.py). Both servers run "
+        "against a throwaway, seeded database; order POSTs come from slow clients that send their body late."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', default='8,32,128,256',
+                            help="Comma separated numbers of concurrent clients to measure.")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per concurrency level.")
+        parser.add_argument('--threads', type=int, default=8, help="Threads of the sync gthread worker.")
+        parser.add_argument('--slow-client-ms', type=int, default=200,
+                            help="Delay before a client sends its request body (0 for fast clients).")
+        parser.add_argument('--timeout', type=float, default=10.0, help="Seconds before a request counts as failed.")
+        parser.add_argument('--slo-ms', type=float, default=1000.0,
+                            help="p99 latency a concurrency level must stay under to count towards capacity.")
+        parser.add_argument('--servers', default='wsgi,asgi')
+        parser.add_argument('--tables', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['clients'].split(',')]
+        except ValueError:
+            raise CommandError("--clients must be a comma separated list of integers.")
+        servers = options['servers'].split(',')
+        unknown = set(servers) - set(SERVERS)
+        if unknown:
+            raise CommandError(f"Unknown servers: {', '.join(sorted(unknown))}")
+
+        results = {
+            'threads': options['threads'],
+            'slow_client_ms': options['slow_client_ms'],
+            'slo_ms': options['slo_ms'],
+            'servers': {},
+        }
+        with bench.benchmark_database():
+            bench.seed(tables=options['tables'], menu_items=100, orders=options['orders'], log=self.stdout.write)
+            env = dict(os.environ, DATABASE_URL=_database_url(),
+                       DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE or 'smart_order_api.settings')
+            for server in servers:
+                results['servers'][server] = self.measure(server, levels, env, options)
+
+        self.stdout.write("")
+        for server, result in results['servers'].items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{server}: capacity {result['capacity']} concurrent clients per worker "
+                f"(p99 <= {options['slo_ms']:.0f} ms, no errors)"
+            ))
+        if options['output']:
+            bench.write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def measure(self, server, levels, env, options):
+        port = _free_port()
+        env = dict(env, ASYNC_CUSTOMER_VIEWS='1' if server == 'asgi' else '0', CUSTOMER_ADMISSION_CONTROL='0')
+        with tempfile.TemporaryFile() as log:
+            process = subprocess.Popen(SERVERS[server](port, options['threads']), env=env,
+                                       stdout=log, stderr=subprocess.STDOUT, cwd=settings.BASE_DIR)
+            try:
+                self.wait_until_ready(process, port, log)
+                traffic = bench.SyntheticTraffic(CUSTOMER_MIX)
+                rows = []
+                for clients in levels:
+                    row = asyncio.run(_run_level(port, traffic, clients, options['duration'],
+                                                 options['slow_client_ms'] / 1000, options['timeout']))
+                    rows.append(row)
+                    self.stdout.write(
+                        f"{server} {clients:>5} clients: {row['rps']:>8} req/s, {row['errors']:>5} errors, "
+                        f"p50 {row['p50_ms']} ms, p99 {row['p99_ms']} ms"
+                    )
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+        capacity = max((row['clients'] for row in rows
+                        if not row['errors'] and row['p99_ms'] is not None and row['p99_ms'] <= options['slo_ms']),
+                       default=0)
+        return {'capacity': capacity, 'levels': rows}
+
+    def wait_until_ready(self, process, port, log, timeout=60):
+        deadline = time.monotonic() + timeout
+        spec = bench.RequestSpec('menu', 'GET', '/api/tables/T0/menu/')
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                log.seek(0)
+                raise CommandError(f"Server exited during startup:\n{log.read().decode(errors='replace')[-2000:]}")
+            try:
+                if asyncio.run(_request(port, spec, 0, 5))[0] == 200:
+                    return
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                pass
+            time.sleep(0.2)
+        raise CommandError(f"Server on port {port} did not become ready within {timeout} seconds.")
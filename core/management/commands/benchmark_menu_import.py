@@ -0,0 +1,109 @@
+import random
+import time
+from decimal import Decimal
+
+import tablib
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from import_export import resources
+
+from core import bench
+from core.resources import MenuItemResource
+from core.models import MenuItem
+
+HEADERS = ('id', 'name', 'description', 'price', 'is_available')
+
+
+class RowByRowMenuItemResource(resources.ModelResource):
+    """The previous ``MenuItemResource``: one lookup, savepoint and save per row."""
+
+    class Meta:
+        model = MenuItem
+        fields = ('id', 'name', 'description', 'price', 'is_available', 'created_at')
+        import_id_fields = ['id']
+        skip_admin_log = True
+
+
+def menu_dataset(rows, existing, changed=0.8, by_name=True, rng=None):
+    """
+    ``rows`` menu rows: one per existing dish (``changed`` of them with a new
+    price, every other one identified by name only if ``by_name``), the rest
+    new dishes.
+    """
+    rng = rng or random.Random(42)
+    dataset = tablib.Dataset(headers=HEADERS)
+    for index, (pk, name, price) in enumerate(existing[:rows]):
+        if rng.random() < changed:
+            price += Decimal('0.50')
+        dataset.append((pk if index % 2 == 0 or not by_name else '', name, '', price, '1'))
+    for index in range(rows - len(dataset)):
+        dataset.append(('', f'New dish {index}', '', Decimal(rng.randint(100, 20000)) / 100, '1'))
+    return dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a large menu file import (half price updates, half new dishes) with the bulk MenuItemResource "
+        "against the previous row-by-row import, in dry-run and write mode. Changes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--legacy-rows', type=int, default=5000,
+                            help="Rows for the row-by-row baseline (0 to skip); it is slow.")
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def run(self, resource, dataset, dry_run):
+        with transaction.atomic():
+            queries = bench._QueryCounter()
+            with connection.execute_wrapper(queries):
+                started = time.perf_counter()
+                result = resource.import_data(dataset, dry_run=dry_run)
+                seconds = time.perf_counter() - started
+            invalidations = len(connection.run_on_commit)
+            transaction.set_rollback(True)
+        return {
+            'rows': len(dataset),
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(len(dataset) / seconds),
+            'queries': queries.count,
+            'menu_invalidations': invalidations,
+            'errors': result.has_errors() or result.has_validation_errors(),
+            'totals': {kind: count for kind, count in result.totals.items() if count},
+        }
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        results = {'rows': rows, 'batch_size': options['batch_size']}
+        with bench.benchmark_database():
+            MenuItem.objects.bulk_create(
+                [MenuItem(name=f'Dish {i}', price=Decimal(100 + i % 5000) / 100) for i in range(rows // 2)],
+                batch_size=1000,
+            )
+            existing = list(MenuItem.objects.order_by('id').values_list('id', 'name', 'price'))
+            dataset = menu_dataset(rows, existing)
+            resource = MenuItemResource(batch_size=options['batch_size'])
+
+            results['bulk_dry_run'] = self.run(resource, dataset, dry_run=True)
+            results['bulk'] = self.run(resource, dataset, dry_run=False)
+            if options['legacy_rows']:
+                legacy_dataset = menu_dataset(options['legacy_rows'], existing, by_name=False)
+                results['row_by_row'] = self.run(RowByRowMenuItemResource(), legacy_dataset, dry_run=False)
+
+        for name in ('bulk_dry_run', 'bulk', 'row_by_row'):
+            if name not in results:
+                continue
+            run = results[name]
+            style = self.style.ERROR if run['errors'] else str
+            self.stdout.write(style(
+                f"{name:<13} {run['rows']:>7} rows {run['seconds']:>9.3f} s {run['rows_per_second']:>8} rows/s "
+                f"{run['queries']:>7} queries {run['menu_invalidations']:>6} menu invalidations  {run['totals']}"
+            ))
+        if 'row_by_row' in results:
+            results['speedup'] = round(results['bulk']['rows_per_second'] / results['row_by_row']['rows_per_second'], 1)
+            self.stdout.write(self.style.SUCCESS(f"Bulk import is {results['speedup']}x faster per row."))
+
+        if options['output']:
+            bench.write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import bench
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure order-placement throughput at increasing concurrency against the configured database "
+        "backend. Run it once per DATABASE_URL / DB_POOL_MODE to compare profiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='1,2,4,8,16',
+                            help="Comma separated client thread counts to measure.")
+        parser.add_argument('--requests', type=int, default=500, help="Orders submitted per concurrency level.")
+        parser.add_argument('--tables', type=int, default=200)
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError("--concurrency must be a comma separated list of integers.")
+
+        database = settings.DATABASES['default']
+        profile = {
+            'vendor': connection.vendor,
+            'engine': database['ENGINE'],
+            'pool_mode': getattr(settings, 'DB_POOL_MODE', None),
+            'conn_max_age': database.get('CONN_MAX_AGE'),
+        }
+        self.stdout.write(f"Backend: {profile['engine']} ({profile['vendor']}), pool mode {profile['pool_mode']}")
+
+        results = {'profile': profile, 'levels': []}
+        with bench.benchmark_database():
+            bench.seed(tables=options['tables'], menu_items=100, orders=0, open_ratio=0)
+            for level in levels:
+                recorder = bench.Recorder()
+                wall_time = bench.run_load(
+                    bench.SyntheticTraffic({'order': 1}), options['requests'], level, recorder,
+                )
+                row = recorder.summary(wall_time)['order']
+                ok = row['requests'] - row['errors']
+                results['levels'].append({
+                    'concurrency': level,
+                    'orders_per_second': round(ok / wall_time, 2),
+                    'errors': row['errors'],
+                    'p50_ms': row['p50_ms'],
+                    'p99_ms': row['p99_ms'],
+                })
+                self.stdout.write(
+                    f"concurrency {level:>3}: {ok / wall_time:8.1f} orders/s, {row['errors']} errors, "
+                    f"p50 {row['p50_ms']} ms, p99 {row['p99_ms']} ms"
+                )
+
+        if options['output']:
+            bench.write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
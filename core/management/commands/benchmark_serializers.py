@@ -0,0 +1,73 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from core import bench
+from core.fast_serializers import order_payloads
+from core.models import Order, OrderItem
+from core.renderers import FastJSONRenderer, orjson
+from core.serializers import OrderSerializer
+
+
+def drf_serialize(page_size):
+    orders = Order.objects.select_related('table').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('menu_item').order_by('id'))
+    ).order_by('-created_at', '-id')[:page_size]
+    return OrderSerializer(orders, many=True).data
+
+
+def fast_serialize(page_size):
+    ids = list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True)[:page_size])
+    return order_payloads(Order.objects.filter(pk__in=ids).order_by('-created_at', '-id'))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare OrderSerializer + JSONRenderer with the .values() order payloads + FastJSONRenderer "
+        "on a page of seeded orders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=200, help="Orders per rendered page.")
+        parser.add_argument('--items-per-order', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def time(self, func, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return result, round(statistics.median(samples), 3)
+
+    def handle(self, *args, **options):
+        page_size, repeat = options['page_size'], options['repeat']
+        results = {'page_size': page_size, 'orjson': orjson is not None}
+        with bench.benchmark_database():
+            bench.seed(tables=100, menu_items=200, orders=page_size * 2, items_per_order=options['items_per_order'])
+
+            drf_data, results['drf_serialize_ms'] = self.time(lambda: drf_serialize(page_size), repeat)
+            fast_data, results['fast_serialize_ms'] = self.time(lambda: fast_serialize(page_size), repeat)
+            drf_body, results['json_render_ms'] = self.time(lambda: JSONRenderer().render(drf_data), repeat)
+            fast_body, results['fast_render_ms'] = self.time(lambda: FastJSONRenderer().render(fast_data), repeat)
+
+        results['identical'] = drf_body == fast_body
+        results['bytes'] = len(fast_body)
+        results['speedup'] = round(
+            (results['drf_serialize_ms'] + results['json_render_ms'])
+            / (results['fast_serialize_ms'] + results['fast_render_ms']), 2
+        )
+
+        self.stdout.write(f"{page_size} orders per page, {results['bytes']} bytes, orjson {'on' if orjson else 'off'}")
+        self.stdout.write(f"  OrderSerializer  {results['drf_serialize_ms']:>9} ms   JSONRenderer      {results['json_render_ms']:>9} ms")
+        self.stdout.write(f"  order_payloads   {results['fast_serialize_ms']:>9} ms   FastJSONRenderer  {results['fast_render_ms']:>9} ms")
+        style = self.style.SUCCESS if results['identical'] else self.style.ERROR
+        self.stdout.write(style(f"  {results['speedup']}x faster, output identical: {results['identical']}"))
+
+        if options['output']:
+            bench.write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
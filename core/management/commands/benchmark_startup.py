@@ -0,0 +1,100 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import bench
+
+# Loaded on demand only: none of them should show up at boot of an API worker.
+HEAVY_MODULES = ('qrcode', 'PIL', 'import_export', 'tablib', 'drf_yasg')
+
+BOOT_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from django.utils.module_loading import import_string
+import_string({application!r})
+from core.startup import warm_up
+warm_up()
+print(json.dumps({{'boot_ms': (time.perf_counter() - started) * 1000}}))
+"""
+
+
+def _parse_importtime(stderr):
+    """Self import time in microseconds per top-level package, from ``python -X importtime`` output."""
+    packages = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us)
+    return packages
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure worker boot time per deployment role in fresh interpreters: loading the WSGI application and "
+        "warming it up as a preloaded gunicorn master would (core.startup.warm_up). Reports the import time per "
+        "top-level package and fails when the median boot time exceeds STARTUP_BUDGET_MS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--roles', default='backoffice,api', help="Comma separated DEPLOYMENT_ROLE values.")
+        parser.add_argument('--runs', type=int, default=5, help="Interpreters started per role.")
+        parser.add_argument('--top', type=int, default=12, help="Packages listed per role.")
+        parser.add_argument('--budget-ms', type=float,
+                            help="Budget for every role, instead of STARTUP_BUDGET_MS.")
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def handle(self, *args, **options):
+        budgets = getattr(settings, 'STARTUP_BUDGET_MS', {})
+        results = {'runs': options['runs'], 'roles': {}}
+        over_budget = []
+        for role in options['roles'].split(','):
+            result = self.measure(role, options['runs'])
+            budget = options['budget_ms'] or budgets.get(role)
+            result['budget_ms'] = budget
+            results['roles'][role] = result
+
+            self.stdout.write(f"{role}: boot {result['boot_ms']:.0f} ms (median of {options['runs']}), "
+                              f"imports {result['import_ms']:.0f} ms")
+            for package, ms in list(result['packages_ms'].items())[:options['top']]:
+                self.stdout.write(f"  {package:<28} {ms:>8.1f} ms")
+            if result['heavy_modules']:
+                self.stdout.write(self.style.WARNING(f"  loaded at boot: {', '.join(result['heavy_modules'])}"))
+            if budget is not None and result['boot_ms'] > budget:
+                over_budget.append(f"{role} ({result['boot_ms']:.0f} ms > {budget:.0f} ms)")
+
+        if options['output']:
+            bench.write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        if over_budget:
+            raise CommandError(f"Boot time budget exceeded: {', '.join(over_budget)}")
+        self.stdout.write(self.style.SUCCESS("Boot time within budget."))
+
+    def measure(self, role, runs):
+        env = dict(os.environ, DEPLOYMENT_ROLE=role,
+                   DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE or 'smart_order_api.settings')
+        script = BOOT_SCRIPT.format(application=settings.WSGI_APPLICATION)
+        boots, packages = [], defaultdict(list)
+        for _ in range(runs):
+            process = subprocess.run([sys.executable, '-X', 'importtime', '-c', script], env=env,
+                                     cwd=settings.BASE_DIR, capture_output=True, text=True)
+            if process.returncode:
+                raise CommandError(f"Boot of role {role!r} failed:\n{process.stderr[-2000:]}")
+            boots.append(json.loads(process.stdout.strip().splitlines()[-1])['boot_ms'])
+            for package, us in _parse_importtime(process.stderr).items():
+                packages[package].append(us / 1000)
+        medians = {package: statistics.median(values + [0] * (runs - len(values)))
+                   for package, values in packages.items()}
+        return {
+            'boot_ms': round(statistics.median(boots), 1),
+            'import_ms': round(sum(medians.values()), 1),
+            'packages_ms': {package: round(ms, 1)
+                            for package, ms in sorted(medians.items(), key=lambda item: -item[1])},
+            'heavy_modules': [module for module in HEAVY_MODULES if module in packages],
+        }
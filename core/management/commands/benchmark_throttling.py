@@ -0,0 +1,75 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from core import bench, throttling
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the cost of the customer admission control: token-bucket checks per store (hot keys and an "
+        "LRU churning past max_keys), and the added latency per menu request with admission control on and off."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=200000, help="Bucket checks per store scenario.")
+        parser.add_argument('--requests', type=int, default=3000, help="Menu requests per on/off round.")
+        parser.add_argument('--max-keys', type=int, default=10000)
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def time_checks(self, store, keys, checks):
+        rng = random.Random(1)
+        sequence = [rng.choice(keys) for _ in range(checks)]
+        started = time.perf_counter()
+        for key in sequence:
+            store.consume(key, 1000.0, 1000)
+        return (time.perf_counter() - started) / checks * 1e9
+
+    def time_requests(self, client, path, requests, enabled):
+        latencies = []
+        # Buckets that never run dry: the checks are measured, not the 429s.
+        rates = {'menu': {'client': (1e6, 1e6), 'table': (1e6, 1e6)}}
+        with override_settings(CUSTOMER_ADMISSION_CONTROL=enabled, CUSTOMER_THROTTLE_RATES=rates):
+            for index in range(requests):
+                started = time.perf_counter()
+                response = client.get(path, REMOTE_ADDR=f'10.1.{index // 250 % 250}.{index % 250}')
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.status_code
+        return statistics.median(latencies) * 1e6
+
+    def handle(self, *args, **options):
+        checks, max_keys = options['checks'], options['max_keys']
+        results = {'checks': checks, 'max_keys': max_keys, 'ns_per_check': {}}
+
+        scenarios = {
+            'memory_hot_keys': (throttling.MemoryBucketStore(max_keys), [f'menu:client:{i}' for i in range(100)]),
+            'memory_lru_churn': (throttling.MemoryBucketStore(max_keys),
+                                 [f'menu:client:{i}' for i in range(max_keys * 4)]),
+            'cache_locmem': (throttling.CacheBucketStore('default'), [f'menu:client:{i}' for i in range(100)]),
+        }
+        for name, (store, keys) in scenarios.items():
+            ns = self.time_checks(store, keys, checks)
+            results['ns_per_check'][name] = round(ns)
+            size = f", {len(store)} buckets kept" if isinstance(store, throttling.MemoryBucketStore) else ''
+            self.stdout.write(f"{name:<18} {ns:>8.0f} ns per bucket check{size}")
+
+        with bench.benchmark_database():
+            bench.seed(tables=100, menu_items=100, orders=0, open_ratio=0)
+            client = Client()
+            path = '/api/tables/T1/menu/'
+            self.time_requests(client, path, 200, False)
+            off = [self.time_requests(client, path, options['requests'], False) for _ in range(3)]
+            on = [self.time_requests(client, path, options['requests'], True) for _ in range(3)]
+        results['menu_request_median_us'] = {'off': round(min(off), 1), 'on': round(min(on), 1)}
+        results['overhead_us'] = round(min(on) - min(off), 1)
+        self.stdout.write(
+            f"menu request median: {min(off):.1f} us without, {min(on):.1f} us with admission control "
+            f"({min(on) - min(off):+.1f} us)"
+        )
+
+        if options['output']:
+            bench.write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,74 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core import bench
+from core.models import DailyMenuItemSales, DailySalesSummary, Order, OrderItem, Table
+
+# "SCAN core_order" without an index (SQLite) or "Seq Scan on core_order" (PostgreSQL).
+FULL_SCAN_PATTERNS = (
+    re.compile(r'\bSCAN (core_\w+)\b(?! USING (?:COVERING )?INDEX)(?! USING INTEGER PRIMARY KEY)'),
+    re.compile(r'Seq Scan on (core_\w+)'),
+)
+
+
+def hot_queries():
+    """The querysets behind the customer, staff and report endpoints, by name."""
+    table = Table.objects.order_by('table_number').first()
+    order = Order.objects.order_by('-id').first()
+    today = timezone.localdate()
+    since = timezone.now() - timedelta(minutes=5)
+    feed = Order.objects.order_by('-created_at', '-id')
+    return {
+        'open_order_for_table': Order.objects.open().filter(table=table),
+        'order_items_for_order': OrderItem.objects.filter(order=order).select_related('menu_item'),
+        'order_line_lookup': OrderItem.objects.filter(order=order, menu_item_id__in=[1, 2, 3]),
+        'staff_feed': feed[:50],
+        'staff_feed_by_status': feed.filter(status__in=['pending', 'preparing'])[:50],
+        'staff_feed_updated_since': feed.filter(updated_at__gte=since)[:50],
+        # The prefetch the staff feed issues for the items of one page.
+        'staff_feed_items': OrderItem.objects.select_related('menu_item').filter(
+            order__in=feed.values('id')[:50]
+        ),
+        'daily_sales_summary': DailySalesSummary.objects.filter(date__range=(today - timedelta(days=30), today)),
+        'daily_menu_item_sales': DailyMenuItemSales.objects.filter(date__range=(today - timedelta(days=30), today)),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database, run EXPLAIN on the hot order, staff feed and report queries and "
+        "fail if any of them falls back to a full table scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=20000, help="Orders to seed before planning.")
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan, not only failures.")
+
+    def handle(self, *args, **options):
+        failures = []
+        with bench.benchmark_database():
+            bench.seed(tables=500, menu_items=200, orders=options['orders'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            for name, queryset in hot_queries().items():
+                plan = queryset.explain()
+                scanned = sorted({
+                    match.group(1) for pattern in FULL_SCAN_PATTERNS for match in pattern.finditer(plan)
+                })
+                if scanned:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"{name}: full scan of {', '.join(scanned)}"))
+                    self.stdout.write(plan)
+                else:
+                    self.stdout.write(f"{name}: ok")
+                    if options['verbose_plans']:
+                        self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries scan a whole table: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All hot queries use an index."))
@@ -0,0 +1,31 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import openapi_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI document once and write it, with the fingerprint of the RELEASE_ID and URLconf it "
+        "was generated from, to OPENAPI_SCHEMA_ARTIFACT. Run at deploy time with the same environment as the "
+        "server; workers of that release then load it instead of generating the document themselves."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Path to write to. Defaults to OPENAPI_SCHEMA_ARTIFACT.")
+
+    def handle(self, *args, **options):
+        if not settings.API_DOCS_ENABLED:
+            raise CommandError(f"The API docs are disabled for DEPLOYMENT_ROLE={settings.DEPLOYMENT_ROLE!r}.")
+        if not getattr(settings, 'RELEASE_ID', None):
+            raise CommandError("Set RELEASE_ID: workers only load an artifact exported from their own release.")
+        path = options['output'] or getattr(settings, 'OPENAPI_SCHEMA_ARTIFACT', None)
+        if not path:
+            raise CommandError("Pass --output or set OPENAPI_SCHEMA_ARTIFACT.")
+        info = import_module(settings.ROOT_URLCONF).api_info
+        fingerprint = openapi_schema.write_artifact(path, info)
+        self.stdout.write(self.style.SUCCESS(
+            f"OpenAPI schema written to {path} (release {settings.RELEASE_ID}, fingerprint {fingerprint[:12]})."
+        ))
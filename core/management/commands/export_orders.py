@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core import exports
+from core.models import Order
+
+
+class Command(BaseCommand):
+    help = "Stream orders and their lines for accounting as CSV or NDJSON, optionally gzip-compressed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help="First day to export (YYYY-MM-DD).")
+        parser.add_argument('--end-date', help="Last day to export (YYYY-MM-DD).")
+        parser.add_argument('--status', default='', help="Comma separated order statuses to include.")
+        parser.add_argument('--format', dest='output_format', choices=exports.FORMATS, default='csv')
+        parser.add_argument('--output', help="File to write; defaults to stdout. A .gz suffix enables gzip.")
+        parser.add_argument('--gzip', action='store_true', help="Compress the output with gzip.")
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE,
+                            help="Rows fetched from the database cursor at a time.")
+
+    def handle(self, *args, **options):
+        start_date = self.parse(options['start_date'], '--start-date')
+        end_date = self.parse(options['end_date'], '--end-date')
+        if start_date and end_date and start_date > end_date:
+            raise CommandError("--start-date must not be after --end-date.")
+        statuses = [s for s in options['status'].split(',') if s]
+        valid_statuses = [s[0] for s in Order.STATUS_CHOICES]
+        if any(s not in valid_statuses for s in statuses):
+            raise CommandError(f"--status must be a comma separated list of: {', '.join(valid_statuses)}.")
+
+        path = options['output']
+        compress = options['gzip'] or bool(path and path.endswith('.gz'))
+        chunks = exports.export_chunks(options['output_format'], start_date, end_date, statuses,
+                                       compress=compress, chunk_size=options['chunk_size'])
+        if path:
+            with open(path, 'wb') as f:
+                written = sum(f.write(chunk) for chunk in chunks)
+            self.stderr.write(self.style.SUCCESS(f"Wrote {written} bytes to {path}"))
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+
+    def parse(self, value, option):
+        if value is None:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise CommandError(f"{option} must use the YYYY-MM-DD format.")
+        return parsed
@@ -0,0 +1,74 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from import_export.formats.base_formats import CSV, JSON, XLSX
+from import_export.results import RowResult
+
+from core.resources import MenuItemResource
+
+FORMATS = {'csv': CSV, 'json': JSON, 'xlsx': XLSX}
+
+
+def load_dataset(path, file_format):
+    fmt = FORMATS[file_format]()
+    if not fmt.is_available():
+        raise CommandError(f"The {file_format} format needs an extra package (e.g. openpyxl for xlsx).")
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not fmt.is_binary():
+        data = data.decode('utf-8-sig')
+    return fmt.create_dataset(data)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a menu file (e.g. the nightly price sync) through MenuItemResource: rows are matched by id "
+        "or name, written in bulk batches inside one transaction, and the menu cache is invalidated once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Menu file with id/name/description/price/is_available columns.")
+        parser.add_argument('--format', dest='file_format', choices=sorted(FORMATS),
+                            help="File format; guessed from the file extension by default.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would change.")
+        parser.add_argument('--batch-size', type=int, help="Rows per bulk write. Defaults to MENU_IMPORT_BATCH_SIZE.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(f"Unknown file format {file_format!r}; pass --format ({', '.join(sorted(FORMATS))}).")
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+        try:
+            dataset = load_dataset(path, file_format)
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+        result = MenuItemResource(batch_size=options['batch_size']).import_data(
+            dataset, dry_run=options['dry_run'], rollback_on_validation_errors=True,
+        )
+
+        for error in result.base_errors:
+            self.stderr.write(self.style.ERROR(str(error.error)))
+        for line, errors in result.row_errors():
+            for error in errors:
+                self.stderr.write(self.style.ERROR(f"Row {line}: {error.error}"))
+        for invalid in result.invalid_rows:
+            self.stderr.write(self.style.ERROR(f"Row {invalid.number}: {invalid.error_dict}"))
+        if options['verbosity'] > 1:
+            for row in result.valid_rows():
+                self.stdout.write(f"  {row.import_type:<6} {row.object_id or '-':>8}  {row.object_repr}")
+
+        totals = result.totals
+        summary = (
+            f"{len(dataset)} rows: {totals[RowResult.IMPORT_TYPE_NEW]} new, "
+            f"{totals[RowResult.IMPORT_TYPE_UPDATE]} updated, {totals[RowResult.IMPORT_TYPE_SKIP]} unchanged"
+        )
+        if result.has_errors() or result.has_validation_errors():
+            failed = totals[RowResult.IMPORT_TYPE_ERROR] + totals[RowResult.IMPORT_TYPE_INVALID]
+            raise CommandError(f"{summary}, {failed} failed. Nothing was imported.")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Dry run, nothing written. {summary}."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Imported {summary}."))
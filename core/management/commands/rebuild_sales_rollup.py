@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core import rollup
+
+
+class Command(BaseCommand):
+    help = "Backfill or rebuild the daily sales rollup used by the summary report."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help="First day to rebuild (YYYY-MM-DD). Defaults to the beginning of history.")
+        parser.add_argument('--end-date', help="Last day to rebuild (YYYY-MM-DD). Defaults to the latest order.")
+
+    def handle(self, *args, **options):
+        start_date = self.parse(options['start_date'], '--start-date')
+        end_date = self.parse(options['end_date'], '--end-date')
+        if start_date and end_date and start_date > end_date:
+            raise CommandError("--start-date must not be after --end-date.")
+
+        days, lines = rollup.rebuild(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {days} day(s) and {lines} menu item row(s)."))
+
+    def parse(self, value, option):
+        if value is None:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f"{option} must use the YYYY-MM-DD format.")
+        return parsed
@@ -0,0 +1,43 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import qr
+from core.models import Table
+
+
+class Command(BaseCommand):
+    help = "Regenerate table QR codes in parallel, e.g. after FRONTEND_BASE_URL changes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Number of rendering processes.")
+        parser.add_argument('--force', action='store_true', help="Re-render QR codes that are already up to date.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Tables rendered and saved per batch.")
+
+    def handle(self, *args, **options):
+        tables = Table.objects.order_by('table_number')
+        if not options['force']:
+            tables = [table for table in tables.iterator() if not table.qr_code_is_current()]
+        else:
+            tables = list(tables)
+
+        if not tables:
+            self.stdout.write("All QR codes are up to date.")
+            return
+
+        batch_size = options['batch_size']
+        # Rendering is CPU bound and runs in worker processes; storage and
+        # database writes stay in this process.
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            for start in range(0, len(tables), batch_size):
+                batch = tables[start:start + batch_size]
+                images = executor.map(qr.render_qr_png, [qr.qr_url(table.table_number) for table in batch])
+                for table, png in zip(batch, images):
+                    table.refresh_qr_code(force=True, png=png)
+                with transaction.atomic():
+                    Table.objects.bulk_update(batch, ['qr_code', 'qr_hash'])
+                self.stdout.write(f"Regenerated {start + len(batch)}/{len(tables)} QR codes.")
+
+        self.stdout.write(self.style.SUCCESS(f"Regenerated {len(tables)} QR code(s)."))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from core.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the stored total and item_count of every order against its order lines and recompute the ones "
+        "that drifted (e.g. after raw SQL edits), one short transaction per batch of order ids."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Order ids checked per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report drifted orders.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = Order.objects.aggregate(last=Max('id'))['last'] or 0
+        checked = drifted = 0
+        for start in range(0, last_id + 1, batch_size):
+            with transaction.atomic():
+                orders = Order.objects.filter(pk__gte=start, pk__lt=start + batch_size).with_expected_totals()
+                rows = orders.values_list('pk', 'total', 'item_count', 'expected_total', 'expected_item_count')
+                # Compared here rather than in SQL: SQLite sums prices as floats.
+                wrong = [row for row in rows if (row[1], row[2]) != (row[3], row[4])]
+                checked += len(rows)
+                if not wrong:
+                    continue
+                drifted += len(wrong)
+                for pk, total, item_count, expected_total, expected_item_count in wrong:
+                    self.stdout.write(f"Order {pk}: total {total} -> {expected_total}, "
+                                      f"item_count {item_count} -> {expected_item_count}")
+                if not options['dry_run']:
+                    ids = list(Order.objects.select_for_update().filter(pk__in=[row[0] for row in wrong])
+                               .values_list('pk', flat=True))
+                    Order.objects.filter(pk__in=ids).recompute_totals()
+
+        action = "found" if options['dry_run'] else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} orders, {action} {drifted} with drifted totals."))
@@ -0,0 +1,93 @@
+import hashlib
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .models import MenuItem
+from .serializers import CustomerMenuItemSerializer
+
+VERSION_KEY = 'menu:version'
+BODY_KEY = 'menu:body:{version}'
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'MENU_CACHE_ALIAS', 'default')]
+
+
+def get_version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 2, timeout=None)
+    with _local_lock:
+        _local.clear()
+
+
+def render_menu():
+    queryset = MenuItem.objects.filter(is_available=True)
+    body = JSONRenderer().render(CustomerMenuItemSerializer(queryset, many=True).data)
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+    return body, etag
+
+
+def get_menu():
+    """
+    Return ``(body, etag)`` for the customer menu.
+
+    The rendered body is kept in-process and in the configured Django cache
+    under the current menu version, so only the first request after a menu
+    change touches the database.
+    """
+    version = get_version()
+    entry = _local.get(version)
+    if entry is not None:
+        return entry
+
+    cache = _cache()
+    key = BODY_KEY.format(version=version)
+    entry = cache.get(key)
+    if entry is None:
+        entry = render_menu()
+        cache.set(key, entry, timeout=getattr(settings, 'MENU_CACHE_TIMEOUT', 60 * 60 * 24))
+
+    with _local_lock:
+        _local.clear()
+        _local[version] = entry
+    return entry
+
+
+async def aget_menu():
+    """``get_menu`` for async views: the version lookup and in-process hit stay on the event loop."""
+    version = await _cache().aget(VERSION_KEY)
+    entry = _local.get(version) if version is not None else None
+    if entry is not None:
+        return entry
+    return await sync_to_async(get_menu)()
+
+
+def menu_response(request, body, etag):
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
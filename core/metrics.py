@@ -0,0 +1,128 @@
+import bisect
+import hmac
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout; updates are O(log buckets)."""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        histogram = self.series.get(labels)
+        if histogram is None:
+            histogram = self.series[labels] = Histogram(self.buckets)
+        histogram.observe(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}'
+
+
+class Registry:
+    LABELS = ('view', 'method')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.metrics = {
+            'duration': Metric('smart_order_request_duration_seconds', "Wall time per request.", DURATION_BUCKETS),
+            'db_queries': Metric('smart_order_db_queries', "Database queries per request.", QUERY_BUCKETS),
+            'db_duration': Metric('smart_order_db_duration_seconds', "Database time per request.", DURATION_BUCKETS),
+            'render': Metric('smart_order_render_duration_seconds', "Response rendering time per request.", DURATION_BUCKETS),
+            'size': Metric('smart_order_response_size_bytes', "Response body size.", SIZE_BUCKETS),
+        }
+
+    def record(self, view, method, status_code, duration, db_queries, db_duration, render, size):
+        labels = (view, method)
+        with self.lock:
+            key = labels + (status_code,)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.metrics['duration'].observe(labels, duration)
+            self.metrics['db_queries'].observe(labels, db_queries)
+            self.metrics['db_duration'].observe(labels, db_duration)
+            self.metrics['render'].observe(labels, render)
+            if size is not None:
+                self.metrics['size'].observe(labels, size)
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+            for metric in self.metrics.values():
+                metric.series.clear()
+
+    def render(self):
+        """Return every series in the Prometheus text exposition format."""
+        with self.lock:
+            lines = [
+                '# HELP smart_order_requests_total Requests served, by view and status code.',
+                '# TYPE smart_order_requests_total counter',
+            ]
+            for (view, method, status_code), count in sorted(self.requests.items()):
+                labels = _format_labels(self.LABELS + ('status',), (view, method, status_code))
+                lines.append(f'smart_order_requests_total{labels} {count}')
+
+            for metric in self.metrics.values():
+                lines.append(f'# HELP {metric.name} {metric.help_text}')
+                lines.append(f'# TYPE {metric.name} histogram')
+                for labels, histogram in sorted(metric.series.items()):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        bucket_labels = _format_labels(self.LABELS, labels, f'le="{bound}"')
+                        lines.append(f'{metric.name}_bucket{bucket_labels} {cumulative}')
+                    series_labels = _format_labels(self.LABELS, labels)
+                    lines.append(f'{metric.name}_sum{series_labels} {histogram.sum}')
+                    lines.append(f'{metric.name}_count{series_labels} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Scrapers authenticate with the bearer token
+    ``PERF_METRICS_TOKEN``; without a token configured only staff sessions
+    (e.g. logged in to the admin) may read it.
+    """
+    token = getattr(settings, 'PERF_METRICS_TOKEN', None)
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            return HttpResponse(status=401)
+    elif not request.user.is_staff:
+        return HttpResponse(status=403)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
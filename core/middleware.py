@@ -0,0 +1,154 @@
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import registry
+
+logger = logging.getLogger('core.performance')
+
+
+class _RequestStats:
+    __slots__ = ('queries', 'db_time', 'worst_sql', 'worst_time', 'render_started', 'render_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.worst_sql = None
+        self.worst_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            if elapsed > self.worst_time:
+                self.worst_time = elapsed
+                self.worst_sql = sql
+
+    def rendered(self, response):
+        self.render_time = time.perf_counter() - self.render_started
+
+
+# Under ASGI the view's queries run on a worker thread whose connection the
+# middleware cannot reach, so they are attributed through a context variable
+# (copied into sync_to_async threads) by a wrapper every connection carries.
+_async_stats = ContextVar('request_stats', default=None)
+
+
+def _record_async_query(execute, sql, params, many, context):
+    stats = _async_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def _track_async_queries(sender, connection, **kwargs):
+    if _record_async_query not in connection.execute_wrappers:
+        # First, so execute_wrapper() blocks entered before connecting still pop their own wrapper.
+        connection.execute_wrappers.insert(0, _record_async_query)
+
+
+def view_name(request):
+    """``OrderView.post`` / ``StaffOrderViewSet.list`` style label for the resolved view."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    func = match.func
+    view_class = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    if view_class is None:
+        return getattr(func, '__name__', match.view_name)
+    actions = getattr(func, 'actions', None) or {}
+    return f"{view_class.__name__}.{actions.get(request.method.lower(), request.method.lower())}"
+
+
+class PerformanceMiddleware:
+    """
+    Record wall time, DB query count and time, render time and response size
+    per resolved view into the in-memory histograms served by the metrics
+    endpoint. Requests slower than ``PERF_SLOW_REQUEST_MS`` are logged with
+    their slowest SQL statement.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERF_METRICS_ENABLED', True)
+        self.slow_request_ms = getattr(settings, 'PERF_SLOW_REQUEST_MS', None)
+        # Under ASGI, stay async so async views are not pushed onto a thread.
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        stats = self.start(request)
+        started = time.perf_counter()
+        with self.wrap_queries(stats):
+            response = self.get_response(request)
+        self.finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        stats = self.start(request)
+        token = _async_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _async_stats.reset(token)
+        self.finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def start(self, request):
+        stats = _RequestStats()
+        request._performance_stats = stats
+        return stats
+
+    def wrap_queries(self, stats):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+        return stack
+
+    def finish(self, request, response, stats, duration):
+        size = None if response.streaming else len(response.content)
+        view = view_name(request)
+        registry.record(view, request.method, response.status_code, duration, stats.queries, stats.db_time,
+                        stats.render_time, size)
+
+        if self.slow_request_ms is not None and duration * 1000 >= self.slow_request_ms:
+            logger.warning(
+                "Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms, render %.1f ms, %s bytes. "
+                "Slowest query (%.1f ms): %s",
+                request.method, request.path, view, duration * 1000, stats.queries, stats.db_time * 1000,
+                stats.render_time * 1000, size, stats.worst_time * 1000, (stats.worst_sql or '')[:2000],
+            )
+
+    def process_template_response(self, request, response):
+        stats = getattr(request, '_performance_stats', None)
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+            response.add_post_render_callback(stats.rendered)
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.23 on 2026-10-17 02:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_menuitem_created_at_table_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='营业日期', unique=True)),
+                ('order_count', models.IntegerField(default=0, help_text='当日已完成订单数')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='当日营业额', max_digits=12)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyMenuItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='营业日期')),
+                ('quantity', models.IntegerField(default=0, help_text='当日售出份数')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='当日该菜品营业额', max_digits=12)),
+                ('menu_item', models.ForeignKey(help_text='菜品', on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='core.menuitem')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailymenuitemsales',
+            constraint=models.UniqueConstraint(fields=('date', 'menu_item'), name='unique_daily_menu_item_sales'),
+        ),
+    ]
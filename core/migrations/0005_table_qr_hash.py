@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_daily_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='table',
+            name='qr_hash',
+            field=models.CharField(blank=True, editable=False, help_text='生成二维码时所用链接的哈希', max_length=64),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.23 on 2026-10-17 02:28
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def merge_open_orders(apps, schema_editor):
+    """
+    Tables with several open (unpaid, neither completed nor cancelled)
+    orders keep the newest one: the lines of the others move into it and
+    they are cancelled. Completed but unpaid bills are left alone.
+    """
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    open_orders = Order.objects.filter(is_paid=False).exclude(status__in=['completed', 'cancelled'])
+    tables = open_orders.values('table_id').annotate(orders=Count('id')).filter(orders__gt=1)
+
+    for table in tables:
+        orders = list(open_orders.filter(table_id=table['table_id']).order_by('-created_at', '-id'))
+        keep, merged = orders[0], orders[1:]
+        OrderItem.objects.filter(order__in=merged).update(order=keep)
+        Order.objects.filter(id__in=[order.id for order in merged]).update(
+            status='cancelled', updated_at=timezone.now(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_table_qr_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_open_orders, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_paid', False), models.Q(('status__in', ['completed', 'cancelled']), _negated=True)), fields=('table',), name='unique_open_order_per_table'),
+        ),
+    ]
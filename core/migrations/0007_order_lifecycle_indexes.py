@@ -0,0 +1,48 @@
+# Generated by Django 4.2.23 on 2026-10-17 02:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_order_items(apps, schema_editor):
+    OrderItem = apps.get_model('core', 'OrderItem')
+    duplicates = OrderItem.objects.values('order_id', 'menu_item_id').annotate(lines=Count('id')).filter(lines__gt=1)
+    for duplicate in duplicates:
+        items = list(OrderItem.objects.filter(
+            order_id=duplicate['order_id'], menu_item_id=duplicate['menu_item_id']
+        ).order_by('id'))
+        keep = items[0]
+        keep.quantity = sum(item.quantity for item in items)
+        keep.save(update_fields=['quantity'])
+        OrderItem.objects.filter(id__in=[item.id for item in items[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_unique_open_order_per_table'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['table', 'is_paid'], name='order_table_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-id'], name='order_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at'], name='order_updated_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_order_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order', 'menu_item'), name='unique_order_menu_item'),
+        ),
+    ]
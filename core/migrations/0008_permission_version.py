@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-17 02:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0007_order_lifecycle_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PermissionVersion',
+            fields=[
+                ('user', models.OneToOneField(help_text='用户', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='permission_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.PositiveIntegerField(default=0, help_text='用户组或权限每次变更时递增，令牌中的版本号与之不一致时重新读取用户')),
+            ],
+        ),
+    ]
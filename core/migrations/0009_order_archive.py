@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-17 02:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_permission_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('table_number', models.CharField(help_text='订单所属的餐桌号', max_length=10)),
+                ('status', models.CharField(choices=[('pending', '待处理'), ('preparing', '准备中'), ('served', '已上菜'), ('completed', '已完成'), ('cancelled', '已取消')], help_text='订单状态', max_length=20)),
+                ('is_paid', models.BooleanField(help_text='订单是否已支付')),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True, help_text='归档时间')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField(help_text='菜品份数')),
+                ('price', models.DecimalField(decimal_places=2, help_text='下单时的菜品单价', max_digits=8)),
+                ('menu_item', models.ForeignKey(help_text='具体的菜品', on_delete=django.db.models.deletion.CASCADE, to='core.menuitem')),
+                ('order', models.ForeignKey(help_text='所属的归档订单', on_delete=django.db.models.deletion.CASCADE, related_name='items', to='core.archivedorder')),
+            ],
+        ),
+    ]
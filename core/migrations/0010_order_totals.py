@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:21
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_order_totals(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    lines = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    total = lines.annotate(amount=Sum(F('price') * F('quantity'))).values('amount')
+    item_count = lines.annotate(count=Sum('quantity')).values('count')
+    last_id = Order.objects.aggregate(last=Max('id'))['last'] or 0
+    for start in range(0, last_id + 1, 10000):
+        Order.objects.filter(id__gte=start, id__lt=start + 10000).update(
+            total=Coalesce(Subquery(total, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+                           Decimal('0')),
+            item_count=Coalesce(Subquery(item_count), 0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_order_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, help_text='订单菜品总份数'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='订单总金额，随菜品增删改在同一事务中更新', max_digits=12),
+        ),
+        migrations.RunPython(backfill_order_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:33
+
+from django.db import migrations, models
+
+
+def release_tables_of_completed_orders(apps, schema_editor):
+    """Completed orders no longer hold their table; free tables left occupied by one."""
+    Order = apps.get_model('core', 'Order')
+    Table = apps.get_model('core', 'Table')
+    running = Order.objects.filter(is_paid=False).exclude(status__in=['completed', 'cancelled'])
+    Table.objects.filter(
+        is_available=False,
+        pk__in=Order.objects.filter(is_paid=False, status='completed').values('table_id'),
+    ).exclude(pk__in=running.values('table_id')).update(is_available=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_order_totals'),
+    ]
+
+    # 0006 has used this condition since it learned to merge open orders; rebuild the constraint
+    # on databases that applied its earlier version, which did not exclude completed orders.
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='order',
+            name='unique_open_order_per_table',
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_paid', False), models.Q(('status__in', ['completed', 'cancelled']), _negated=True)), fields=('table',), name='unique_open_order_per_table'),
+        ),
+        migrations.RunPython(release_tables_of_completed_orders, migrations.RunPython.noop),
+    ]
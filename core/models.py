@@ -1,28 +1,43 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
-from django.conf import settings
 from django.core.files.base import ContentFile
-from io import BytesIO
-import qrcode
+from . import qr
 
 class Table(models.Model):
     table_number = models.CharField(max_length=10, unique=True, primary_key=True, help_text="唯一的餐桌号")
     is_available = models.BooleanField(default=True, help_text="餐桌当前是否可用?")
     qr_code = models.ImageField(upload_to='qr_codes/', blank=True, null=True, help_text="自动生成的二维码")
+    qr_hash = models.CharField(max_length=64, blank=True, editable=False, help_text="生成二维码时所用链接的哈希")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
 
     def __str__(self):
         return f"Table {self.table_number}"
 
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'table_number' in update_fields:
+            self.refresh_qr_code()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'qr_code', 'qr_hash'}
         super().save(*args, **kwargs)
-        qr_url = f"{settings.FRONTEND_BASE_URL}/{self.table_number}"
-        qr_img = qrcode.make(qr_url)
-        buffer = BytesIO()
-        qr_img.save(buffer, format='PNG')
-        file_name = f'table_{self.table_number}_qr.png'
-        self.qr_code.save(file_name, ContentFile(buffer.getvalue()), save=False)
-        super().save(update_fields=['qr_code'])
+
+    def qr_code_is_current(self):
+        return bool(self.qr_code) and self.qr_hash == qr.qr_hash(qr.qr_url(self.table_number))
+
+    def refresh_qr_code(self, force=False, png=None):
+        """Render the QR code only when its target URL changed since the last render."""
+        if self.qr_code_is_current() and not force:
+            return False
+        url = qr.qr_url(self.table_number)
+        if png is None:
+            png = qr.render_qr_png(url)
+        self.qr_code.save(qr.qr_file_name(self.table_number), ContentFile(png), save=False)
+        self.qr_hash = qr.qr_hash(url)
+        return True
 
 class MenuItem(models.Model):
     name = models.CharField(max_length=100, unique=True, help_text="菜品名称")
@@ -34,6 +49,39 @@ class MenuItem(models.Model):
     def __str__(self):
         return self.name
 
+class OrderQuerySet(models.QuerySet):
+    def open(self):
+        """
+        Orders still running up a bill: unpaid, neither completed nor
+        cancelled. A table has at most one; once the kitchen completes an
+        order the next cart opens a new one and the table can be released.
+        """
+        return self.filter(is_paid=False).exclude(status__in=Order.CLOSED_STATUSES)
+
+    def adjust_totals(self, item_count, amount):
+        """Add to the stored totals with one atomic UPDATE, safe against concurrent changes."""
+        return self.update(item_count=F('item_count') + item_count, total=F('total') + amount)
+
+    def with_expected_totals(self):
+        """Annotate ``expected_total``/``expected_item_count`` summed from the order lines."""
+        lines = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        return self.annotate(
+            expected_total=Coalesce(
+                Subquery(lines.annotate(amount=Sum(F('price') * F('quantity'))).values('amount'),
+                         output_field=Order._meta.get_field('total')),
+                Decimal('0'),
+            ),
+            expected_item_count=Coalesce(Subquery(lines.annotate(count=Sum('quantity')).values('count')), 0),
+        )
+
+    def recompute_totals(self):
+        """Overwrite the stored totals with the sums of the order lines."""
+        expected = Order.objects.with_expected_totals().filter(pk=OuterRef('pk'))
+        return self.update(
+            total=Subquery(expected.values('expected_total')),
+            item_count=Subquery(expected.values('expected_item_count')),
+        )
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', '待处理'),
@@ -42,18 +90,46 @@ class Order(models.Model):
         ('completed', '已完成'),
         ('cancelled', '已取消'),
     ]
+    CLOSED_STATUSES = ('completed', 'cancelled')
+    # Target statuses the kitchen may move an order to from each status.
+    ALLOWED_TRANSITIONS = {
+        'pending': ('preparing', 'served', 'cancelled'),
+        'preparing': ('served', 'cancelled'),
+        'served': ('preparing', 'completed'),
+        'completed': (),
+        'cancelled': (),
+    }
     table = models.ForeignKey(Table, on_delete=models.PROTECT, related_name='orders', help_text="订单所属的餐桌")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', help_text="订单状态")
     is_paid = models.BooleanField(default=False, help_text="订单是否已支付")
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="订单总金额，随菜品增删改在同一事务中更新")
+    item_count = models.PositiveIntegerField(default=0, help_text="订单菜品总份数")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['table'],
+                condition=models.Q(is_paid=False) & ~models.Q(status__in=['completed', 'cancelled']),
+                name='unique_open_order_per_table',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['table', 'is_paid'], name='order_table_paid_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_feed_idx'),
+            models.Index(fields=['updated_at'], name='order_updated_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} for {self.table}"
 
     @property
     def total_price(self):
-        return sum(item.price * item.quantity for item in self.items.all())
+        return self.total
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', help_text="所属的订单")
@@ -61,10 +137,99 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(default=1, help_text="菜品份数")
     price = models.DecimalField(max_digits=8, decimal_places=2, help_text="下单时的菜品单价")
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'menu_item'], name='unique_order_menu_item'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.id:
             self.price = self.menu_item.price
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            previous = self._locked_row()
+            super().save(*args, **kwargs)
+            item_count, amount = self.quantity, self.quantity * self._meta.get_field('price').to_python(self.price)
+            if previous is not None and previous[0] == self.order_id:
+                item_count, amount = item_count - previous[1], amount - previous[1] * previous[2]
+            elif previous is not None:
+                self._adjust_order_totals(previous[0], -previous[1], -previous[1] * previous[2])
+            if item_count or amount:
+                self._adjust_order_totals(self.order_id, item_count, amount)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self._locked_row()
+            result = super().delete(*args, **kwargs)
+            if previous is not None:
+                self._adjust_order_totals(previous[0], -previous[1], -previous[1] * previous[2])
+        return result
+
+    def _adjust_order_totals(self, order_id, item_count, amount):
+        Order.objects.filter(pk=order_id).adjust_totals(item_count, amount)
+        # Keep an order instance loaded through this line in step with the row.
+        order = self._state.fields_cache.get('order')
+        if order is not None and order.pk == order_id:
+            order.item_count += item_count
+            order.total += amount
+
+    def _locked_row(self):
+        """``(order_id, quantity, price)`` as stored, locked until the end of the transaction."""
+        if self._state.adding or self.pk is None:
+            return None
+        return OrderItem.objects.select_for_update().filter(pk=self.pk).values_list(
+            'order_id', 'quantity', 'price').first()
+
+    def __str__(self):
+        return f"{self.quantity} x {self.menu_item.name} for Order {self.order.id}"
+
+class ArchivedOrder(models.Model):
+    """Closed order moved out of the live tables by ``archive_orders``; ids are kept."""
+    id = models.BigIntegerField(primary_key=True)
+    table_number = models.CharField(max_length=10, help_text="订单所属的餐桌号")
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, help_text="订单状态")
+    is_paid = models.BooleanField(help_text="订单是否已支付")
+    created_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True, help_text="归档时间")
+
+    def __str__(self):
+        return f"Archived order {self.id} for table {self.table_number}"
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items', help_text="所属的归档订单")
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, help_text="具体的菜品")
+    quantity = models.PositiveIntegerField(help_text="菜品份数")
+    price = models.DecimalField(max_digits=8, decimal_places=2, help_text="下单时的菜品单价")
+
+    def __str__(self):
+        return f"{self.quantity} x {self.menu_item_id} for archived order {self.order_id}"
+
+class DailySalesSummary(models.Model):
+    date = models.DateField(unique=True, help_text="营业日期")
+    order_count = models.IntegerField(default=0, help_text="当日已完成订单数")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="当日营业额")
+
+    def __str__(self):
+        return f"Sales summary for {self.date}"
+
+class DailyMenuItemSales(models.Model):
+    date = models.DateField(help_text="营业日期")
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='daily_sales', help_text="菜品")
+    quantity = models.IntegerField(default=0, help_text="当日售出份数")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="当日该菜品营业额")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'menu_item'], name='unique_daily_menu_item_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.menu_item} sales for {self.date}"
+
+class PermissionVersion(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='permission_version', help_text="用户")
+    version = models.PositiveIntegerField(default=0, help_text="用户组或权限每次变更时递增，令牌中的版本号与之不一致时重新读取用户")
 
     def __str__(self):
-        return f"{self.quantity} x {self.menu_item.name} for Order {self.order.id}"
\ No newline at end of file
+        return f"Permission version {self.version} for {self.user_id}"
@@ -0,0 +1,155 @@
+"""
+The OpenAPI document served by /swagger.json, /swagger.yaml and the
+``?format=openapi`` requests of the /swagger/ and /redoc/ pages.
+
+drf_yasg walks every view and serializer to build the document on each
+request. It only depends on the code, so here it is built once per process
+(or loaded from the artifact ``manage.py export_openapi_schema`` writes at
+deploy time) and kept in memory as ready-to-send bytes, gzipped bytes and an
+ETag. It is keyed by a fingerprint of the URLconf and rebuilt when that
+changes. Serializer changes do not show in the URLconf, so the artifact is
+only trusted when it was exported from the running ``RELEASE_ID``. The
+document is built without a request, so it has no ``host`` or
+``schemes``; clients resolve it against the server that served it.
+"""
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.urls import URLResolver, get_resolver
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml, yaml_sane_dump
+from drf_yasg.generators import OpenAPISchemaGenerator
+
+CONTENT_TYPES = {
+    '.json': ('json', 'application/json; charset=utf-8'),
+    '.yaml': ('yaml', 'application/yaml; charset=utf-8'),
+    'openapi': ('json', 'application/openapi+json; charset=utf-8'),
+}
+
+_documents = {}
+_lock = threading.Lock()
+
+
+class Encoding:
+    def __init__(self, body):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+@lru_cache(maxsize=8)
+def _resolver_fingerprint(resolver):
+    digest = hashlib.sha256()
+
+    def walk(patterns, prefix):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns, prefix + str(pattern.pattern))
+                continue
+            callback = pattern.callback
+            view = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None) or callback
+            actions = sorted(getattr(callback, 'actions', None) or {})
+            digest.update(
+                f'{prefix}{pattern.pattern}|{pattern.name}|{view.__module__}.{view.__qualname__}|{actions}\n'.encode()
+            )
+
+    walk(resolver.url_patterns, '')
+    return digest.hexdigest()
+
+
+def urlconf_fingerprint(info, urlconf=None):
+    """Identifies the document: the release, the URL patterns, the views behind them and the API info."""
+    info = json.dumps(info, sort_keys=True, default=str)
+    release = getattr(settings, 'RELEASE_ID', None)
+    return hashlib.sha256(f'{release}|{_resolver_fingerprint(get_resolver(urlconf))}|{info}'.encode()).hexdigest()
+
+
+def generate(info, urlconf=None):
+    """The document as ``{'json': bytes, 'yaml': bytes}``, exactly as drf_yasg's renderers would encode it."""
+    swagger = OpenAPISchemaGenerator(info, urlconf=urlconf).get_schema(request=None, public=True)
+    return {'json': OpenAPICodecJson([]).encode(swagger), 'yaml': OpenAPICodecYaml([]).encode(swagger)}
+
+
+def write_artifact(path, info, urlconf=None):
+    fingerprint = urlconf_fingerprint(info, urlconf)
+    document = generate(info, urlconf)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint, 'schema': json.loads(document['json'])}, f, ensure_ascii=False)
+    return fingerprint
+
+
+def _load_artifact(fingerprint):
+    path = getattr(settings, 'OPENAPI_SCHEMA_ARTIFACT', None)
+    if not path or not getattr(settings, 'RELEASE_ID', None):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            artifact = json.load(f, object_pairs_hook=OrderedDict)
+    except (OSError, ValueError):
+        return None
+    if artifact.get('fingerprint') != fingerprint:
+        return None
+    schema = artifact['schema']
+    return {
+        'json': json.dumps(schema, ensure_ascii=False).encode('utf-8'),
+        'yaml': yaml_sane_dump(schema, binary=True),
+    }
+
+
+def get_document(info, urlconf=None):
+    """``{'json': Encoding, 'yaml': Encoding}`` for the current URLconf, built at most once per fingerprint."""
+    key = (_resolver_fingerprint(get_resolver(urlconf)), id(info))
+    document = _documents.get(key)
+    if document is None:
+        with _lock:
+            document = _documents.get(key)
+            if document is None:
+                encoded = _load_artifact(urlconf_fingerprint(info, urlconf)) or generate(info, urlconf)
+                document = {codec: Encoding(body) for codec, body in encoded.items()}
+                _documents.clear()
+                _documents[key] = document
+    return document
+
+
+def reset():
+    _documents.clear()
+
+
+def schema_response(request, info, format):
+    codec, content_type = CONTENT_TYPES[format]
+    encoding = get_document(info)[codec]
+    if encoding.etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(encoding.gzipped, content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(encoding.body, content_type=content_type)
+    response['ETag'] = encoding.etag
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def schema_view(info):
+    """View for ``^swagger(?P<format>\\.json|\\.yaml)$``."""
+    @require_safe
+    def view(request, format):
+        return schema_response(request, info, format)
+    return view
+
+
+def ui_view(info, view):
+    """Wrap a drf_yasg ``with_ui`` view so the spec its page fetches (``?format=openapi``) comes from memory."""
+    def wrapped(request, *args, **kwargs):
+        if request.GET.get('format') == 'openapi':
+            return schema_response(request, info, 'openapi')
+        return view(request, *args, **kwargs)
+    return wrapped
@@ -5,4 +5,7 @@ class IsInManagerGroup(BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
 
+        group_names = getattr(request.user, 'group_names', None)
+        if group_names is not None:
+            return 'managers' in group_names
         return request.user.groups.filter(name='managers').exists()
\ No newline at end of file
@@ -0,0 +1,120 @@
+import hashlib
+import threading
+import zipfile
+from collections import OrderedDict
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils.text import get_valid_filename
+
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+_images = OrderedDict()
+_images_lock = threading.Lock()
+
+
+def qr_url(table_number):
+    return f"{settings.FRONTEND_BASE_URL}/{table_number}"
+
+
+def qr_hash(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def qr_version(url):
+    """Short tag of the image content for ``url``, used in its immutable URL and as its ETag."""
+    return qr_hash(url)[:16]
+
+
+def qr_file_name(table_number):
+    return f'table_{table_number}_qr.png'
+
+
+def archive_name(table_number, image_format):
+    """ZIP entry name of a table's QR code; table numbers that are not plain file names get a hash suffix."""
+    try:
+        name = get_valid_filename(table_number)
+    except SuspiciousFileOperation:
+        name = ''
+    if name != table_number:
+        name = f'{name}-{qr_hash(table_number)[:8]}'
+    return f'table_{name}_qr.{image_format}'
+
+
+def render_qr_png(url):
+    # qrcode pulls in Pillow; import it only when an image is actually rendered.
+    import qrcode
+
+    qr_img = qrcode.make(url)
+    buffer = BytesIO()
+    qr_img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_qr_svg(url):
+    import qrcode
+    from qrcode.image.svg import SvgPathImage
+
+    return qrcode.make(url, image_factory=SvgPathImage).to_string()
+
+
+RENDERERS = {'png': render_qr_png, 'svg': render_qr_svg}
+
+
+def qr_image(url, image_format, cache=True):
+    """
+    The ``image_format`` QR code for ``url``, from an in-process LRU of the
+    last ``QR_IMAGE_CACHE_SIZE`` rendered images. ``cache=False`` still reads
+    the LRU but does not fill it, for one-off bulk renders.
+    """
+    key = (url, image_format)
+    with _images_lock:
+        image = _images.get(key)
+        if image is not None:
+            _images.move_to_end(key)
+            return image
+    image = RENDERERS[image_format](url)
+    if cache:
+        with _images_lock:
+            _images[key] = image
+            while len(_images) > getattr(settings, 'QR_IMAGE_CACHE_SIZE', 1000):
+                _images.popitem(last=False)
+    return image
+
+
+class _ZipStream:
+    """Write-only file for ``ZipFile`` that hands over what was written so far."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        chunk = b''.join(self.chunks)
+        self.chunks = []
+        return chunk
+
+
+def zip_chunks(entries):
+    """
+    Stream a ZIP archive of ``(name, data, compress)`` entries: each entry is
+    yielded once written, so only one image is held at a time.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w') as archive:
+        for name, data, compress in entries:
+            info = zipfile.ZipInfo(name)
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, data)
+            chunk = stream.pop()
+            if chunk:
+                yield chunk
+    yield stream.pop()
@@ -0,0 +1,34 @@
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = encoders.JSONEncoder()
+# Leave datetimes to DRF's encoder so they keep its (millisecond) format.
+_ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` that encodes compact responses with orjson when it is
+    installed. For the payloads the views produce (strings, integers,
+    booleans, Decimals rendered as strings, datetimes) the bytes are the
+    same as the stock renderer's. Floats are not covered: orjson spells
+    some differently (``1e16`` for ``1e+16``) and encodes NaN and infinity
+    as ``null``. Indented output (``; indent=`` or the browsable API),
+    ASCII-only settings and payloads orjson cannot encode go through
+    ``JSONRenderer``.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
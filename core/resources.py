@@ -0,0 +1,167 @@
+import copy
+
+from django.conf import settings
+from django.db import transaction
+from import_export import resources
+from import_export.instance_loaders import ModelInstanceLoader
+from import_export.results import RowResult
+
+from . import menu_cache
+from .models import MenuItem
+
+
+class MenuItemInstanceLoader(ModelInstanceLoader):
+    """
+    Loads every menu item a dataset refers to up front: by ``id``, or by
+    ``name`` for rows without an id, a few hundred keys per query.
+    """
+    chunk_size = 500
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.id_field = self.resource.fields['id']
+        self.name_field = self.resource.fields['name']
+        ids, names = set(), set()
+        for row in self.dataset.dict:
+            try:
+                pk = self.clean_id(row)
+                if pk is not None:
+                    ids.add(pk)
+                elif row.get(self.name_field.column_name):
+                    names.add(self.name_field.clean(row))
+            except ValueError:
+                continue
+        self.by_id = self.load('pk', ids)
+        self.by_name = {item.name: item for item in self.load('name', names).values()}
+
+    def load(self, field, values):
+        values = list(values)
+        instances = {}
+        for start in range(0, len(values), self.chunk_size):
+            chunk = values[start:start + self.chunk_size]
+            instances.update((item.pk, item) for item in self.get_queryset().filter(**{f'{field}__in': chunk}))
+        return instances
+
+    def clean_id(self, row):
+        if row.get(self.id_field.column_name) in (None, ''):
+            return None
+        return self.id_field.clean(row)
+
+    def get_instance(self, row):
+        pk = self.clean_id(row)
+        if pk is not None:
+            return self.by_id.get(pk)
+        if row.get(self.name_field.column_name):
+            return self.by_name.get(self.name_field.clean(row))
+        return None
+
+
+class MenuItemResource(resources.ModelResource):
+    """
+    Bulk menu import: rows are matched to existing dishes by ``id`` or
+    ``name``, compared with a snapshot of the matched row (no deep copies),
+    unchanged rows are skipped and the rest are written with
+    ``bulk_create``/``bulk_update`` every ``batch_size`` rows inside one
+    transaction. The menu cache is bumped once after commit. Dry runs only
+    compute the diff and never write.
+    """
+
+    class Meta:
+        model = MenuItem
+        fields = ('id', 'name', 'description', 'price', 'is_available', 'created_at')
+        export_order = fields
+        import_id_fields = ['id']
+        skip_admin_log = True
+        instance_loader_class = MenuItemInstanceLoader
+        use_bulk = True
+        use_transactions = True
+        skip_unchanged = True
+        report_skipped = False
+        skip_diff = True
+
+    def __init__(self, batch_size=None, **kwargs):
+        super().__init__(**kwargs)
+        self._meta = copy.copy(self._meta)
+        self._meta.batch_size = batch_size or getattr(settings, 'MENU_IMPORT_BATCH_SIZE', 1000)
+        self.import_fields = self.get_import_fields()
+        self.diff_headers = self.get_diff_headers()
+        self.original = self.changes = None
+        self.update_fields = set()
+
+    def field_values(self, instance):
+        return {field.column_name: field.get_value(instance) for field in self.import_fields}
+
+    def get_instance(self, instance_loader, row):
+        # Rows may carry only a name, so don't require an id column.
+        instance = instance_loader.get_instance(row)
+        self.original = self.field_values(instance) if instance is not None else None
+        return instance
+
+    def import_field(self, field, instance, row, is_m2m=False, **kwargs):
+        # A blank id must not clear the pk of a dish matched by name.
+        if field.attribute == 'id' and row.get(field.column_name) in (None, ''):
+            return
+        super().import_field(field, instance, row, is_m2m, **kwargs)
+
+    def skip_row(self, instance, original, row, import_validation_errors=None):
+        values = self.field_values(instance)
+        if self.original is None:
+            self.changes = {name: (None, value) for name, value in values.items()}
+            return False
+        self.changes = {name: (self.original[name], value)
+                        for name, value in values.items() if value != self.original[name]}
+        self.update_fields.update(self.fields[name].attribute for name in self.changes)
+        return self._meta.skip_unchanged and not self.changes and not import_validation_errors
+
+    def import_row(self, row, instance_loader, **kwargs):
+        self.original = self.changes = None
+        row_result = super().import_row(row, instance_loader, **kwargs)
+        if self.changes is not None and row_result.import_type in (RowResult.IMPORT_TYPE_NEW,
+                                                                    RowResult.IMPORT_TYPE_UPDATE):
+            row_result.changes = self.changes
+            row_result.diff = [
+                self.render_change(*self.changes[header]) if header in self.changes else self.original[header]
+                for header in self.diff_headers
+            ]
+        return row_result
+
+    def render_change(self, old, new):
+        if old is None:
+            return '' if new is None else new
+        return f'{old} → {new}'
+
+    def bulk_create(self, using_transactions, dry_run, raise_errors, batch_size=None, result=None):
+        if dry_run:
+            self.create_instances.clear()
+            return
+        super().bulk_create(using_transactions, dry_run, raise_errors, batch_size, result)
+
+    def bulk_update(self, using_transactions, dry_run, raise_errors, batch_size=None, result=None):
+        # Upsert only the columns that changed in this batch: one INSERT ... ON CONFLICT DO UPDATE
+        # instead of bulk_update()'s CASE WHEN over every column.
+        instances = list({instance.pk: instance for instance in self.update_instances}.values())
+        update_fields = sorted(self.update_fields - {'id'})
+        self.update_instances.clear()
+        self.update_fields.clear()
+        if dry_run or not instances or not update_fields:
+            return
+        try:
+            MenuItem.objects.bulk_create(instances, batch_size=batch_size, update_conflicts=True,
+                                         unique_fields=['id'], update_fields=update_fields)
+        except Exception as e:
+            self.handle_import_error(result, e, raise_errors)
+
+    def bulk_delete(self, using_transactions, dry_run, raise_errors, result=None):
+        if dry_run:
+            self.delete_instances.clear()
+            return
+        super().bulk_delete(using_transactions, dry_run, raise_errors, result)
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        changed = sum(result.totals[kind] for kind in (
+            RowResult.IMPORT_TYPE_NEW, RowResult.IMPORT_TYPE_UPDATE, RowResult.IMPORT_TYPE_DELETE,
+        ))
+        # bulk writes send no post_save signals, so invalidate the menu once here.
+        if changed and not self._is_dry_run(kwargs) and not result.has_errors():
+            transaction.on_commit(menu_cache.bump_version)
@@ -0,0 +1,178 @@
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem, DailySalesSummary, DailyMenuItemSales
+
+COMPLETED = 'completed'
+GENERATION_KEY = 'sales:generation:{day}'
+EPOCH = 'epoch'
+
+
+def _cache():
+    return caches[getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')]
+
+
+def generations(days):
+    """
+    Change counters for ``days`` and the global ``EPOCH``, as a dict. They
+    move after every committed change to the completed orders of a day, so
+    caches of past periods can key on them. A counter missing from the cache
+    restarts from the current time, never from a value it had before.
+    """
+    cache = _cache()
+    keys = {GENERATION_KEY.format(day=day): day for day in [EPOCH, *days]}
+    found = cache.get_many(list(keys))
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    for key, value in missing.items():
+        cache.add(key, value, timeout=None)
+    if missing:
+        found.update(cache.get_many(list(missing)))
+    return {day: found.get(key, missing.get(key)) for key, day in keys.items()}
+
+
+def bump_generation(day=EPOCH):
+    cache = _cache()
+    key = GENERATION_KEY.format(day=day)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def _changed(day):
+    transaction.on_commit(lambda: bump_generation(day))
+
+
+def order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def _add_to_day(day, orders=0, revenue=Decimal('0')):
+    _changed(day)
+    DailySalesSummary.objects.get_or_create(date=day)
+    DailySalesSummary.objects.filter(date=day).update(
+        order_count=F('order_count') + orders,
+        revenue=F('revenue') + revenue,
+    )
+
+
+def _add_to_items(day, lines):
+    """``lines`` maps menu item id to a ``(quantity, revenue)`` delta."""
+    DailyMenuItemSales.objects.bulk_create(
+        [DailyMenuItemSales(date=day, menu_item_id=menu_item_id) for menu_item_id in lines],
+        ignore_conflicts=True,
+    )
+    for menu_item_id, (quantity, revenue) in lines.items():
+        DailyMenuItemSales.objects.filter(date=day, menu_item_id=menu_item_id).update(
+            quantity=F('quantity') + quantity,
+            revenue=F('revenue') + revenue,
+        )
+
+
+def apply_orders(orders, sign=1):
+    """Add (``sign=1``) or remove (``-1``) whole orders, aggregating their lines in one query."""
+    days = {order.pk: order_day(order) for order in orders}
+    rows = OrderItem.objects.filter(order_id__in=days).values('order_id', 'menu_item_id').annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum(F('price') * F('quantity')),
+    ).order_by()
+    lines = {}
+    for row in rows:
+        day_lines = lines.setdefault(days[row['order_id']], {})
+        quantity, revenue = day_lines.get(row['menu_item_id'], (0, Decimal('0')))
+        day_lines[row['menu_item_id']] = (
+            quantity + sign * row['total_quantity'], revenue + sign * row['total_revenue'],
+        )
+    for day, count in Counter(days.values()).items():
+        day_lines = lines.get(day, {})
+        _add_to_day(day, orders=sign * count, revenue=sum((revenue for _, revenue in day_lines.values()), Decimal('0')))
+        if day_lines:
+            _add_to_items(day, day_lines)
+
+
+def apply_order(order, sign=1):
+    apply_orders([order], sign)
+
+
+def record_status_change(order, old_status):
+    """Keep the rollup in step when an order enters or leaves ``completed``."""
+    record_status_changes([(order, old_status)])
+
+
+def record_status_changes(changes):
+    """``changes`` is a list of ``(order, old_status)`` pairs for orders whose status was just updated."""
+    entered = [order for order, old_status in changes if old_status != COMPLETED and order.status == COMPLETED]
+    left = [order for order, old_status in changes if old_status == COMPLETED and order.status != COMPLETED]
+    if entered:
+        apply_orders(entered, 1)
+    if left:
+        apply_orders(left, -1)
+
+
+def record_item_change(order, menu_item_id, quantity_delta, revenue_delta):
+    """Adjust the rollup when a line of an already completed order is edited."""
+    if order.status != COMPLETED or not quantity_delta:
+        return
+    day = order_day(order)
+    _add_to_day(day, revenue=revenue_delta)
+    _add_to_items(day, {menu_item_id: (quantity_delta, revenue_delta)})
+
+
+def rebuild(start_date=None, end_date=None):
+    """Recompute the rollup from the live and archived order tables for an inclusive date range."""
+    summaries = DailySalesSummary.objects.all()
+    item_sales = DailyMenuItemSales.objects.all()
+    if start_date:
+        summaries = summaries.filter(date__gte=start_date)
+        item_sales = item_sales.filter(date__gte=start_date)
+    if end_date:
+        summaries = summaries.filter(date__lte=end_date)
+        item_sales = item_sales.filter(date__lte=end_date)
+
+    with transaction.atomic():
+        days = {}
+        lines = {}
+        for order_model, item_model in ((Order, OrderItem), (ArchivedOrder, ArchivedOrderItem)):
+            orders = order_model.objects.filter(status=COMPLETED)
+            if start_date:
+                orders = orders.filter(created_at__date__gte=start_date)
+            if end_date:
+                orders = orders.filter(created_at__date__lte=end_date)
+
+            order_counts = orders.annotate(day=TruncDate('created_at')).values('day').annotate(
+                order_count=Count('id'),
+            ).order_by()
+            line_totals = item_model.objects.filter(order__in=orders).annotate(
+                day=TruncDate('order__created_at'),
+            ).values('day', 'menu_item_id').annotate(
+                total_quantity=Sum('quantity'),
+                total_revenue=Sum(F('price') * F('quantity')),
+            ).order_by()
+
+            for row in order_counts:
+                summary = days.setdefault(row['day'], DailySalesSummary(date=row['day']))
+                summary.order_count += row['order_count']
+            for row in line_totals:
+                days[row['day']].revenue += row['total_revenue']
+                sales = lines.setdefault(
+                    (row['day'], row['menu_item_id']),
+                    DailyMenuItemSales(date=row['day'], menu_item_id=row['menu_item_id']),
+                )
+                sales.quantity += row['total_quantity']
+                sales.revenue += row['total_revenue']
+
+        summaries.delete()
+        item_sales.delete()
+        DailySalesSummary.objects.bulk_create(days.values(), batch_size=1000)
+        DailyMenuItemSales.objects.bulk_create(lines.values(), batch_size=1000)
+        transaction.on_commit(bump_generation)
+
+        return len(days), len(lines)
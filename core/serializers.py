@@ -1,7 +1,24 @@
+from django.urls import NoReverseMatch, reverse
 from rest_framework import serializers
 from .models import Table, MenuItem, Order, OrderItem
+from . import qr
 
 class TableSerializer(serializers.ModelSerializer):
+    qr_image = serializers.SerializerMethodField()
+
+    def get_qr_image(self, obj):
+        """Versioned, long-cacheable URL of the table's PNG QR code; None when the route cannot express the table number."""
+        try:
+            path = reverse('table-qr-versioned', kwargs={
+                'table_number': obj.table_number,
+                'version': qr.qr_version(qr.qr_url(obj.table_number)),
+                'image_format': 'png',
+            })
+        except NoReverseMatch:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request else path
+
     class Meta:
         model = Table
         fields = '__all__'
@@ -31,7 +48,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
-    table_number = serializers.CharField(source='table.table_number', read_only=True)
+    table_number = serializers.CharField(source='table_id', read_only=True)
     total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
@@ -0,0 +1,234 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from . import events, floor_map, rollup
+from .models import Table, MenuItem, Order, OrderItem
+
+
+class OrderPlacementError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def _whole_number(value):
+    """``int(value)`` for integers and digit strings; ValueError for fractions such as 2.7 instead of truncating."""
+    number = int(value)
+    if not isinstance(value, str) and number != value:
+        raise ValueError(value)
+    return number
+
+
+def merge_order_lines(items_data):
+    """Validate the submitted cart and merge duplicate lines by menu item id."""
+    merged = {}
+    for item_data in items_data:
+        if not isinstance(item_data, dict):
+            raise OrderPlacementError("菜品信息格式无效。")
+        menu_item_id = item_data.get('menu_item_id')
+        try:
+            menu_item_id = _whole_number(menu_item_id)
+            quantity = _whole_number(item_data.get('quantity', 1))
+        except (TypeError, ValueError):
+            raise OrderPlacementError(f"ID为 {menu_item_id} 的菜品信息无效。")
+        if quantity < 1:
+            raise OrderPlacementError(f"ID为 {menu_item_id} 的菜品数量必须大于0。")
+        merged[menu_item_id] = merged.get(menu_item_id, 0) + quantity
+    return merged
+
+
+def get_or_open_order(table):
+    """
+    Return ``(order, created)`` for the table's single open order.
+
+    Must run inside a transaction. The table row is locked so concurrent
+    submissions for the same table queue up; on backends without row locks
+    the ``unique_open_order_per_table`` constraint catches the race instead.
+    """
+    table = Table.objects.select_for_update().get(pk=table.pk)
+    order = Order.objects.open().filter(table=table).first()
+    if order is not None:
+        return order, False
+    try:
+        with transaction.atomic():
+            order = Order.objects.create(table=table, status='pending')
+    except IntegrityError:
+        return Order.objects.open().get(table=table), False
+    table.is_available = False
+    table.save(update_fields=['is_available'])
+    return order, True
+
+
+def place_order(table, items_data):
+    """
+    Add a cart to the table's open order in a single transaction.
+
+    Menu items are resolved with one query, duplicate lines are merged in
+    memory and the order lines are written with one upsert, so the number of
+    queries does not depend on the size of the cart.
+    Returns ``(order, created)``.
+    """
+    lines = merge_order_lines(items_data)
+
+    with transaction.atomic():
+        menu_items = MenuItem.objects.filter(id__in=lines.keys(), is_available=True).in_bulk()
+        for menu_item_id in lines:
+            if menu_item_id not in menu_items:
+                raise OrderPlacementError(f"ID为 {menu_item_id} 的菜品不存在或不可售。")
+
+        order, created = get_or_open_order(table)
+
+        # The upsert writes absolute quantities: lock the lines they are computed from, so a concurrent
+        # staff edit of the same lines waits instead of being overwritten.
+        existing = {
+            order_item.menu_item_id: order_item
+            for order_item in OrderItem.objects.select_for_update().filter(order=order, menu_item_id__in=lines.keys())
+        } if not created else {}
+
+        order_items = []
+        prices = {}
+        for menu_item_id, quantity in lines.items():
+            current = existing.get(menu_item_id)
+            prices[menu_item_id] = current.price if current else menu_items[menu_item_id].price
+            order_items.append(OrderItem(
+                order=order,
+                menu_item=menu_items[menu_item_id],
+                quantity=quantity + (current.quantity if current else 0),
+                price=prices[menu_item_id],
+            ))
+
+        # One upsert on (order, menu_item) writes both new and merged lines.
+        OrderItem.objects.bulk_create(
+            order_items,
+            update_conflicts=True,
+            unique_fields=['order', 'menu_item'],
+            update_fields=['quantity'],
+        )
+        # bulk_create bypasses OrderItem.save(), which keeps the totals otherwise.
+        Order.objects.filter(pk=order.pk).adjust_totals(
+            sum(lines.values()), sum(quantity * prices[menu_item_id] for menu_item_id, quantity in lines.items()),
+        )
+
+        if created:
+            events.publish_on_commit(events.ORDER_CREATED, events.order_data(order))
+        events.publish_on_commit(events.ITEMS_ADDED, events.order_data(order, items=[
+            {'menu_item_id': menu_item_id, 'quantity': quantity} for menu_item_id, quantity in lines.items()
+        ]))
+        floor_map.tables_changed([order.table_id])
+
+    return order, created
+
+
+def pay_order(order, release_table=True):
+    """Mark the order paid and completed, optionally freeing its table."""
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order.pk)
+        old_status = order.status
+        order.is_paid = True
+        order.status = 'completed'
+        order.save()
+        rollup.record_status_change(order, old_status)
+        events.publish_on_commit(events.ORDER_PAID, events.order_data(order, previous_status=old_status))
+        floor_map.tables_changed([order.table_id])
+
+        if release_table:
+            release_tables([order.table_id])
+    return order
+
+
+def release_tables(table_ids):
+    """Mark the given tables available, in one UPDATE, unless they still have an open order."""
+    return Table.objects.filter(pk__in=table_ids, is_available=False).exclude(
+        pk__in=Order.objects.open().filter(table_id__in=table_ids).values('table_id'),
+    ).update(is_available=True)
+
+
+def change_order_statuses(order_ids, new_status):
+    """
+    Move many orders to ``new_status`` in one transaction.
+
+    Orders are checked against ``Order.ALLOWED_TRANSITIONS`` using the
+    statuses read first, then changed with a single UPDATE conditioned on
+    those same statuses, so an order changed concurrently in between is
+    reported as a conflict instead of being overwritten. Rollup, events and
+    freeing the tables of closed orders are batched as well.
+
+    Returns ``{order_id: (result, status)}`` where result is ``updated``,
+    ``not_found``, ``invalid_transition`` or ``conflict`` and status is the
+    order's status afterwards.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    results = {}
+    with transaction.atomic():
+        orders = Order.objects.only('id', 'table_id', 'status', 'is_paid', 'created_at').in_bulk(order_ids)
+        movable = {}
+        for order_id in order_ids:
+            order = orders.get(order_id)
+            if order is None:
+                results[order_id] = ('not_found', None)
+            elif new_status not in Order.ALLOWED_TRANSITIONS[order.status]:
+                results[order_id] = ('invalid_transition', order.status)
+            else:
+                movable[order_id] = order
+
+        if movable:
+            by_status = {}
+            for order in movable.values():
+                by_status.setdefault(order.status, []).append(order.pk)
+            condition = Q()
+            for old_status, ids in by_status.items():
+                condition |= Q(pk__in=ids, status=old_status)
+            now = timezone.now()
+            updated = Order.objects.filter(condition).update(status=new_status, updated_at=now)
+            if updated < len(movable):
+                # Only the rows this UPDATE touched carry its exact timestamp.
+                updated_ids = set(Order.objects.filter(
+                    pk__in=movable, status=new_status, updated_at=now,
+                ).values_list('pk', flat=True))
+                current = dict(Order.objects.filter(pk__in=set(movable) - updated_ids).values_list('pk', 'status'))
+                for order_id in set(movable) - updated_ids:
+                    results[order_id] = ('conflict', current[order_id]) if order_id in current else ('not_found', None)
+                    del movable[order_id]
+
+            changes = []
+            for order in movable.values():
+                changes.append((order, order.status))
+                order.status = new_status
+                order.updated_at = now
+                results[order.pk] = ('updated', new_status)
+            rollup.record_status_changes(changes)
+            for order, old_status in changes:
+                events.publish_on_commit(events.STATUS_CHANGED, events.order_data(order, previous_status=old_status))
+            floor_map.tables_changed({order.table_id for order in movable.values()})
+            if new_status in Order.CLOSED_STATUSES:
+                release_tables({order.table_id for order in movable.values()})
+    return {order_id: results[order_id] for order_id in order_ids}
+
+
+def update_order_item(order_item, quantity):
+    with transaction.atomic():
+        old_quantity = OrderItem.objects.select_for_update().values_list('quantity', flat=True).get(pk=order_item.pk)
+        order_item.quantity = quantity
+        order_item.save()
+        delta = quantity - old_quantity
+        rollup.record_item_change(order_item.order, order_item.menu_item_id, delta, delta * order_item.price)
+        events.publish_on_commit(events.ITEM_UPDATED, events.order_data(
+            order_item.order, item_id=order_item.pk, menu_item_id=order_item.menu_item_id, quantity=quantity
+        ))
+        floor_map.tables_changed([order_item.order.table_id])
+    return order_item
+
+
+def delete_order_item(order_item):
+    with transaction.atomic():
+        order = order_item.order
+        item_id = order_item.pk
+        order_item.delete()
+        rollup.record_item_change(
+            order, order_item.menu_item_id, -order_item.quantity, -order_item.quantity * order_item.price
+        )
+        events.publish_on_commit(events.ITEM_REMOVED, events.order_data(
+            order, item_id=item_id, menu_item_id=order_item.menu_item_id
+        ))
+        floor_map.tables_changed([order.table_id])
+
@@ -0,0 +1,64 @@
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from . import floor_map, menu_cache
+from .auth import versions
+from .models import MenuItem, Table
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def invalidate_menu_cache(sender, **kwargs):
+    transaction.on_commit(menu_cache.bump_version)
+
+
+@receiver(post_save, sender=Table)
+@receiver(post_delete, sender=Table)
+def refresh_floor_map(sender, instance, **kwargs):
+    floor_map.tables_changed([instance.pk])
+
+
+def _members(groups):
+    return User.objects.filter(groups__in=groups).values_list('pk', flat=True).distinct()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def revoke_claims_on_permission_change(sender, instance, action, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, User):
+        user_ids = [instance.pk]
+    elif model is User:
+        # group.user_set / permission.user_set
+        user_ids = instance.user_set.values_list('pk', flat=True) if action == 'pre_clear' else pk_set
+    elif model is Group:
+        # permission.group_set
+        user_ids = _members(instance.group_set.all() if action == 'pre_clear' else pk_set)
+    else:
+        user_ids = _members([instance])
+    versions.bump(user_ids)
+
+
+@receiver(post_save, sender=User)
+def revoke_claims_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    versions.bump([instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def revoke_claims_on_user_delete(sender, instance, **kwargs):
+    # The PermissionVersion row goes with the user; drop the cached version too.
+    user_id = instance.pk
+    transaction.on_commit(lambda: versions.forget([user_id]))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def revoke_claims_on_group_change(sender, instance, created=False, **kwargs):
+    if not created:
+        versions.bump(_members([instance]))
@@ -0,0 +1,29 @@
+"""
+Worker boot helpers.
+
+``warm_up()`` does the imports a worker would otherwise do on its first
+request: the URLconf (and with it every view, serializer and service module)
+and DRF's lazily imported default classes. gunicorn.conf.py calls it in the
+master when ``GUNICORN_PRELOAD=1``, so forked workers share those modules
+copy-on-write and start serving without importing anything.
+"""
+from django.db import connections
+from django.urls import get_resolver
+from rest_framework.settings import api_settings
+
+DRF_DEFAULTS = (
+    'DEFAULT_RENDERER_CLASSES',
+    'DEFAULT_PARSER_CLASSES',
+    'DEFAULT_AUTHENTICATION_CLASSES',
+    'DEFAULT_PERMISSION_CLASSES',
+    'DEFAULT_THROTTLE_CLASSES',
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS',
+)
+
+
+def warm_up():
+    get_resolver().url_patterns
+    for name in DRF_DEFAULTS:
+        getattr(api_settings, name)
+    # Nothing opened while loading may be shared with the forked workers.
+    connections.close_all()
@@ -0,0 +1,116 @@
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework.exceptions import AuthenticationFailed
+
+from .auth import ClaimsJWTAuthentication
+from .events import get_broker
+
+
+def _authenticate(request):
+    """JWT from the Authorization header or ``?token=`` (EventSource cannot set headers), then the session."""
+    authentication = ClaimsJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None and request.GET.get('token'):
+        raw_token = request.GET['token'].encode()
+    if raw_token is not None:
+        try:
+            return authentication.get_user(authentication.get_validated_token(raw_token))
+        except (InvalidToken, TokenError, AuthenticationFailed):
+            return None
+    user = request.user
+    return user if user.is_authenticated else None
+
+
+async def _last_event_id(request, broker):
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return await broker.alatest_id()
+
+
+def _frame(event):
+    return f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data, ensure_ascii=False)}\n\n"
+
+
+def _reset_frame(last_id):
+    return f"id: {last_id}\nevent: reset\ndata: {{}}\n\n"
+
+
+def _frames(events, reset, last_id):
+    frames = []
+    if reset:
+        frames.append(_reset_frame(events[0].id - 1 if events else last_id))
+    frames.extend(_frame(event) for event in events)
+    return frames
+
+
+async def _async_stream(broker, last_id, heartbeat, lifetime):
+    # Django does not notice a client going away while the response streams,
+    # so the stream ends after ``lifetime`` seconds and the browser resumes with Last-Event-ID.
+    deadline = time.monotonic() + lifetime
+    yield f"retry: {getattr(settings, 'ORDER_EVENT_STREAM_RETRY_MS', 3000)}\n\n"
+    while time.monotonic() < deadline:
+        events, reset = await broker.aread(last_id)
+        if reset and not events:
+            last_id = await broker.alatest_id()
+        for frame in _frames(events, reset, last_id):
+            yield frame
+        if events:
+            last_id = events[-1].id
+            continue
+        await broker.await_events(last_id, min(heartbeat, max(deadline - time.monotonic(), 0)))
+        if await broker.alatest_id() == last_id:
+            yield ": keepalive\n\n"
+
+
+def _sync_stream(broker, last_id, heartbeat, lifetime):
+    # Under WSGI every open stream pins a worker thread, so the response is
+    # closed after ``lifetime`` seconds and the browser resumes with Last-Event-ID.
+    deadline = time.monotonic() + lifetime
+    yield f"retry: {getattr(settings, 'ORDER_EVENT_STREAM_RETRY_MS', 3000)}\n\n"
+    while time.monotonic() < deadline:
+        events, reset = broker.read(last_id)
+        if reset and not events:
+            last_id = broker.latest_id()
+        yield from _frames(events, reset, last_id)
+        if events:
+            last_id = events[-1].id
+            continue
+        broker.wait(last_id, min(heartbeat, max(deadline - time.monotonic(), 0)))
+        if broker.latest_id() == last_id:
+            yield ": keepalive\n\n"
+
+
+async def order_event_stream(request):
+    """
+    Server-sent events for the staff and kitchen screens.
+
+    Pushes order created, items added/updated/removed, status changed and paid
+    events as they are committed. Reconnecting clients send ``Last-Event-ID``
+    (or ``?last_event_id=``) and receive only the delta; a ``reset`` event
+    tells them to reload when the delta is no longer available.
+    """
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({"detail": "身份认证信息未提供或无效。"}, status=401)
+
+    broker = get_broker()
+    last_id = await _last_event_id(request, broker)
+    heartbeat = getattr(settings, 'ORDER_EVENT_STREAM_HEARTBEAT', 15)
+    if isinstance(request, ASGIRequest):
+        stream = _async_stream(broker, last_id, heartbeat, getattr(settings, 'ORDER_EVENT_STREAM_ASGI_LIFETIME', 300))
+    else:
+        stream = _sync_stream(broker, last_id, heartbeat, getattr(settings, 'ORDER_EVENT_STREAM_WSGI_LIFETIME', 30))
+
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,3 +1,975 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import (
+    analytics, archive, events, exports, idempotency, menu_cache, openapi_schema, qr, renderers, rollup, services,
+    streams, throttling,
+)
+from .auth import ClaimsTokenObtainPairSerializer, versions
+from .fast_serializers import order_payload, order_payloads
+from .models import ArchivedOrder, ArchivedOrderItem, DailyMenuItemSales, DailySalesSummary, MenuItem, Order, OrderItem, Table
+from .renderers import FastJSONRenderer
+from .serializers import OrderSerializer
+
+
+class OrderPayloadCompatibilityTests(TestCase):
+    """The fast order payloads must render to the same bytes as ``OrderSerializer``."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # bulk_create skips Table.save(), which would render QR codes into MEDIA_ROOT.
+        Table.objects.bulk_create([Table(table_number='A1'), Table(table_number='桌2'), Table(table_number='C3')])
+        cls.noodles = MenuItem.objects.create(name='牛肉面', description='清汤 红烧 "招牌"', price=Decimal('28.50'))
+        cls.tea = MenuItem.objects.create(name='Tea', description='', price=Decimal('0.10'))
+        cls.feast = MenuItem.objects.create(name='Feast <b>&</b>', description='line\nbreak ', price=Decimal('999999.99'))
+
+        cls.open_order = Order.objects.create(table_id='A1')
+        OrderItem.objects.create(order=cls.open_order, menu_item=cls.noodles, quantity=3)
+        OrderItem.objects.create(order=cls.open_order, menu_item=cls.tea, quantity=7)
+        cls.paid_order = Order.objects.create(table_id='桌2', status='completed', is_paid=True)
+        OrderItem.objects.create(order=cls.paid_order, menu_item=cls.feast, quantity=2)
+        cls.empty_order = Order.objects.create(table_id='C3', status='cancelled')
+        Order.objects.filter(pk=cls.paid_order.pk).update(
+            created_at=datetime(2024, 1, 31, 23, 59, 59, 999999, tzinfo=dt_timezone.utc)
+        )
+        cls.price_changed_order = Order.objects.create(table_id='C3', status='preparing')
+        OrderItem.objects.create(order=cls.price_changed_order, menu_item=cls.tea, quantity=1)
+        MenuItem.objects.filter(pk=cls.tea.pk).update(price=Decimal('1.00'))
+
+    def assertSameBytes(self, expected_data, fast_data):
+        expected = JSONRenderer().render(expected_data)
+        self.assertEqual(JSONRenderer().render(fast_data), expected)
+        self.assertEqual(FastJSONRenderer().render(fast_data), expected)
+
+    def test_single_orders(self):
+        for order in Order.objects.all():
+            with self.subTest(order=order.pk):
+                self.assertSameBytes(OrderSerializer(order).data, order_payload(order.pk))
+
+    def test_order_list_keeps_queryset_ordering(self):
+        for ordering in (('-created_at', '-id'), ('id',), ('status', '-id')):
+            orders = Order.objects.order_by(*ordering)
+            with self.subTest(ordering=ordering):
+                self.assertSameBytes(OrderSerializer(orders, many=True).data, order_payloads(orders))
+
+    def test_empty_order_totals_zero(self):
+        payload = order_payload(self.empty_order.pk)
+        self.assertEqual(payload['items'], [])
+        self.assertEqual(payload['total_price'], '0.00')
+
+    def test_missing_order(self):
+        self.assertIsNone(order_payload(0))
+
+    def test_current_timezone(self):
+        with timezone.override('Asia/Shanghai'):
+            orders = Order.objects.order_by('id')
+            self.assertSameBytes(OrderSerializer(orders, many=True).data, order_payloads(orders))
+
+    def test_staff_feed_endpoint(self):
+        user = User.objects.create_user('staff')
+        user.user_permissions.set(Permission.objects.filter(content_type__app_label='core'))
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/staff/orders/')
+        orders = Order.objects.order_by('-created_at', '-id')
+        self.assertEqual(response.content, JSONRenderer().render({
+            'next': None, 'results': OrderSerializer(orders, many=True).data,
+        }))
+
+    def test_payloads_hold_no_floats(self):
+        # FastJSONRenderer only matches JSONRenderer byte for byte without floats.
+        def values(data):
+            if isinstance(data, dict):
+                data = list(data.values())
+            if isinstance(data, (list, tuple)):
+                for value in data:
+                    yield from values(value)
+            else:
+                yield data
+        payloads = order_payloads(Order.objects.all())
+        self.assertFalse([value for value in values(payloads) if isinstance(value, float)])
+
+    def test_customer_order_endpoint(self):
+        response = APIClient().get('/api/tables/A1/order/')
+        self.assertEqual(response.content, JSONRenderer().render(OrderSerializer(self.open_order).data))
+
+
+class FastJSONRendererTests(TestCase):
+    data = {
+        'text': 'ünïcödé 中文 \u2028 \u2029 "quoted" \\ </script>',
+        'numbers': [0, -1, 2 ** 53, 1.5, 0.1],
+        'decimal': Decimal('12.30'),
+        'datetime': datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=dt_timezone.utc),
+        'lazy': gettext_lazy('Not found.'),
+        'nested': {'empty': [], 'none': None, 'flags': (True, False)},
+    }
+
+    @skipUnless(renderers.orjson, "orjson is not installed.")
+    def test_matches_json_renderer(self):
+        with mock.patch.object(renderers.orjson, 'dumps', wraps=renderers.orjson.dumps) as dumps:
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        dumps.assert_called_once()
+
+    @skipUnless(renderers.orjson, "orjson is not installed.")
+    def test_indented_output_uses_json_renderer(self):
+        media_type = 'application/json; indent=4'
+        with mock.patch.object(renderers.orjson, 'dumps') as dumps:
+            self.assertEqual(FastJSONRenderer().render(self.data, media_type), JSONRenderer().render(self.data, media_type))
+        dumps.assert_not_called()
+
+    def test_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    @skipUnless(renderers.orjson, "orjson is not installed.")
+    def test_unsupported_values_fall_back(self):
+        data = {'big': 2 ** 70}
+        with mock.patch.object(renderers.orjson, 'dumps', wraps=renderers.orjson.dumps) as dumps:
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        dumps.assert_called_once()
+
+
+class MetricsAccessTests(TestCase):
+    def test_anonymous_denied_without_token(self):
+        with self.settings(PERF_METRICS_TOKEN=None):
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+    def test_staff_session_without_token(self):
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        with self.settings(PERF_METRICS_TOKEN=None):
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 200)
+
+    def test_bearer_token(self):
+        with self.settings(PERF_METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+            response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer s3cret')
+            self.assertEqual(response.status_code, 200)
+
+
+class OpenOrderTests(TestCase):
+    """One open (unpaid, running) order per table; completed and cancelled orders are closed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number='A1', is_available=False)])
+        cls.tea = MenuItem.objects.create(name='Tea', price=Decimal('2.00'))
+
+    def place(self, quantity=1):
+        return APIClient().post('/api/tables/A1/order/', {'items': [{'menu_item_id': self.tea.pk, 'quantity': quantity}]},
+                                format='json')
+
+    def test_carts_join_the_open_order(self):
+        first, second = self.place(), self.place(2)
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        self.assertEqual(Order.objects.open().get(table_id='A1').item_count, 3)
+
+    def test_second_open_order_rejected_by_database(self):
+        Order.objects.create(table_id='A1')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Order.objects.create(table_id='A1', status='served')
+        Order.objects.create(table_id='A1', status='cancelled')
+
+    def test_completed_unpaid_order_is_closed(self):
+        completed = Order.objects.create(table_id='A1', status='completed')
+        self.assertFalse(Order.objects.open().exists())
+        self.assertEqual(APIClient().get('/api/tables/A1/order/').status_code, 204)
+        self.assertNotEqual(self.place().json()['id'], completed.pk)
+        self.assertEqual(Order.objects.filter(table_id='A1', is_paid=False).count(), 2)
+
+    def test_completing_releases_the_table(self):
+        order = Order.objects.create(table_id='A1', status='served')
+        services.change_order_statuses([order.pk], 'completed')
+        self.assertTrue(Table.objects.get(pk='A1').is_available)
+
+
+class MenuCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number='A1')])
+        cls.tea = MenuItem.objects.create(name='Tea', price=Decimal('2.00'))
+
+    def setUp(self):
+        cache.clear()
+        menu_cache._local.clear()
+
+    def test_etag_revalidation_and_version_bump(self):
+        response = self.client.get('/api/tables/A1/menu/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tables/A1/menu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        version = menu_cache.get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tea.price = Decimal('2.50')
+            self.tea.save()
+        self.assertEqual(menu_cache.get_version(), version + 1)
+        response = self.client.get('/api/tables/A1/menu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)[0]['price'], '2.50')
+
+
+class OrderPlacementTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number=f'A{number}') for number in range(1, 5)])
+        cls.menu_items = MenuItem.objects.bulk_create(
+            [MenuItem(name=f'Dish {number}', price=Decimal('5.00')) for number in range(8)]
+        )
+
+    def cart(self, size):
+        return [{'menu_item_id': menu_item.pk, 'quantity': 2} for menu_item in self.menu_items[:size]]
+
+    def count_queries(self, table_number, size):
+        with CaptureQueriesContext(connection) as queries:
+            services.place_order(Table(pk=table_number), self.cart(size))
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_cart(self):
+        self.assertEqual(self.count_queries('A1', 1), self.count_queries('A2', 8))
+        # Adding to the open orders, partly onto existing lines.
+        self.assertEqual(self.count_queries('A1', 1), self.count_queries('A2', 8))
+        order = Order.objects.with_expected_totals().get(table_id='A2')
+        self.assertEqual((order.item_count, order.total), (32, Decimal('160.00')))
+        self.assertEqual((order.expected_item_count, order.expected_total), (32, Decimal('160.00')))
+
+    def test_fractional_quantities_rejected(self):
+        for quantity in (2.7, '2.5', Decimal('1.5'), 'two', None):
+            with self.subTest(quantity=quantity), self.assertRaises(services.OrderPlacementError):
+                services.merge_order_lines([{'menu_item_id': self.menu_items[0].pk, 'quantity': quantity}])
+        self.assertEqual(services.merge_order_lines([
+            {'menu_item_id': str(self.menu_items[0].pk), 'quantity': '2'},
+            {'menu_item_id': self.menu_items[0].pk, 'quantity': 3.0},
+        ]), {self.menu_items[0].pk: 5})
+        response = APIClient().post('/api/tables/A3/order/', {'items': [
+            {'menu_item_id': self.menu_items[0].pk, 'quantity': 2.7},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.filter(table_id='A3').exists())
+
+
+class IdempotencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number='A1')])
+        cls.tea = MenuItem.objects.create(name='Tea', price=Decimal('2.00'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.cart = {'items': [{'menu_item_id': self.tea.pk, 'quantity': 2}]}
+
+    def post(self, data, key='retry-1'):
+        return self.client.post('/api/tables/A1/order/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_response(self):
+        first = self.post(self.cart)
+        retry = self.post(self.cart)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.content), (201, first.content))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(OrderItem.objects.get().quantity, 2)
+
+    def test_other_key_places_again(self):
+        self.post(self.cart)
+        self.post(self.cart, key='retry-2')
+        self.assertEqual(OrderItem.objects.get().quantity, 4)
+
+    def test_changed_body_rejected(self):
+        self.post(self.cart)
+        response = self.post({'items': [{'menu_item_id': self.tea.pk, 'quantity': 5}]})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(OrderItem.objects.get().quantity, 2)
+
+    def test_in_progress_conflict(self):
+        store = idempotency.IdempotencyStore()
+        self.assertTrue(store.lock(store.key('POST', '/api/tables/A1/order/', 'retry-1')))
+        self.assertEqual(self.post(self.cart).status_code, 409)
+        self.assertFalse(OrderItem.objects.exists())
+
+
+class ClaimsRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('staff')
+        self.user.user_permissions.set(Permission.objects.filter(content_type__app_label='core'))
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def get_feed(self):
+        return self.client.get('/api/staff/orders/').status_code
+
+    def test_deleted_user(self):
+        self.assertEqual(self.get_feed(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertEqual(self.get_feed(), 401)
+
+    def test_deactivated_user(self):
+        self.assertEqual(self.get_feed(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get_feed(), 401)
+
+    def test_deactivated_by_update_after_bump(self):
+        self.assertEqual(self.get_feed(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            versions.bump([self.user.pk])
+        self.assertEqual(self.get_feed(), 401)
+
+
+class OrderStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number=n, is_available=False) for n in ('A1', 'A2', 'A3')])
+        cls.pending = Order.objects.create(table_id='A1')
+        cls.served = Order.objects.create(table_id='A2', status='served')
+        cls.completed = Order.objects.create(table_id='A3', status='completed', is_paid=True)
+
+    def setUp(self):
+        user = User.objects.create_user('kitchen')
+        user.user_permissions.set(Permission.objects.filter(content_type__app_label='core'))
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_results(self):
+        results = services.change_order_statuses([self.pending.pk, self.served.pk, self.completed.pk, 0], 'preparing')
+        self.assertEqual(results, {
+            self.pending.pk: ('updated', 'preparing'),
+            self.served.pk: ('updated', 'preparing'),
+            self.completed.pk: ('invalid_transition', 'completed'),
+            0: ('not_found', None),
+        })
+        self.assertEqual(Order.objects.get(pk=self.completed.pk).status, 'completed')
+
+    def test_concurrent_change_is_a_conflict(self):
+        real_update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            if kwargs.get('status') == 'preparing':
+                real_update(Order.objects.filter(pk=self.served.pk), status='completed')
+            return real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            results = services.change_order_statuses([self.pending.pk, self.served.pk], 'preparing')
+        self.assertEqual(results[self.pending.pk], ('updated', 'preparing'))
+        self.assertEqual(results[self.served.pk], ('conflict', 'completed'))
+        self.assertEqual(Order.objects.get(pk=self.served.pk).status, 'completed')
+
+    def test_closing_releases_tables_in_one_update(self):
+        Order.objects.filter(pk=self.served.pk).update(status='pending')
+        with CaptureQueriesContext(connection) as queries:
+            services.change_order_statuses([self.pending.pk, self.served.pk], 'cancelled')
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "core_table"') for query in queries), 1)
+        self.assertEqual(set(Table.objects.filter(is_available=True).values_list('pk', flat=True)), {'A1', 'A2'})
+
+    def test_single_update_checks_transitions(self):
+        response = self.client.patch(f'/api/staff/orders/{self.completed.pk}/status/', {'status': 'pending'},
+                                     format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((response.json()['result'], response.json()['status']), ('invalid_transition', 'completed'))
+        self.assertEqual(Order.objects.get(pk=self.completed.pk).status, 'completed')
+
+        response = self.client.patch(f'/api/staff/orders/{self.served.pk}/status/', {'status': 'completed'},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'completed')
+        self.assertTrue(Table.objects.get(pk='A2').is_available)
+
+
+@skipUnless(settings.API_DOCS_ENABLED, "API docs are not served in this DEPLOYMENT_ROLE.")
+class OpenAPISchemaArtifactTests(TestCase):
+    def setUp(self):
+        openapi_schema.reset()
+        self.addCleanup(openapi_schema.reset)
+        # drf_yasg warns about views it cannot introspect on every generation.
+        logger = logging.getLogger('drf_yasg')
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.ERROR)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'openapi-schema.json')
+
+    def export(self, release):
+        with self.settings(RELEASE_ID=release):
+            call_command('export_openapi_schema', output=self.path, stdout=io.StringIO())
+        with open(self.path, encoding='utf-8') as f:
+            artifact = json.load(f)
+        artifact['schema']['info']['title'] = 'From the artifact'
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(artifact, f)
+
+    def served_title(self, release):
+        openapi_schema.reset()
+        with self.settings(RELEASE_ID=release, OPENAPI_SCHEMA_ARTIFACT=self.path):
+            return self.client.get('/swagger.json').json()['info']['title']
+
+    def test_loaded_for_the_same_release(self):
+        self.export('r1')
+        self.assertEqual(self.served_title('r1'), 'From the artifact')
+
+    def test_ignored_for_another_release(self):
+        self.export('r1')
+        self.assertNotEqual(self.served_title('r2'), 'From the artifact')
+        self.assertNotEqual(self.served_title(None), 'From the artifact')
+
+    def test_export_requires_release(self):
+        with self.settings(RELEASE_ID=None), self.assertRaises(CommandError):
+            call_command('export_openapi_schema', output=self.path, stdout=io.StringIO())
+
+
+class OrderTotalsTests(TestCase):
+    """``Order.total``/``item_count`` must always equal the sums over the order lines."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number='A1'), Table(table_number='A2')])
+        cls.noodles = MenuItem.objects.create(name='牛肉面', price=Decimal('10.00'))
+        cls.tea = MenuItem.objects.create(name='Tea', price=Decimal('3.00'))
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('staff')
+        user.user_permissions.set(Permission.objects.filter(content_type__app_label='core'))
+        self.staff = APIClient()
+        self.staff.force_authenticate(user)
+
+    def place(self, table_number, *lines):
+        return services.place_order(Table.objects.get(pk=table_number), [
+            {'menu_item_id': menu_item.pk, 'quantity': quantity} for menu_item, quantity in lines
+        ])[0]
+
+    def assertTotals(self, order, total, item_count):
+        order = Order.objects.with_expected_totals().get(pk=order.pk)
+        self.assertEqual((order.total, order.item_count), (Decimal(total), item_count))
+        self.assertEqual((order.expected_total, order.expected_item_count), (Decimal(total), item_count))
+
+    def test_place_update_delete(self):
+        order = self.place('A1', (self.noodles, 1), (self.tea, 2))
+        self.assertTotals(order, '16.00', 3)
+        self.place('A1', (self.tea, 1))
+        self.assertTotals(order, '19.00', 4)
+
+        line = OrderItem.objects.get(order=order, menu_item=self.tea)
+        response = self.staff.patch(f'/api/staff/order-items/{line.pk}/', {'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTotals(order, '13.00', 2)
+        response = self.staff.delete(f'/api/staff/order-items/{line.pk}/')
+        self.assertIn(response.status_code, (200, 204))
+        self.assertTotals(order, '10.00', 1)
+
+    def test_line_moved_between_orders(self):
+        first = self.place('A1', (self.noodles, 1), (self.tea, 2))
+        second = self.place('A2', (self.noodles, 1))
+        line = OrderItem.objects.get(order=first, menu_item=self.tea)
+        line.order = second
+        line.save()
+        self.assertTotals(first, '10.00', 1)
+        self.assertTotals(second, '16.00', 3)
+
+    @skipUnless(settings.ADMIN_ENABLED, "The admin is not installed in this DEPLOYMENT_ROLE.")
+    def test_admin_edit_keeps_concurrent_changes(self):
+        order = self.place('A1', (self.noodles, 1))
+        line = OrderItem.objects.get(order=order)
+        self.client.force_login(User.objects.create_superuser('admin'))
+        self.assertEqual(self.client.get(f'/admin/core/order/{order.pk}/change/').status_code, 200)
+
+        # A guest adds to the order while the admin page is open.
+        self.place('A1', (self.tea, 2))
+        response = self.client.post(f'/admin/core/order/{order.pk}/change/', {
+            'table': 'A1', 'status': 'preparing', 'total': '0.00', 'item_count': '0',
+            'items-TOTAL_FORMS': '1', 'items-INITIAL_FORMS': '1',
+            'items-MIN_NUM_FORMS': '0', 'items-MAX_NUM_FORMS': '1000',
+            'items-0-id': line.pk, 'items-0-order': order.pk,
+            'items-0-menu_item': self.noodles.pk, 'items-0-quantity': '2',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'preparing')
+        self.assertTotals(order, '26.00', 4)
+
+    def test_repair_order_totals(self):
+        order = self.place('A1', (self.noodles, 1), (self.tea, 2))
+        healthy = self.place('A2', (self.tea, 1))
+        OrderItem.objects.filter(order=order, menu_item=self.tea).update(quantity=5)
+
+        out = io.StringIO()
+        call_command('repair_order_totals', dry_run=True, stdout=out)
+        self.assertIn('Checked 2 orders, found 1 with drifted totals.', out.getvalue())
+        self.assertEqual(Order.objects.get(pk=order.pk).total, Decimal('16.00'))
+
+        out = io.StringIO()
+        call_command('repair_order_totals', batch_size=1, stdout=out)
+        self.assertIn('Checked 2 orders, repaired 1 with drifted totals.', out.getvalue())
+        self.assertTotals(order, '25.00', 6)
+        self.assertTotals(healthy, '3.00', 1)
+
+
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number='A1')])
+        cls.noodles = MenuItem.objects.create(name='牛肉面', price=Decimal('10.00'))
+        cls.tea = MenuItem.objects.create(name='Tea', price=Decimal('3.00'))
+
+    def setUp(self):
+        cache.clear()
+        self.order = services.place_order(Table.objects.get(pk='A1'), [
+            {'menu_item_id': self.noodles.pk, 'quantity': 1}, {'menu_item_id': self.tea.pk, 'quantity': 2},
+        ])[0]
+        self.day = rollup.order_day(self.order)
+
+    def assertRollup(self, order_count, revenue, quantities):
+        summary = DailySalesSummary.objects.filter(date=self.day).values_list('order_count', 'revenue').first()
+        self.assertEqual(summary or (0, Decimal('0')), (order_count, Decimal(revenue)))
+        self.assertEqual(dict(DailyMenuItemSales.objects.filter(date=self.day, quantity__gt=0).values_list(
+            'menu_item_id', 'quantity',
+        )), quantities)
+
+    def complete(self):
+        services.change_order_statuses([self.order.pk], 'served')
+        services.change_order_statuses([self.order.pk], 'completed')
+        self.order.refresh_from_db()
+
+    def test_status_and_line_changes(self):
+        self.assertRollup(0, '0', {})
+        generation = rollup.generations([self.day])[self.day]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.complete()
+        self.assertRollup(1, '16.00', {self.noodles.pk: 1, self.tea.pk: 2})
+        self.assertGreater(rollup.generations([self.day])[self.day], generation)
+
+        tea = OrderItem.objects.get(order=self.order, menu_item=self.tea)
+        services.update_order_item(tea, 5)
+        self.assertRollup(1, '25.00', {self.noodles.pk: 1, self.tea.pk: 5})
+        services.delete_order_item(OrderItem.objects.get(order=self.order, menu_item=self.noodles))
+        self.assertRollup(1, '15.00', {self.tea.pk: 5})
+
+    def test_rebuild(self):
+        self.complete()
+        DailySalesSummary.objects.update(order_count=7, revenue=Decimal('1.00'))
+        DailyMenuItemSales.objects.all().delete()
+        self.assertEqual(rollup.rebuild(self.day, self.day), (1, 2))
+        self.assertRollup(1, '16.00', {self.noodles.pk: 1, self.tea.pk: 2})
+
+    @skipUnless(settings.ADMIN_ENABLED, "The admin is not installed in this DEPLOYMENT_ROLE.")
+    def test_admin_edits(self):
+        tea = OrderItem.objects.get(order=self.order, menu_item=self.tea)
+        noodles = OrderItem.objects.get(order=self.order, menu_item=self.noodles)
+        self.client.force_login(User.objects.create_superuser('admin'))
+
+        def post(status, *lines):
+            data = {
+                'table': 'A1', 'status': status,
+                'items-TOTAL_FORMS': len(lines), 'items-INITIAL_FORMS': len(lines),
+                'items-MIN_NUM_FORMS': '0', 'items-MAX_NUM_FORMS': '1000',
+            }
+            for index, (line, quantity, delete) in enumerate(lines):
+                data.update({
+                    f'items-{index}-id': line.pk, f'items-{index}-order': self.order.pk,
+                    f'items-{index}-menu_item': line.menu_item_id, f'items-{index}-quantity': quantity,
+                    f'items-{index}-DELETE': delete,
+                })
+            response = self.client.post(f'/admin/core/order/{self.order.pk}/change/', data)
+            self.assertEqual(response.status_code, 302)
+
+        post('completed', (tea, 3, ''), (noodles, 1, ''))
+        self.assertRollup(1, '19.00', {self.noodles.pk: 1, self.tea.pk: 3})
+        post('completed', (tea, 4, ''), (noodles, 1, 'on'))
+        self.assertRollup(1, '12.00', {self.tea.pk: 4})
+        post('served', (tea, 4, ''))
+        self.assertRollup(0, '0.00', {})
+
+
+class ArchiveOrdersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number='A1')])
+        cls.tea = MenuItem.objects.create(name='Tea', price=Decimal('3.00'))
+
+    def order(self, status, is_paid=False, days=10, quantity=None):
+        order = Order.objects.create(table_id='A1', status=status, is_paid=is_paid)
+        if quantity:
+            OrderItem.objects.create(order=order, menu_item=self.tea, quantity=quantity)
+        Order.objects.filter(pk=order.pk).update(updated_at=timezone.now() - timedelta(days=days))
+        return order
+
+    def test_moves_closed_orders_and_reruns_safely(self):
+        paid = self.order('completed', is_paid=True, quantity=2)
+        cancelled = self.order('cancelled', quantity=1)
+        kept = [self.order('completed', quantity=1), self.order('completed', is_paid=True, days=1)]
+        cutoff = archive.archive_cutoff(3)
+
+        # A batch interrupted after copying the order but before deleting it.
+        ArchivedOrder.objects.create(
+            id=paid.pk, table_number='A1', status='completed', is_paid=True,
+            created_at=paid.created_at, updated_at=paid.created_at,
+        )
+        self.assertEqual(archive.archive_batch(cutoff, batch_size=1), (1, 1))
+        self.assertEqual(archive.archive_batch(cutoff, batch_size=1), (1, 1))
+        self.assertEqual(archive.archive_batch(cutoff, batch_size=1), (0, 0))
+
+        self.assertEqual(set(Order.objects.values_list('pk', flat=True)), {order.pk for order in kept})
+        self.assertEqual(set(ArchivedOrder.objects.values_list('pk', flat=True)), {paid.pk, cancelled.pk})
+        self.assertEqual(
+            sorted(ArchivedOrderItem.objects.values_list('order_id', 'quantity', 'price')),
+            [(paid.pk, 2, Decimal('3.00')), (cancelled.pk, 1, Decimal('3.00'))],
+        )
+
+        out = io.StringIO()
+        call_command('archive_orders', days=3, stdout=out)
+        self.assertIn('Archived 0 orders and 0 items in 0 batches.', out.getvalue())
+
+
+@override_settings(TIME_ZONE='Asia/Shanghai')
+class AnalyticsReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number='A1'), Table(table_number='A2')])
+        cls.tea = MenuItem.objects.create(name='Tea', price=Decimal('3.00'))
+        # 23:59 on 1 May and 00:00 on 2 May, Shanghai time.
+        cls.late = cls.completed_order('A1', datetime(2024, 5, 1, 15, 59, tzinfo=dt_timezone.utc), 1)
+        cls.early = cls.completed_order('A2', datetime(2024, 5, 1, 16, 0, tzinfo=dt_timezone.utc), 2)
+        cancelled = Order.objects.create(table_id='A1', status='cancelled')
+        Order.objects.filter(pk=cancelled.pk).update(created_at=datetime(2024, 5, 1, 4, 0, tzinfo=dt_timezone.utc))
+        moment = datetime(2024, 5, 6, 1, 0, tzinfo=dt_timezone.utc)
+        archived = ArchivedOrder.objects.create(
+            id=10 ** 6, table_number='A1', status='completed', is_paid=True, created_at=moment, updated_at=moment,
+        )
+        ArchivedOrderItem.objects.create(id=10 ** 6, order=archived, menu_item=cls.tea, quantity=5, price='3.00')
+
+    @classmethod
+    def completed_order(cls, table_number, created_at, quantity):
+        order = Order.objects.create(table_id=table_number, status='completed', is_paid=True)
+        OrderItem.objects.create(order=order, menu_item=cls.tea, quantity=quantity)
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        return order
+
+    def setUp(self):
+        cache.clear()
+
+    def totals(self, kind, start_date, end_date):
+        report = analytics.report(kind, start_date, end_date, ('table',))
+        return [(bucket['start'], bucket['total_orders'], bucket['total_revenue'])
+                for bucket in report['buckets'] if bucket['total_orders']]
+
+    def test_bucket_boundaries_follow_local_time(self):
+        self.assertEqual(self.totals('day', date(2024, 5, 1), date(2024, 5, 2)), [
+            ('2024-05-01T00:00:00+08:00', 1, '3.00'), ('2024-05-02T00:00:00+08:00', 1, '6.00'),
+        ])
+        self.assertEqual(self.totals('hour', date(2024, 5, 1), date(2024, 5, 2)), [
+            ('2024-05-01T23:00:00+08:00', 1, '3.00'), ('2024-05-02T00:00:00+08:00', 1, '6.00'),
+        ])
+        self.assertEqual(analytics.align_range('week', date(2024, 5, 1), date(2024, 5, 6)),
+                         (date(2024, 4, 29), date(2024, 5, 12)))
+        self.assertEqual(self.totals('week', date(2024, 4, 29), date(2024, 5, 12)), [
+            ('2024-04-29T00:00:00+08:00', 2, '9.00'), ('2024-05-06T00:00:00+08:00', 1, '15.00'),
+        ])
+
+    def test_late_edit_invalidates_only_its_day(self):
+        self.totals('day', date(2024, 5, 1), date(2024, 5, 2))
+        with mock.patch.object(analytics, 'compute', wraps=analytics.compute) as compute:
+            self.totals('day', date(2024, 5, 1), date(2024, 5, 2))
+            compute.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                services.update_order_item(OrderItem.objects.get(order=self.late), 4)
+            self.assertEqual(self.totals('day', date(2024, 5, 1), date(2024, 5, 2)), [
+                ('2024-05-01T00:00:00+08:00', 1, '12.00'), ('2024-05-02T00:00:00+08:00', 1, '6.00'),
+            ])
+        compute.assert_called_once()
+        windows = compute.call_args.args[1]
+        self.assertEqual([(start.isoformat(), end.isoformat()) for start, end in windows],
+                         [('2024-05-01T00:00:00+08:00', '2024-05-02T00:00:00+08:00')])
+
+    def test_invalid_parameters(self):
+        manager = User.objects.create_user('manager')
+        manager.groups.add(Group.objects.create(name='managers'))
+        client = APIClient()
+        client.force_authenticate(manager)
+        response = client.get('/api/reports/analytics/?bucket=day&start_date=2024-05-01&end_date=2024-05-02')
+        self.assertEqual(response.status_code, 200)
+        for query in ('bucket=month', 'breakdown=waiter', 'start_date=2024-05-03&end_date=2024-05-01',
+                      'bucket=hour&start_date=2020-01-01&end_date=2024-01-01'):
+            with self.subTest(query=query):
+                self.assertEqual(client.get(f'/api/reports/analytics/?{query}').status_code, 400)
+
+
+class MergeOpenOrdersMigrationTests(TransactionTestCase):
+    """0006 merges duplicate running orders per table before adding ``unique_open_order_per_table``."""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('core', target)])
+        return executor.loader.project_state([('core', target)]).apps
+
+    def tearDown(self):
+        self.migrate(MigrationLoader(connection).graph.leaf_nodes('core')[0][1])
+
+    def test_completed_unpaid_bill_is_left_alone(self):
+        apps = self.migrate('0005_table_qr_hash')
+        Table, MenuItem = apps.get_model('core', 'Table'), apps.get_model('core', 'MenuItem')
+        Order, OrderItem = apps.get_model('core', 'Order'), apps.get_model('core', 'OrderItem')
+        Table.objects.create(table_number='A1', qr_hash='')
+        tea = MenuItem.objects.create(name='Tea', price=Decimal('2.00'))
+        rice = MenuItem.objects.create(name='Rice', price=Decimal('5.00'))
+        bill = Order.objects.create(table_id='A1', status='completed')
+        OrderItem.objects.create(order=bill, menu_item=tea, quantity=3, price=Decimal('2.00'))
+        older = Order.objects.create(table_id='A1', status='served')
+        OrderItem.objects.create(order=older, menu_item=tea, quantity=1, price=Decimal('2.00'))
+        newest = Order.objects.create(table_id='A1')
+        OrderItem.objects.create(order=newest, menu_item=rice, quantity=1, price=Decimal('5.00'))
+
+        apps = self.migrate('0006_unique_open_order_per_table')
+        Order, OrderItem = apps.get_model('core', 'Order'), apps.get_model('core', 'OrderItem')
+        self.assertEqual(dict(Order.objects.values_list('pk', 'status')),
+                         {bill.pk: 'completed', older.pk: 'cancelled', newest.pk: 'pending'})
+        self.assertEqual(list(OrderItem.objects.filter(order_id=bill.pk).values_list('quantity', flat=True)), [3])
+        self.assertEqual(sorted(OrderItem.objects.filter(order_id=newest.pk).values_list('menu_item_id', flat=True)),
+                         sorted([tea.pk, rice.pk]))
+
+
+class OrderEventStreamTests(TestCase):
+    def test_cache_broker_waits_for_an_event_still_being_written(self):
+        broker = events.CacheBroker(poll_interval=0.01)
+        cache.clear()
+        broker.publish(events.ORDER_CREATED, {'order_id': 1})
+        # A publisher that took id 2 but has not stored the event yet.
+        cache.incr(broker.SEQUENCE_KEY)
+        found, reset = broker.read(0)
+        self.assertEqual(([event.id for event in found], reset), ([1], False))
+        self.assertEqual(broker.read(1), ([], False))
+
+        broker.publish(events.ORDER_PAID, {'order_id': 1})
+        found, reset = broker.read(1)
+        self.assertTrue(reset)
+        self.assertEqual([event.id for event in found], [3])
+
+    def test_async_stream_ends_after_its_lifetime(self):
+        async def consume():
+            frames = []
+            async for frame in streams._async_stream(events.InProcessBroker(), 0, heartbeat=0.05, lifetime=0.2):
+                frames.append(frame)
+            return frames
+
+        frames = asyncio.run(asyncio.wait_for(consume(), 5))
+        self.assertTrue(frames[0].startswith('retry:'))
+        self.assertIn(': keepalive\n\n', frames)
+
+
+class StaffOrderFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number='A1')])
+        cls.orders = [Order.objects.create(table_id='A1', status='cancelled') for _ in range(5)]
+        # Two orders share a timestamp: the cursor must break the tie on id.
+        moment = datetime(2024, 5, 1, 12, 0, tzinfo=dt_timezone.utc)
+        Order.objects.filter(pk__in=[cls.orders[1].pk, cls.orders[2].pk]).update(created_at=moment, updated_at=moment)
+        cls.user = User.objects.create_user('staff')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(order['id'] for order in data['results'])
+            if len(ids) == 2:
+                # Orders placed while the feed is walked never shift it.
+                Order.objects.create(table_id='A1', status='cancelled')
+            url = data['next']
+        return ids
+
+    def test_keyset_cursor_walks_every_order_once(self):
+        expected = list(Order.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(self.walk('/api/staff/orders/?page_size=2'), expected)
+
+    def test_invalid_filters(self):
+        for query in ('status=bogus', 'is_paid=maybe', 'updated_since=yesterday',
+                      'updated_since=2024-02-30', 'updated_since=2024-02-30T10:00:00'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/staff/orders/?{query}').status_code, 400)
+        self.assertEqual(self.client.get('/api/staff/orders/?cursor=not-a-cursor').status_code, 404)
+
+    def test_updated_since(self):
+        response = self.client.get('/api/staff/orders/?updated_since=2024-05-01T12:00:00Z')
+        self.assertEqual(len(response.json()['results']), 5)
+        response = self.client.get('/api/staff/orders/?updated_since=2100-01-01')
+        self.assertEqual(response.json()['results'], [])
+
+
+class TableQRCodeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number='A1'), Table(table_number='A 2/x')])
+        cls.user = User.objects.create_user('manager')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_etag_revalidation(self):
+        response = self.client.get('/api/tables/A1/qr.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        response = self.client.get('/api/tables/A1/qr.png', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_stale_version_redirects_to_current(self):
+        version = qr.qr_version(qr.qr_url('A1'))
+        response = self.client.get('/api/tables/A1/qr/0000000000000000.svg')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], f'/api/tables/A1/qr/{version}.svg')
+        response = self.client.get(response['Location'])
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_table_list_survives_unroutable_table_number(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/admin/tables/')
+        self.assertEqual(response.status_code, 200)
+        images = {table['table_number']: table['qr_image'] for table in response.json()}
+        self.assertIsNone(images['A 2/x'])
+        self.assertTrue(images['A1'].endswith('.png'))
+
+    def test_zip_export(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/admin/tables/qr-codes/?image=svg')
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            names = archive.namelist()
+            self.assertEqual(archive.read('table_A1_qr.svg'), qr.qr_image(qr.qr_url('A1'), 'svg'))
+        self.assertEqual(len(names), 2)
+        self.assertRegex(names[0], r'^table_A_2x-[0-9a-f]{8}_qr\.svg$')
+
+
+@override_settings(CUSTOMER_ADMISSION_CONTROL=True, CUSTOMER_THROTTLE_RATES={
+    'menu': {'client': (1, 3), 'table': (0.01, 2)},
+})
+class CustomerAdmissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number='A1'), Table(table_number='A2')])
+
+    def setUp(self):
+        cache.clear()
+        store = mock.patch.object(throttling, '_store', throttling.MemoryBucketStore())
+        self.store = store.start()
+        self.addCleanup(store.stop)
+
+    def test_empty_bucket_answers_429_with_retry_after(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/tables/A1/menu/').status_code, 200)
+        response = self.client.get('/api/tables/A1/menu/')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+        # The table bucket refused the request, so the client bucket kept its token.
+        self.assertEqual(self.client.get('/api/tables/A2/menu/').status_code, 200)
+        self.assertEqual(self.client.get('/api/tables/A2/menu/').status_code, 429)
+
+    def test_bucket_stores_take_all_tokens_or_none(self):
+        for store in (throttling.MemoryBucketStore(), throttling.CacheBucketStore()):
+            with self.subTest(store=type(store).__name__):
+                buckets = [('test:client', 1, 2), ('test:table', 1, 1)]
+                self.assertEqual(store.consume_all(buckets, now=0), 0)
+                self.assertGreater(store.consume_all(buckets, now=0), 0)
+                self.assertEqual(store.consume('test:client', 1, 2, now=0), 0)
+                self.assertGreater(store.consume('test:client', 1, 2, now=0), 0)
+
+    def test_saturated_endpoint_class_is_shed_with_503(self):
+        with mock.patch.object(throttling.limiter, 'acquire', return_value=False):
+            response = self.client.get('/api/tables/A1/menu/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(throttling.SHED_RETRY_AFTER))
+        self.assertEqual(throttling.limiter.in_flight('menu'), 0)
+
+
+class OrderExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create([Table(table_number='A1')])
+        cls.noodles = MenuItem.objects.create(name='牛肉面', price=Decimal('10.00'))
+        cls.tea = MenuItem.objects.create(name='Tea, hot', price=Decimal('3.00'))
+        moment = datetime(2024, 5, 1, 12, 0, tzinfo=dt_timezone.utc)
+        cls.archived = ArchivedOrder.objects.create(
+            id=10 ** 6, table_number='A1', status='completed', is_paid=True, created_at=moment, updated_at=moment,
+        )
+        ArchivedOrderItem.objects.create(id=10 ** 6, order=cls.archived, menu_item=cls.tea, quantity=1, price='2.50')
+        cls.order = services.place_order(Table(pk='A1'), [
+            {'menu_item_id': cls.noodles.pk, 'quantity': 1}, {'menu_item_id': cls.tea.pk, 'quantity': 2},
+        ])[0]
+        cls.empty = Order.objects.create(table_id='A1', status='cancelled')
+        cls.manager = User.objects.create_user('manager')
+        cls.manager.groups.add(Group.objects.create(name='managers'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def export(self, query='', **headers):
+        response = self.client.get(f'/api/reports/orders/export/?{query}', **headers)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(body.decode('utf-8'))))
+        self.assertEqual(tuple(rows[0]), exports.COLUMNS)
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.archived.pk)] + [str(self.order.pk)] * 2 + [str(self.empty.pk)])
+        self.assertEqual(rows[1][5:], ['2.50', '1000000', str(self.tea.pk), 'Tea, hot', '1', '2.50', '2.50'])
+        self.assertEqual(rows[2][5], '16.00')
+        self.assertEqual(rows[3][8:], ['Tea, hot', '2', '3.00', '6.00'])
+        self.assertEqual(rows[4][5:], ['0.00', '', '', '', '', '', ''])
+
+    def test_ndjson_with_filters(self):
+        _, body = self.export('output=ndjson&start_date=2024-05-02&status=pending')
+        records = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+        self.assertEqual([record['menu_item_name'] for record in records], ['牛肉面', 'Tea, hot'])
+        self.assertEqual(records[0]['order_id'], self.order.pk)
+        self.assertEqual(records[0]['order_total'], '16.00')
+        self.assertIs(records[0]['is_paid'], False)
+
+    def test_gzip(self):
+        response, body = self.export('output=ndjson', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(body), self.export('output=ndjson')[1])
+
+    def test_invalid_parameters(self):
+        for query in ('output=xml', 'start_date=2024-02-30', 'status=bogus'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/reports/orders/export/?{query}').status_code, 400)
@@ -0,0 +1,285 @@
+"""
+Admission control for the anonymous customer endpoints.
+
+Each endpoint class (``menu``, ``order_status``, ``order``, ``payment``)
+has token buckets per client address and per table number, configured in
+``CUSTOMER_THROTTLE_RATES``; a request takes a token from all of its
+buckets, or from none when one is empty and it is answered 429 with
+``Retry-After``. Buckets live in ``CUSTOMER_THROTTLE_STORE``: in-process
+by default, bounded to ``max_keys`` buckets with LRU eviction, or a
+shared Django cache for multi-worker deployments.
+
+Independently, at most ``CUSTOMER_CONCURRENCY_LIMITS[endpoint class]``
+requests of a class run at once per worker; the rest are shed with 503 and
+``Retry-After`` before touching the database.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.throttling import BaseThrottle
+
+SHED_RETRY_AFTER = 1
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class MemoryBucketStore:
+    """Token buckets in a per-process LRU: at most ``max_keys`` buckets, least recently used evicted first."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst, now=None):
+        """Take one token; return 0 if allowed, else the seconds until a token is available."""
+        return self.consume_all([(key, rate, burst)], now)
+
+    def consume_all(self, buckets, now=None):
+        """
+        Take one token from every ``(key, rate, burst)`` bucket, or from none
+        of them: return 0 if all had one, else the seconds until they all do.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            levels = [self._refill(key, rate, burst, now) for key, rate, burst in buckets]
+            wait = max(
+                ((1 - bucket[0]) / rate for bucket, (_, rate, _) in zip(levels, buckets) if bucket[0] < 1),
+                default=0,
+            )
+            if not wait:
+                for bucket in levels:
+                    bucket[0] -= 1
+            return wait
+
+    def _refill(self, key, rate, burst, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        return bucket
+
+    async def aconsume(self, key, rate, burst):
+        return self.consume(key, rate, burst)
+
+    async def aconsume_all(self, buckets):
+        return self.consume_all(buckets)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class CacheBucketStore:
+    """
+    Buckets shared by every worker through a Django cache (e.g. Redis).
+
+    Approximated with atomic ``incr`` counters over fixed windows of
+    ``burst / rate`` seconds (the time a bucket takes to refill), allowing
+    ``burst`` requests per window.
+    """
+
+    KEY = 'throttle:{key}:{window}'
+
+    def __init__(self, cache_alias='default'):
+        self.cache_alias = cache_alias
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _window(self, rate, burst, now):
+        length = burst / rate
+        return length, int(now // length)
+
+    def consume(self, key, rate, burst, now=None):
+        return self.consume_all([(key, rate, burst)], now)
+
+    def consume_all(self, buckets, now=None):
+        """Count the request in every window; if one is over its burst, take the counts back and return the wait."""
+        now = time.time() if now is None else now
+        counted, wait = [], 0
+        for key, rate, burst in buckets:
+            length, window = self._window(rate, burst, now)
+            cache_key = self.KEY.format(key=key, window=window)
+            self.cache.add(cache_key, 0, timeout=math.ceil(length) + 1)
+            try:
+                count = self.cache.incr(cache_key)
+            except ValueError:
+                continue
+            counted.append(cache_key)
+            if count > burst:
+                wait = max(wait, (window + 1) * length - now)
+        if wait:
+            for cache_key in counted:
+                try:
+                    self.cache.decr(cache_key)
+                except ValueError:
+                    pass
+        return wait
+
+    async def aconsume(self, key, rate, burst):
+        return await self.aconsume_all([(key, rate, burst)])
+
+    async def aconsume_all(self, buckets):
+        now = time.time()
+        counted, wait = [], 0
+        for key, rate, burst in buckets:
+            length, window = self._window(rate, burst, now)
+            cache_key = self.KEY.format(key=key, window=window)
+            await self.cache.aadd(cache_key, 0, timeout=math.ceil(length) + 1)
+            try:
+                count = await self.cache.aincr(cache_key)
+            except ValueError:
+                continue
+            counted.append(cache_key)
+            if count > burst:
+                wait = max(wait, (window + 1) * length - now)
+        if wait:
+            for cache_key in counted:
+                try:
+                    await self.cache.adecr(cache_key)
+                except ValueError:
+                    pass
+        return wait
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store_class = import_string(getattr(settings, 'CUSTOMER_THROTTLE_STORE', 'core.throttling.MemoryBucketStore'))
+                _store = store_class(**getattr(settings, 'CUSTOMER_THROTTLE_STORE_OPTIONS', {}))
+    return _store
+
+
+def enabled():
+    return getattr(settings, 'CUSTOMER_ADMISSION_CONTROL', True)
+
+
+def rate(scope, kind):
+    """``(tokens per second, burst)`` for ``kind`` (``client`` or ``table``) buckets of ``scope``, or None."""
+    return getattr(settings, 'CUSTOMER_THROTTLE_RATES', {}).get(scope, {}).get(kind)
+
+
+def bucket_keys(scope, ident, table_number):
+    """``(key, rate, burst)`` of every bucket a request of ``scope`` draws from."""
+    keys = []
+    for kind, value in (('client', ident), ('table', table_number)):
+        bucket_rate = rate(scope, kind)
+        if bucket_rate is not None and value is not None:
+            keys.append((f'{scope}:{kind}:{value}', *bucket_rate))
+    return keys
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "服务繁忙，请稍后重试。"
+    default_code = 'overloaded'
+
+    def __init__(self, wait=SHED_RETRY_AFTER):
+        super().__init__()
+        self.wait = wait
+
+
+class ConcurrencyLimiter:
+    """In-flight request counters per endpoint class, for this worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def acquire(self, scope):
+        limit = getattr(settings, 'CUSTOMER_CONCURRENCY_LIMITS', {}).get(scope)
+        with self._lock:
+            in_flight = self._in_flight.get(scope, 0)
+            if limit is not None and in_flight >= limit:
+                return False
+            self._in_flight[scope] = in_flight + 1
+            return True
+
+    def release(self, scope):
+        with self._lock:
+            self._in_flight[scope] -= 1
+
+    def in_flight(self, scope):
+        return self._in_flight.get(scope, 0)
+
+
+limiter = ConcurrencyLimiter()
+
+
+class CustomerBucketThrottle(BaseThrottle):
+    """DRF throttle drawing from the client and table buckets of the view's ``get_throttle_scope()``."""
+
+    def allow_request(self, request, view):
+        self.wait_seconds = 0
+        if not enabled():
+            return True
+        buckets = bucket_keys(view.get_throttle_scope(request), self.get_ident(request), view.kwargs.get('table_number'))
+        self.wait_seconds = get_store().consume_all(buckets)
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class CustomerAdmissionMixin:
+    """
+    Token-bucket throttling and per-class load shedding for DRF customer
+    views. ``throttle_scopes`` maps HTTP methods to endpoint classes.
+    """
+    throttle_classes = [CustomerBucketThrottle]
+    throttle_scopes = {}
+
+    def get_throttle_scope(self, request):
+        return self.throttle_scopes.get(request.method)
+
+    def get_throttles(self):
+        if self.get_throttle_scope(self.request) is None:
+            return []
+        return super().get_throttles()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        scope = self.get_throttle_scope(request)
+        if scope is not None and enabled():
+            if not limiter.acquire(scope):
+                raise Overloaded()
+            self.admitted_scope = scope
+
+    def dispatch(self, request, *args, **kwargs):
+        self.admitted_scope = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.admitted_scope is not None:
+                limiter.release(self.admitted_scope)
+
+
+async def aadmit(request, scope, table_number):
+    """
+    The async views' counterpart of ``CustomerAdmissionMixin``: raise
+    ``Throttled``/``Overloaded`` or return whether a concurrency slot of
+    ``scope`` was taken (release it with ``limiter.release``).
+    """
+    if scope is None or not enabled():
+        return False
+    wait = await get_store().aconsume_all(bucket_keys(scope, BaseThrottle().get_ident(request), table_number))
+    if wait:
+        raise Throttled(wait)
+    if not limiter.acquire(scope):
+        raise Overloaded()
+    return True
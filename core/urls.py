@@ -1,6 +1,12 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet, MenuView, OrderView, StaffOrderViewSet, AdminMenuViewSet, AdminTableViewSet, PaymentView, StaffOrderItemManagementView, SummaryReportView
+from .metrics import metrics_view
+from .streams import order_event_stream
+from .views import UserViewSet, MenuView, OrderView, StaffOrderViewSet, AdminMenuViewSet, AdminTableViewSet, PaymentView, StaffOrderItemManagementView, FloorMapView, TableQRCodeView, SummaryReportView, AnalyticsReportView, OrderExportView
+
+if getattr(settings, 'ASYNC_CUSTOMER_VIEWS', False):
+    from .async_views import AsyncMenuView as MenuView, AsyncOrderView as OrderView, AsyncPaymentView as PaymentView
 
 router = DefaultRouter()
 router.register(r'staff/orders', StaffOrderViewSet, basename='staff-order')
@@ -10,9 +16,17 @@ router.register(r'admin/tables', AdminTableViewSet, basename='admin-table')
 urlpatterns = [
     path('tables/<str:table_number>/menu/', MenuView.as_view(), name='menu-view'),
     path('tables/<str:table_number>/order/', OrderView.as_view(), name='order-view'),
+    path('tables/<str:table_number>/qr.<str:image_format>', TableQRCodeView.as_view(), name='table-qr'),
+    path('tables/<str:table_number>/qr/<str:version>.<str:image_format>', TableQRCodeView.as_view(),
+         name='table-qr-versioned'),
     path('permissions/', UserViewSet.as_view({'get': 'userPermissions'}), name='permission-view'),
     path('orders/<int:pk>/pay/', PaymentView.as_view(), name='order-payment'),
     path('staff/order-items/<int:pk>/', StaffOrderItemManagementView.as_view(), name='staff-order-item-management'),
+    path('staff/floor/', FloorMapView.as_view(), name='staff-floor-map'),
+    path('staff/orders/stream/', order_event_stream, name='staff-order-stream'),
+    path('metrics/', metrics_view, name='metrics'),
     path('reports/summary/', SummaryReportView.as_view(), name='summary-report'),
+    path('reports/analytics/', AnalyticsReportView.as_view(), name='analytics-report'),
+    path('reports/orders/export/', OrderExportView.as_view(), name='order-export'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,7 +1,13 @@
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotModified, HttpResponseRedirect, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import parse_etags
 from rest_framework import generics, viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import BaseContentNegotiation
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions, AllowAny
 from .models import Table, MenuItem, Order, OrderItem
 from .serializers import (
@@ -9,11 +15,29 @@ from .serializers import (
     OrderSerializer, StaffOrderItemUpdateSerializer
 )
 from .permissions import IsInManagerGroup
-from django.utils.dateparse import parse_date
-from django.db.models import Sum, Count, F
-from datetime import date, timedelta
+from .idempotency import IdempotentMixin
+from .throttling import CustomerAdmissionMixin
+from . import analytics, exports, floor_map, menu_cache, qr
+from .services import (
+    OrderPlacementError, place_order, change_order_statuses, pay_order,
+    update_order_item, delete_order_item
+)
+from .models import DailySalesSummary, DailyMenuItemSales
+from .pagination import OrderFeedPagination
+from .fast_serializers import order_payload, order_payloads
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db.models import Sum
+from datetime import date, datetime, time
 from rest_framework.views import APIView
 
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
 class UserViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
@@ -24,30 +48,31 @@ class UserViewSet(viewsets.ViewSet):
             "id": user.id,
             "username": user.username,
             "permissions": list(user.get_all_permissions()),
-            "groups": [g.name for g in user.groups.all()]
+            "groups": sorted(user.group_names) if hasattr(user, 'group_names') else [g.name for g in user.groups.all()]
         })
 
-class MenuView(generics.ListAPIView):
+class MenuView(CustomerAdmissionMixin, generics.ListAPIView):
     serializer_class = CustomerMenuItemSerializer
     permission_classes = [AllowAny]
+    throttle_scopes = {'GET': 'menu'}
 
     def get_queryset(self):
         return MenuItem.objects.filter(is_available=True)
 
-class OrderView(generics.GenericAPIView):
+    def list(self, request, *args, **kwargs):
+        body, etag = menu_cache.get_menu()
+        return menu_cache.menu_response(request, body, etag)
+
+class OrderView(CustomerAdmissionMixin, IdempotentMixin, generics.GenericAPIView):
     serializer_class = OrderSerializer
     permission_classes = [AllowAny]
+    throttle_scopes = {'GET': 'order_status', 'POST': 'order', 'PATCH': 'payment'}
 
     def get(self, request, *args, **kwargs):
-        try:
-            table_number = self.kwargs.get('table_number')
-            table = Table.objects.get(table_number=table_number)
-            order = Order.objects.get(table=table, is_paid=False)
-
-            serializer = self.get_serializer(order)
-            return Response(serializer.data)
-        except ObjectDoesNotExist:
+        payloads = order_payloads(Order.objects.open().filter(table_id=self.kwargs.get('table_number')))
+        if not payloads:
             return Response({"info": "指定的餐桌没有未支付的订单。"}, status=status.HTTP_204_NO_CONTENT)
+        return Response(payloads[0])
 
     def post(self, request, *args, **kwargs):
         try:
@@ -56,64 +81,85 @@ class OrderView(generics.GenericAPIView):
         except Table.DoesNotExist:
             return Response({"error": f"餐桌 '{table_number}' 不存在，无法下单。"}, status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            order = Order.objects.exclude(status='completed').get(table=table)
-            created = False
-        except Order.DoesNotExist:
-            order = Order.objects.create(table=table, status='pending')
-            created = True
-
-            if created:
-                table.is_available = False
-                table.save()
-
         items_data = request.data.get('items', [])
         if not items_data:
             return Response({"error": "未提供菜品信息"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(items_data, list):
+            return Response({"error": "菜品信息格式无效。"}, status=status.HTTP_400_BAD_REQUEST)
 
-        for item_data in items_data:
-            menu_item_id = item_data.get('menu_item_id')
-            quantity = item_data.get('quantity', 1)
+        try:
+            order, created = place_order(table, items_data)
+        except OrderPlacementError as e:
+            return Response({"error": e.message}, status=status.HTTP_400_BAD_REQUEST)
 
-            try:
-                menu_item = MenuItem.objects.get(id=menu_item_id, is_available=True)
-                order_item, item_created = OrderItem.objects.get_or_create(
-                    order=order,
-                    menu_item=menu_item,
-                    defaults={'quantity': quantity}
-                )
-                if not item_created:
-                    order_item.quantity += quantity
-                    order_item.save()
-
-            except MenuItem.DoesNotExist:
-                return Response(
-                    {"error": f"ID为 {menu_item_id} 的菜品不存在或不可售。"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-        serializer = self.get_serializer(order)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(order_payload(order.pk), status=status.HTTP_201_CREATED)
 
     def patch(self, request, *args, **kwargs):
         try:
             table_number = self.kwargs.get('table_number')
             table = Table.objects.get(table_number=table_number)
-            order = Order.objects.get(table=table, is_paid=False)
-
-            order.is_paid = True
-            order.status = 'completed'
-            order.save()
-
-            serializer = self.get_serializer(order)
-            return Response(serializer.data)
+            order = Order.objects.open().get(table=table)
+            order = pay_order(order, release_table=False)
+            return Response(order_payload(order.pk))
         except ObjectDoesNotExist:
             return Response({"error": "指定的餐桌或需要结账的订单不存在。"}, status=status.HTTP_404_NOT_FOUND)
 
 class StaffOrderViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Order.objects.all().order_by('-created_at')
+    queryset = Order.objects.all().order_by('-created_at', '-id')
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderFeedPagination
+    bulk_status_limit = 200
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = self.filter_feed(queryset, self.request.query_params)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        # Page over bare rows, then render the page from one .values() query.
+        page = self.paginate_queryset(self.get_queryset().only('id', 'created_at'))
+        orders = Order.objects.filter(pk__in=[order.pk for order in page]).order_by('-created_at', '-id')
+        return self.get_paginated_response(order_payloads(orders))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(order_payload(self.get_object().pk))
+
+    def filter_feed(self, queryset, params):
+        statuses = [s for s in params.get('status', '').split(',') if s]
+        if statuses:
+            valid_statuses = [s[0] for s in Order.STATUS_CHOICES]
+            if any(s not in valid_statuses for s in statuses):
+                raise ValidationError({'status': '无效的状态值'})
+            queryset = queryset.filter(status__in=statuses)
+
+        is_paid = params.get('is_paid')
+        if is_paid is not None:
+            if is_paid.lower() not in ('true', 'false', '1', '0'):
+                raise ValidationError({'is_paid': '请使用 true 或 false。'})
+            queryset = queryset.filter(is_paid=is_paid.lower() in ('true', '1'))
+
+        table_number = params.get('table')
+        if table_number:
+            queryset = queryset.filter(table_id=table_number)
+
+        updated_since = params.get('updated_since')
+        if updated_since:
+            try:
+                value = parse_datetime(updated_since)
+                day = parse_date(updated_since) if value is None else None
+            except ValueError:
+                value = day = None
+            if value is None:
+                if day is None:
+                    raise ValidationError({'updated_since': '时间格式无效，请使用 ISO 8601 格式。'})
+                value = datetime.combine(day, time.min)
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            queryset = queryset.filter(updated_at__gte=value)
+
+        return queryset
 
     @action(detail=True, methods=['patch'], permission_classes=[IsAuthenticated])
     def status(self, request, pk=None):
@@ -127,9 +173,43 @@ class StaffOrderViewSet(viewsets.ReadOnlyModelViewSet):
         if new_status not in valid_statuses:
             return Response({'error': '无效的状态值'}, status=status.HTTP_400_BAD_REQUEST)
 
-        order.status = new_status
-        order.save()
-        return Response(self.get_serializer(order).data)
+        # Same checks as bulk-status: allowed transitions, and no overwriting a concurrent change.
+        result, current = change_order_statuses([order.pk], new_status)[order.pk]
+        if result == 'not_found':
+            return Response({'error': '订单不存在。', 'result': result, 'status': current},
+                            status=status.HTTP_404_NOT_FOUND)
+        if result == 'invalid_transition':
+            return Response({'error': f'订单状态不能从 {current} 改为 {new_status}。', 'result': result, 'status': current},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if result == 'conflict':
+            return Response({'error': '订单状态已被他人修改，请刷新后重试。', 'result': result, 'status': current},
+                            status=status.HTTP_409_CONFLICT)
+        return Response(order_payload(order.pk))
+
+    @action(detail=False, methods=['post'], url_path='bulk-status', permission_classes=[IsAuthenticated])
+    def bulk_status(self, request):
+        new_status = request.data.get('status')
+        valid_statuses = [s[0] for s in Order.STATUS_CHOICES]
+        if new_status not in valid_statuses:
+            return Response({'error': '无效的状态值'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({'error': 'ids 必须是非空的订单ID列表。'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.bulk_status_limit:
+            return Response({'error': f'每次最多修改 {self.bulk_status_limit} 个订单。'}, status=status.HTTP_400_BAD_REQUEST)
+        if any(isinstance(order_id, bool) or not isinstance(order_id, int) for order_id in ids):
+            return Response({'error': 'ids 必须是非空的订单ID列表。'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = change_order_statuses(ids, new_status)
+        return Response({
+            'status': new_status,
+            'updated': sum(result == 'updated' for result, _ in results.values()),
+            'results': [
+                {'id': order_id, 'result': result, 'status': current}
+                for order_id, (result, current) in results.items()
+            ],
+        })
 
 class AdminMenuViewSet(viewsets.ModelViewSet):
     queryset = MenuItem.objects.all()
@@ -143,8 +223,64 @@ class AdminTableViewSet(viewsets.ModelViewSet):
 
     lookup_field = 'table_number'
 
-class PaymentView(generics.GenericAPIView):
+    @action(detail=False, methods=['get'], url_path='qr-codes',
+            content_negotiation_class=IgnoreClientContentNegotiation)
+    def qr_codes(self, request):
+        """Stream a ZIP of every table's QR code (?image=png or svg) for printing."""
+        image_format = request.query_params.get('image', 'png')
+        if image_format not in qr.CONTENT_TYPES:
+            return Response({"error": "图片格式无效，请使用 png 或 svg。"}, status=status.HTTP_400_BAD_REQUEST)
+
+        table_numbers = self.get_queryset().order_by('table_number').values_list('table_number', flat=True)
+        entries = (
+            (qr.archive_name(table_number, image_format),
+             qr.qr_image(qr.qr_url(table_number), image_format, cache=False),
+             image_format == 'svg')
+            for table_number in table_numbers.iterator(chunk_size=500)
+        )
+        chunks = qr.zip_chunks(entries)
+        if isinstance(request._request, ASGIRequest):
+            chunks = exports.aiter_chunks(chunks)
+
+        response = StreamingHttpResponse(chunks, content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="qr-codes-{image_format}.zip"'
+        return response
+
+class TableQRCodeView(APIView):
+    """
+    A table's QR code as PNG or SVG. Under the versioned URL (the version
+    changes with the encoded link) the image is cacheable forever; older
+    versions redirect to the current one.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, table_number, image_format, version=None):
+        if image_format not in qr.CONTENT_TYPES:
+            return Response({"error": "图片格式无效，请使用 png 或 svg。"}, status=status.HTTP_404_NOT_FOUND)
+        if not Table.objects.filter(table_number=table_number).exists():
+            return Response({"error": f"餐桌 '{table_number}' 不存在。"}, status=status.HTTP_404_NOT_FOUND)
+
+        url = qr.qr_url(table_number)
+        current = qr.qr_version(url)
+        if version is not None and version != current:
+            return HttpResponseRedirect(reverse('table-qr-versioned', kwargs={
+                'table_number': table_number, 'version': current, 'image_format': image_format,
+            }))
+
+        etag = f'"{current}-{image_format}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(qr.qr_image(url, image_format), content_type=qr.CONTENT_TYPES[image_format])
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=31536000, immutable' if version else 'no-cache'
+        return response
+
+class PaymentView(CustomerAdmissionMixin, IdempotentMixin, generics.GenericAPIView):
     permission_classes = [AllowAny]
+    throttle_scopes = {'POST': 'payment'}
 
     def post(self, request, pk, format=None):
         try:
@@ -155,18 +291,11 @@ class PaymentView(generics.GenericAPIView):
         if order.is_paid:
             return Response({"error": "该订单已经支付，请勿重复操作。"}, status=status.HTTP_400_BAD_REQUEST)
 
-        order.is_paid = True
-        order.status = 'completed'
-        order.save()
+        order = pay_order(order)
 
-        table = order.table
-        table.is_available = True
-        table.save()
-
-        serializer = OrderSerializer(order)
         return Response({
             "message": "支付成功！",
-            "order": serializer.data
+            "order": order_payload(order.pk)
         }, status=status.HTTP_200_OK)
 
 class StaffOrderItemManagementView(generics.RetrieveUpdateDestroyAPIView):
@@ -174,6 +303,26 @@ class StaffOrderItemManagementView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = StaffOrderItemUpdateSerializer
     permission_classes = [DjangoModelPermissions]
 
+    def perform_update(self, serializer):
+        quantity = serializer.validated_data.get('quantity', serializer.instance.quantity)
+        update_order_item(serializer.instance, quantity)
+
+    def perform_destroy(self, instance):
+        delete_order_item(instance)
+
+
+class FloorMapView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        tables = floor_map.snapshot()
+        occupied = sum(1 for table in tables if table['order'] is not None or not table['is_available'])
+        return Response({
+            'occupied': occupied,
+            'available': len(tables) - occupied,
+            'tables': tables,
+        }, status=status.HTTP_200_OK)
+
 
 class SummaryReportView(APIView):
     permission_classes = [IsInManagerGroup]
@@ -189,25 +338,24 @@ class SummaryReportView(APIView):
         if not start_date or not end_date:
             return Response({"error": "日期格式无效，请使用 YYYY-MM-DD 格式。"}, status=status.HTTP_400_BAD_REQUEST)
 
-        query_end_date = end_date + timedelta(days=1)
-
-        completed_orders = Order.objects.filter(
-            status='completed',
-            created_at__gte=start_date,
-            created_at__lt=query_end_date
+        day_totals = DailySalesSummary.objects.filter(
+            date__gte=start_date,
+            date__lte=end_date
+        ).aggregate(
+            total=Sum('revenue'),
+            orders=Sum('order_count')
         )
-
-        total_revenue_data = completed_orders.aggregate(
-            total=Sum(F('items__price') * F('items__quantity'))
-        )
-        total_revenue = total_revenue_data['total'] or 0
-        total_orders = completed_orders.count()
-        top_selling_items = OrderItem.objects.filter(
-            order__in=completed_orders
+        total_revenue = day_totals['total'] or 0
+        total_orders = day_totals['orders'] or 0
+        top_selling_items = DailyMenuItemSales.objects.filter(
+            date__gte=start_date,
+            date__lte=end_date
         ).values(
             'menu_item__name'
         ).annotate(
             total_sold=Sum('quantity')
+        ).filter(
+            total_sold__gt=0
         ).order_by(
             '-total_sold'
         )[:5]
@@ -225,4 +373,91 @@ class SummaryReportView(APIView):
             'top_selling_items': list(top_selling_items)
         }
 
-        return Response(report_data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(report_data, status=status.HTTP_200_OK)
+
+class AnalyticsReportView(APIView):
+    """Completed-order revenue and counts per hour/day/week, broken down by table and menu item."""
+    permission_classes = [IsInManagerGroup]
+
+    def get(self, request, *args, **kwargs):
+        kind = request.query_params.get('bucket', 'day')
+        if kind not in analytics.BUCKETS:
+            return Response({"error": "统计粒度无效，请使用 hour、day 或 week。"}, status=status.HTTP_400_BAD_REQUEST)
+        breakdowns = [b for b in request.query_params.get('breakdown', ','.join(analytics.BREAKDOWNS)).split(',') if b]
+        if any(b not in analytics.BREAKDOWNS for b in breakdowns):
+            return Response({"error": "明细维度无效，请使用 table、menu_item 或留空。"}, status=status.HTTP_400_BAD_REQUEST)
+
+        today = timezone.localdate()
+        dates = {}
+        for name in ('start_date', 'end_date'):
+            value = request.query_params.get(name)
+            if not value:
+                dates[name] = today
+                continue
+            try:
+                dates[name] = parse_date(value)
+            except ValueError:
+                dates[name] = None
+            if dates[name] is None:
+                return Response({"error": "日期格式无效，请使用 YYYY-MM-DD 格式。"}, status=status.HTTP_400_BAD_REQUEST)
+        if dates['start_date'] > dates['end_date']:
+            return Response({"error": "开始日期不能晚于结束日期。"}, status=status.HTTP_400_BAD_REQUEST)
+
+        start_date, end_date = analytics.align_range(kind, dates['start_date'], dates['end_date'])
+        days = (end_date - start_date).days + 1
+        buckets = {'hour': days * 24, 'day': days, 'week': days // 7}[kind]
+        if buckets > analytics.max_buckets():
+            return Response({"error": f"查询范围过大，最多返回 {analytics.max_buckets()} 个时间段。"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        report_data = {
+            'query_range': {
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+            },
+            **analytics.report(kind, start_date, end_date, breakdowns),
+        }
+        return Response(report_data, status=status.HTTP_200_OK)
+
+
+class OrderExportView(APIView):
+    """Stream orders and their lines as CSV or NDJSON, gzip-compressed when the client accepts it."""
+    permission_classes = [IsInManagerGroup]
+    # The body is written by the export itself, whatever the Accept header asks for.
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'csv')
+        if output not in exports.FORMATS:
+            return Response({"error": "导出格式无效，请使用 csv 或 ndjson。"}, status=status.HTTP_400_BAD_REQUEST)
+
+        dates = {}
+        for name in ('start_date', 'end_date'):
+            value = request.query_params.get(name)
+            if not value:
+                dates[name] = None
+                continue
+            try:
+                dates[name] = parse_date(value)
+            except ValueError:
+                dates[name] = None
+            if dates[name] is None:
+                return Response({"error": "日期格式无效，请使用 YYYY-MM-DD 格式。"}, status=status.HTTP_400_BAD_REQUEST)
+        start_date, end_date = dates['start_date'], dates['end_date']
+
+        statuses = [s for s in request.query_params.get('status', '').split(',') if s]
+        valid_statuses = [s[0] for s in Order.STATUS_CHOICES]
+        if any(s not in valid_statuses for s in statuses):
+            return Response({"error": "无效的状态值"}, status=status.HTTP_400_BAD_REQUEST)
+
+        compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+        chunks = exports.export_chunks(output, start_date, end_date, statuses, compress=compress)
+        if isinstance(request._request, ASGIRequest):
+            chunks = exports.aiter_chunks(chunks)
+
+        response = StreamingHttpResponse(chunks, content_type=exports.CONTENT_TYPES[output])
+        response['Content-Disposition'] = f'attachment; filename="orders-{start_date or "all"}-{end_date or "all"}.{output}"'
+        response['Vary'] = 'Accept-Encoding'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        return response
@@ -0,0 +1,18 @@
+"""
+Gunicorn settings, read from the project directory by default.
+
+GUNICORN_PRELOAD=1 loads the application in the master before forking
+(gunicorn's preload_app) and warms it up there (core.startup.warm_up), so
+workers boot and are recycled without importing Django, the apps or the
+URLconf again. Code changes then need a full restart rather than a HUP.
+"""
+import os
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+
+
+def when_ready(server):
+    if preload_app:
+        from core.startup import warm_up
+
+        warm_up()
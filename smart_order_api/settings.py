@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -28,11 +32,23 @@ DEBUG = True
 ALLOWED_HOSTS = ["*"]
 
 
+# What this process serves: 'backoffice' (default) is everything; 'api' is the
+# API only, without the admin (and django-import-export) or the swagger/redoc
+# docs (drf_yasg), whose apps are then not installed nor imported at boot.
+DEPLOYMENT_ROLE = os.environ.get('DEPLOYMENT_ROLE', 'backoffice')
+if DEPLOYMENT_ROLE not in ('backoffice', 'api'):
+    raise ImproperlyConfigured("DEPLOYMENT_ROLE must be 'backoffice' or 'api'.")
+ADMIN_ENABLED = DEPLOYMENT_ROLE == 'backoffice'
+API_DOCS_ENABLED = DEPLOYMENT_ROLE == 'backoffice'
+
+# Boot-time budget in milliseconds (settings, apps and URLconf loaded) per
+# deployment role, enforced by `manage.py benchmark_startup`.
+STARTUP_BUDGET_MS = {'backoffice': 1000, 'api': 750}
+
+
 # Application definition
 
 INSTALLED_APPS = [
-    'import_export',
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -42,10 +58,14 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'core',
     'corsheaders',
-    'drf_yasg'
 ]
+if ADMIN_ENABLED:
+    INSTALLED_APPS[:0] = ['import_export', 'django.contrib.admin']
+if API_DOCS_ENABLED:
+    INSTALLED_APPS.append('drf_yasg')
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -81,8 +101,21 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_OBTAIN_SERIALIZER": "core.auth.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "core.auth.ClaimsTokenRefreshSerializer",
+    "TOKEN_USER_CLASS": "core.auth.ClaimsTokenUser",
 }
 
+# archive_orders moves closed orders older than this out of the live tables.
+ORDER_ARCHIVE_AFTER_DAYS = 3
+
+# Group and permission claims in access tokens stay trusted while the user's
+# permission version is unchanged; other workers see a change within
+# AUTH_CLAIMS_VERSION_TTL seconds. Use a shared cache when running several processes.
+AUTH_CLAIMS_CACHE_ALIAS = 'default'
+AUTH_CLAIMS_CACHE_TIMEOUT = 300
+AUTH_CLAIMS_VERSION_TTL = 5
+
 CORS_ALLOWED_ORIGINS = [
     "http://192.168.1.171:5173",
 ]
@@ -90,17 +123,125 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 
 FRONTEND_BASE_URL = 'http://192.168.1.171:5173'
+# Rendered QR images (per link and format) kept in memory by each worker for /api/tables/<table>/qr...
+QR_IMAGE_CACHE_SIZE = 1000
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.auth.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
-    )
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache alias holding the rendered customer menu and its version key. Point it
+# at a shared backend (e.g. Redis) when running several workers.
+MENU_CACHE_ALIAS = 'default'
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Rows written per bulk batch when importing menu files (admin and import_menu).
+MENU_IMPORT_BATCH_SIZE = 1000
+
+# Cache alias for the analytics report's closed time buckets and the per-day
+# sales change counters that invalidate them. Use a shared cache when running
+# several workers.
+ANALYTICS_CACHE_ALIAS = 'default'
+ANALYTICS_MAX_BUCKETS = 2000
+
+# Staff floor map: cache alias of the change counter that tells workers their
+# in-process occupancy index missed a change (use a shared cache when running
+# several workers), and the age in seconds after which it is rebuilt anyway.
+FLOOR_MAP_CACHE_ALIAS = 'default'
+FLOOR_MAP_MAX_AGE = 60
+
+# OpenAPI document written by `manage.py export_openapi_schema` at deploy time
+# and loaded by the /swagger.json, /swagger.yaml, /swagger/ and /redoc/ views
+# while it was exported from the same RELEASE_ID (e.g. the deployed git
+# commit) and URLconf. Without RELEASE_ID, or when either differs, each worker
+# generates the document once on first use (core/openapi_schema.py).
+RELEASE_ID = os.environ.get('RELEASE_ID') or None
+OPENAPI_SCHEMA_ARTIFACT = os.environ.get('OPENAPI_SCHEMA_ARTIFACT', str(BASE_DIR / 'openapi-schema.json'))
+
+# Route the customer menu, order and payment URLs to the async views in
+# core/async_views.py. smart_order_api/asgi.py turns this on; keep it off
+# under WSGI, where every async view would need its own event loop.
+ASYNC_CUSTOMER_VIEWS = os.environ.get('ASYNC_CUSTOMER_VIEWS', '0') == '1'
+
+# Admission control for the anonymous customer endpoints (core/throttling.py),
+# per endpoint class: token buckets per client address and per table number as
+# (tokens per second, burst), answered with 429 when empty, and a ceiling on
+# concurrent requests per worker, answered with 503 beyond it. Buckets are
+# per process by default; use 'core.throttling.CacheBucketStore' with
+# {'cache_alias': ...} pointing at a shared cache for multi-worker deployments.
+# Guests share the restaurant's Wi-Fi address, so client rates are generous.
+CUSTOMER_ADMISSION_CONTROL = os.environ.get('CUSTOMER_ADMISSION_CONTROL', '1') == '1'
+CUSTOMER_THROTTLE_STORE = 'core.throttling.MemoryBucketStore'
+CUSTOMER_THROTTLE_STORE_OPTIONS = {'max_keys': 10000}
+CUSTOMER_THROTTLE_RATES = {
+    'menu': {'client': (20, 100), 'table': (5, 30)},
+    'order_status': {'client': (20, 100), 'table': (5, 30)},
+    'order': {'client': (5, 30), 'table': (1, 10)},
+    'payment': {'client': (2, 10), 'table': (1, 5)},
+}
+CUSTOMER_CONCURRENCY_LIMITS = {
+    'menu': 64,
+    'order_status': 64,
+    'order': 16,
+    'payment': 8,
+}
+
+# Broker fanning order events out to the staff/kitchen event stream. The
+# in-process broker only reaches clients of the same worker; use
+# 'core.events.CacheBroker' with a shared cache for multi-worker deployments.
+ORDER_EVENT_BROKER = 'core.events.InProcessBroker'
+ORDER_EVENT_BROKER_OPTIONS = {}
+ORDER_EVENT_STREAM_HEARTBEAT = 15
+# Seconds before an event stream is closed and the browser reconnects with
+# Last-Event-ID. Clients that went away are not noticed while a response
+# streams, and under WSGI every open stream pins a worker thread.
+ORDER_EVENT_STREAM_ASGI_LIFETIME = 300
+ORDER_EVENT_STREAM_WSGI_LIFETIME = 30
+
+# Stored responses for retried POSTs carrying an Idempotency-Key header.
+IDEMPOTENCY_CACHE_ALIAS = 'default'
+IDEMPOTENCY_TTL = 60 * 60 * 24
+
+# Per-view request metrics, exposed in Prometheus format at /api/metrics/.
+# Scrapers send "Authorization: Bearer <PERF_METRICS_TOKEN>"; while the token
+# is unset only staff users logged in to the admin can read the endpoint.
+PERF_METRICS_ENABLED = True
+PERF_METRICS_TOKEN = os.environ.get('PERF_METRICS_TOKEN') or None
+PERF_SLOW_REQUEST_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.performance': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
 }
 
 WSGI_APPLICATION = 'smart_order_api.wsgi.application'
@@ -109,12 +250,48 @@ WSGI_APPLICATION = 'smart_order_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_URL selects the backend, e.g.
+#   postgres://user:password@db:5432/smart_order
+# Without it the bundled SQLite file is used through core.backends.sqlite3,
+# which enables WAL, a busy timeout and BEGIN IMMEDIATE write transactions.
+#
+# DB_POOL_MODE:
+#   persistent (default) - keep connections open for DB_CONN_MAX_AGE seconds
+#                          and health-check them before reuse.
+#   pgbouncer            - connect through a local PgBouncer in transaction
+#                          pooling mode; server-side cursors are disabled.
+#   none                 - open a new connection per request.
+DATABASE_URL = os.environ.get('DATABASE_URL')
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'persistent')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+
+if DB_POOL_MODE not in ('persistent', 'pgbouncer', 'none'):
+    raise ImproperlyConfigured(f"Unknown DB_POOL_MODE {DB_POOL_MODE!r}.")
+
+if DATABASE_URL:
+    DATABASES = {
+        'default': dj_database_url.parse(
+            DATABASE_URL,
+            conn_max_age=0 if DB_POOL_MODE == 'none' else DB_CONN_MAX_AGE,
+            conn_health_checks=DB_POOL_MODE != 'none',
+            disable_server_side_cursors=DB_POOL_MODE == 'pgbouncer',
+        )
+    }
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES['default']['ENGINE'] = 'core.backends.sqlite3'
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'core.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+if DATABASES['default']['ENGINE'] == 'core.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).setdefault('timeout', 20)
+    DATABASES['default']['PRAGMAS'] = {
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
     }
-}
 
 
 # Password validation
@@ -1,41 +1,54 @@
-from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework import permissions
 
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Smart Order API",
-        default_version='v1',
-        description="Smart Order API for restaurant management",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="contact@admin.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
-
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', include('core.urls')),
 
     path('api/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
     path('api-auth/', include('rest_framework.urls')),
-
-    re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    re_path(r'^swagger/$', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    re_path(r'^redoc/$', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
+
+if settings.API_DOCS_ENABLED:
+    from drf_yasg.views import get_schema_view
+    from drf_yasg import openapi
+    from rest_framework import permissions
+
+    from core import openapi_schema
+
+    api_info = openapi.Info(
+        title="Smart Order API",
+        default_version='v1',
+        description="Smart Order API for restaurant management",
+        terms_of_service="https://www.google.com/policies/terms/",
+        contact=openapi.Contact(email="contact@admin.com"),
+        license=openapi.License(name="BSD License"),
+    )
+
+    schema_view = get_schema_view(
+        api_info,
+        public=True,
+        permission_classes=(permissions.AllowAny,),
+    )
+
+    urlpatterns += [
+        re_path(r'^swagger(?P<format>\.json|\.yaml)$', openapi_schema.schema_view(api_info), name='schema-json'),
+        re_path(r'^swagger/$', openapi_schema.ui_view(api_info, schema_view.with_ui('swagger', cache_timeout=0)),
+                name='schema-swagger-ui'),
+        re_path(r'^redoc/$', openapi_schema.ui_view(api_info, schema_view.with_ui('redoc', cache_timeout=0)),
+                name='schema-redoc'),
+    ]
+
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)